@@ -0,0 +1,101 @@
+"""
+Request coalescing and admission control benchmark.
+
+Against the local stub LLM server:
+
+- coalescing: N identical concurrent prompts sent directly vs. through
+  SingleFlight (upstream calls made and total time);
+- fairness: one client floods the upstream while another sends a few
+  requests; latency of the light client with a single FIFO queue vs. the
+  per-client fair queue;
+- shedding: a burst larger than the queue; admitted vs. shed requests and
+  latency of the admitted ones.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_admission --requests 40 --latency 0.2
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.stub_llm import start_stub_server
+from services.admission import SingleFlight, UpstreamOverloaded, current_client
+from services.stats import percentiles
+from services.upstream import UpstreamClient, anything_llm_chat
+
+RULES = "Answer always in the user language"
+
+
+async def timed(call):
+    start = time.perf_counter()
+    try:
+        await call()
+    except UpstreamOverloaded:
+        return None
+    return time.perf_counter() - start
+
+
+async def bench_coalescing(base_url, total):
+    for label, coalesce in (("direct", False), ("singleflight", True)):
+        client = UpstreamClient("stub", base_url, max_concurrency=4)
+        flights = SingleFlight()
+
+        async def call():
+            if coalesce:
+                return await flights.do("report", lambda: anything_llm_chat(client, "informe anual", RULES))
+            return await anything_llm_chat(client, "informe anual", RULES)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(call() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+        print(f"{label:<13} {total} identical requests: {client.admission.metrics()['admitted']:>3} "
+              f"upstream calls, {elapsed:6.2f}s")
+        await client.aclose()
+
+
+async def bench_fairness(base_url, total):
+    for label, fair in (("fifo", False), ("fair queue", True)):
+        client = UpstreamClient("stub", base_url, max_concurrency=2, max_queue=10 * total)
+
+        async def call(name, i):
+            # Each request runs in its own task, so this only tags that request
+            current_client.set(name if fair else "everyone")
+            await anything_llm_chat(client, f"{name} {i}", RULES)
+
+        heavy = [asyncio.create_task(timed(lambda i=i: call("heavy", i))) for i in range(total)]
+        await asyncio.sleep(0.05)
+        light = await asyncio.gather(*(timed(lambda i=i: call("light", i)) for i in range(5)))
+        heavy = await asyncio.gather(*heavy)
+        print(f"{label:<13} light client p50 {percentiles(light)['p50']:6.2f}s max {max(light):6.2f}s | "
+              f"heavy client p50 {percentiles(heavy)['p50']:6.2f}s")
+        await client.aclose()
+
+
+async def bench_shedding(base_url, total):
+    client = UpstreamClient("stub", base_url, max_concurrency=4, max_queue=total // 4, max_queue_wait=2)
+    results = await asyncio.gather(*(
+        timed(lambda i=i: anything_llm_chat(client, f"prompt {i}", RULES)) for i in range(total)
+    ))
+    admitted = [r for r in results if r is not None]
+    metrics = client.admission.metrics()
+    print(f"shedding      {total} requests: {len(admitted)} admitted, {metrics['rejected']} rejected, "
+          f"{metrics['timed_out']} timed out; admitted p95 {percentiles(admitted)['p95']:.2f}s, "
+          f"Retry-After {client.admission.retry_after()}s")
+    await client.aclose()
+
+
+async def main(args):
+    base_url = start_stub_server(port=args.port, latency=args.latency, token_delay=0)
+    print(f"Stub latency {args.latency}s")
+    await bench_coalescing(base_url, args.requests)
+    await bench_fairness(base_url, args.requests)
+    await bench_shedding(base_url, args.requests)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Coalescing and admission control benchmark")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=8766)
+    asyncio.run(main(parser.parse_args()))
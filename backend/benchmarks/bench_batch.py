@@ -0,0 +1,86 @@
+"""
+Batch generation benchmark.
+
+Generates the same set of charts one by one through /api/chat (one request,
+one model call and one render after another) and as a single /api/batch
+request following its NDJSON stream, against the local stub LLM server.
+Then times building the ZIP and merged PDF bundles. Each chart gets its own
+DPI so nothing comes from the render cache. The backend is served from a
+temporary working directory, so no generated file is left behind. Run from
+the backend directory:
+
+    python -m benchmarks.bench_batch --jobs 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.stub_llm import serve_in_thread, start_stub_server
+
+
+def chart_jobs(count, first_dpi):
+    return [
+        {"message": f"genera un gráfico de barras de las ventas del año {2000 + i}", "dpi": first_dpi + i}
+        for i in range(count)
+    ]
+
+
+async def run_serial(client, jobs):
+    start = time.perf_counter()
+    for job in jobs:
+        response = await client.post("/api/chat", json={**job, "cache": False})
+        assert response.json().get("type") == "image", response.text
+    return time.perf_counter() - start
+
+
+async def run_batch(client, jobs, bundle=None):
+    # Returns the arrival time of every NDJSON event
+    start = time.perf_counter()
+    events = []
+    async with client.stream("POST", "/api/batch", json={"jobs": jobs, "stream": True, "bundle": bundle,
+                                                          "cache": False}) as response:
+        async for line in response.aiter_lines():
+            if line:
+                events.append((time.perf_counter() - start, json.loads(line)))
+    failed = [event for _, event in events if event.get("status") == "error"]
+    assert not failed, failed
+    return events
+
+
+async def main(args, base_url, file_store):
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        serial = await run_serial(client, chart_jobs(args.jobs, 100))
+        events = await run_batch(client, chart_jobs(args.jobs, 100 + args.jobs))
+        print(f"{args.jobs} charts, model latency {args.latency}s")
+        print(f"serial /api/chat   {serial:7.2f}s")
+        print(f"/api/batch         {events[-1][0]:7.2f}s (first result after {events[0][0]:.2f}s) "
+              f"-> {serial / events[-1][0]:.1f}x faster")
+
+        for bundle in ("zip", "pdf"):
+            events = await run_batch(client, chart_jobs(args.jobs, 100), bundle)
+            (last_result, _), (bundled, event) = events[-3], events[-2]
+            size = file_store.resolve(event["filename"]).size
+            print(f"bundle {bundle:<4}        {bundled - last_result:7.3f}s ({size / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch generation benchmark")
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    os.environ["ANYTHING_LLM_URL"] = start_stub_server(port=args.port, latency=args.latency, token_delay=0)
+    sys.path.insert(0, os.getcwd())
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        import main as backend
+
+        base_url = serve_in_thread(backend.app, args.port + 1)
+        asyncio.run(main(args, base_url, backend.file_store))
@@ -0,0 +1,210 @@
+"""
+Fuzz check and benchmark of the chart data parser.
+
+Feeds the parser adversarial inputs (unbalanced brackets, deep nesting,
+long lines without numbers, JSON in unexpected shapes, random mutations of
+valid answers) and checks it never raises and that data embedded in prose
+round-trips. Then times
+the previous regex parser against tools.chart_data at growing input sizes.
+Run from the backend directory:
+
+    python -m benchmarks.bench_chart_data --fuzz 2000
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+
+import numpy as np
+
+from tools.chart_data import extract_chart_data
+
+# The legacy parser is quadratic on some inputs: keep it to sizes it finishes
+LEGACY_MAX_SIZE = 20_000
+
+
+def legacy_parse(text):
+    # parse_data_from_text as it was before tools.chart_data
+    text = re.sub(r'```json\s*', '', text)
+    text = re.sub(r'```\s*', '', text)
+    text = text.strip()
+    json_match = re.search(r'\{[^{}]*\}', text)
+    if json_match:
+        try:
+            data = json.loads(json_match.group())
+            if isinstance(data, dict) and len(data) > 0:
+                labels = []
+                values = []
+                for key, value in data.items():
+                    labels.append(str(key))
+                    if isinstance(value, (int, float)):
+                        values.append(float(value))
+                    elif isinstance(value, str):
+                        num_match = re.search(r'(\d+\.?\d*)', value)
+                        values.append(float(num_match.group(1)) if num_match else len(value))
+                    else:
+                        values.append(1)
+                return {'labels': labels, 'values': values}
+        except ValueError:
+            pass
+    array_match = re.search(r'\[[\s\S]*\]', text)
+    if array_match:
+        try:
+            data = json.loads(array_match.group())
+            if isinstance(data, list) and data and isinstance(data[0], dict):
+                keys = list(data[0].keys())
+                first_key = keys[0]
+                second_key = keys[1] if len(keys) > 1 else first_key
+                return {
+                    'labels': [str(item.get(first_key, '')) for item in data],
+                    'values': [float(item.get(second_key, 0)) if isinstance(item.get(second_key), (int, float)) else 1 for item in data]
+                }
+        except (ValueError, IndexError):
+            pass
+    labels = []
+    values = []
+    for line in text.split('\n'):
+        match = re.search(r'([^:|–-]+)[:|\–-]\s*(\d+\.?\d*)', line)
+        if match:
+            labels.append(match.group(1).strip())
+            values.append(float(match.group(2)))
+        else:
+            match = re.search(r'(.+?)\s+(\d+\.?\d*)$', line.strip())
+            if match and len(line.strip()) > 3:
+                labels.append(match.group(1).strip())
+                values.append(float(match.group(2)))
+    if labels and len(labels) == len(values):
+        return {'labels': labels, 'values': values}
+    return None
+
+
+def adversarial_inputs(size):
+    """Inputs built to trigger backtracking or deep recursion, about `size` chars long."""
+    return {
+        "open_braces": "{" * size,
+        "open_brackets": "[" * size,
+        "unclosed_keys": '{"a":' * (size // 5),
+        "deep_nesting": "[" * (size // 2) + "]" * (size // 2),
+        "no_numbers": "lorem ipsum " * (size // 12),
+        "digits_no_separator": "label " + "1" * size + " x",
+        "array_then_prose": "[" + "word " * (size // 5),
+        "many_objects": '{"a": 1} ' * (size // 9),
+        "many_lines": "Item: 1\n" * (size // 8),
+    }
+
+
+def malformed_answers():
+    """Valid JSON in shapes a model may produce but that are not chart data as documented."""
+    shapes = [
+        {"series": [{"name": ["a"], "data": [1, 2]}]},
+        {"series": [{"name": {"a": 1}, "data": [1, 2]}]},
+        {"series": [{"name": None, "data": [1, 2]}, {"name": 3, "data": [3, 4]}]},
+        {"series": [{"name": "a", "data": [[1], [2]]}]},
+        {"series": [{"data": None}]},
+        {"series": {"a": [{"x": 1}, 2]}},
+        {"labels": [["x"], {"y": 1}], "values": [1, 2]},
+        {"labels": ["x", "y"], "a": [1, 2], "b": [[1, 2], 3]},
+        [{"name": ["x"], "a": 1}, {"name": {"y": 1}, "a": 2}],
+        [[["x"], 1], [{"y": 1}, 2]],
+        {"2020": {"a": [1]}, "2021": {"a": 2}},
+        {"a": 1e400, "b": -1e400},
+    ]
+    return [f"Datos: {json.dumps(shape)}" for shape in shapes]
+
+
+def valid_answers(rng):
+    labels = [f"item_{i}" for i in range(rng.randint(2, 12))]
+    a = [rng.randint(-1000, 1000) for _ in labels]
+    b = [round(rng.uniform(0, 100), 2) for _ in labels]
+    flat = dict(zip(labels, a))
+    return [
+        (flat, {"values": a}),
+        ({"data": flat}, {"values": a}),
+        ({"series": {"a": dict(zip(labels, a)), "b": dict(zip(labels, b))}}, {"a": a, "b": b}),
+        ([{"name": l, "a": x, "b": y} for l, x, y in zip(labels, a, b)], {"a": a, "b": b}),
+        ({"labels": labels, "a": a, "b": b}, {"a": a, "b": b}),
+    ], labels
+
+
+def check_roundtrip(rng, iterations):
+    failures = 0
+    for _ in range(iterations):
+        answers, labels = valid_answers(rng)
+        for data, expected in answers:
+            text = f"Claro, aquí tienes los datos:\n```json\n{json.dumps(data)}\n```\nEspero que te sirva."
+            parsed = extract_chart_data(text)
+            ok = (
+                parsed is not None
+                and parsed["labels"] == labels
+                and parsed["series"].keys() == expected.keys()
+                and all(np.array_equal(parsed["series"][k], expected[k]) for k in expected)
+            )
+            if not ok:
+                failures += 1
+                print(f"❌ Round-trip failed for {json.dumps(data)[:80]}: {parsed}")
+                break
+    return failures
+
+
+def mutate(rng, text):
+    chars = list(text)
+    for _ in range(rng.randint(1, 8)):
+        position = rng.randrange(len(chars) + 1)
+        operation = rng.random()
+        if operation < 0.4 and chars:
+            del chars[min(position, len(chars) - 1)]
+        elif operation < 0.8:
+            chars.insert(position, rng.choice('{}[]",:\\ 0123456789abc\n'))
+        elif chars:
+            chars[min(position, len(chars) - 1)] = rng.choice('{}[]"')
+    return "".join(chars)
+
+
+def check_fuzz(rng, iterations):
+    failures = 0
+    inputs = list(adversarial_inputs(2_000).values()) + malformed_answers()
+    for _ in range(iterations):
+        answers, _ = valid_answers(rng)
+        data, _ = rng.choice(answers)
+        inputs.append(mutate(rng, f"Datos: {json.dumps(data)}"))
+    for text in inputs:
+        try:
+            extract_chart_data(text)
+        except Exception as e:
+            failures += 1
+            print(f"❌ Parser raised {type(e).__name__} on {text[:80]!r}")
+    return failures
+
+
+def timed(func, text):
+    start = time.perf_counter()
+    try:
+        func(text)
+    except Exception as e:
+        return f"{type(e).__name__:>10}"
+    return f"{(time.perf_counter() - start) * 1000:10.2f}"
+
+
+def bench(sizes):
+    print(f"{'input':<20} {'size':>8} {'legacy ms':>10} {'parser ms':>10}")
+    for size in sizes:
+        for name, text in adversarial_inputs(size).items():
+            legacy = timed(legacy_parse, text) if size <= LEGACY_MAX_SIZE else f"{'skipped':>10}"
+            print(f"{name:<20} {size:>8} {legacy} {timed(extract_chart_data, text)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chart data parser fuzz check and benchmark")
+    parser.add_argument("--fuzz", type=int, default=2000, help="Random mutated inputs to try")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failures = check_roundtrip(rng, max(1, args.fuzz // 10))
+    failures += check_fuzz(rng, args.fuzz)
+    print(f"Fuzz: {failures} failures")
+    bench(args.sizes)
+    sys.exit(1 if failures else 0)
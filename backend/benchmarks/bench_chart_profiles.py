@@ -0,0 +1,110 @@
+"""
+Render time and file size per chart render profile and format.
+
+Renders the same data with every profile as PNG and with the print profile
+as SVG and PDF, next to the previous renderer's output (300 dpi PNG through
+pyplot with bbox_inches='tight'). Then renders a report with charts as a
+PDF, with the charts drawn as vectors and as images. Results are
+saved as JSON (see benchmarks/results.py). Run from the backend directory:
+
+    python -m benchmarks.bench_chart_profiles --repeat 10
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+import tools.generate_pdf as generate_pdf_module
+from benchmarks.results import compare, save, summarize
+from benchmarks.stub_llm import report_answer
+from tools.generate_chart import DRAWERS, generate_chart, parse_data_from_text
+from tools.generate_pdf import generate_pdf
+from tools.render_options import CHART_DPI, CHART_FIGSIZE, CHART_PROFILES
+
+CHART_TYPES = ("bar", "line", "pie", "scatter")
+
+
+def previous_render(filepath, content, chart_type):
+    # Fixed 300 dpi, new pyplot figure per chart and a tight bounding box
+    data = parse_data_from_text(content)
+    fig, ax = plt.subplots(figsize=CHART_FIGSIZE)
+    DRAWERS[chart_type](ax, data['labels'], data['series'])
+    plt.tight_layout()
+    plt.savefig(str(filepath), dpi=CHART_DPI, bbox_inches='tight', facecolor='white')
+    plt.close(fig)
+
+
+def measure(render, path, repeat):
+    render(path)  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(path)
+        samples.append(time.perf_counter() - start)
+    return {**summarize(samples), "bytes": os.path.getsize(path)}
+
+
+def report_with_charts(charts):
+    rng = random.Random(0)
+    parts = [report_answer(rng, 3000)]
+    for i in range(charts):
+        data = json.dumps({str(2015 + year): rng.randint(100, 999) for year in range(8)})
+        parts += [f"## Gráfico {i + 1}", f"```chart {CHART_TYPES[i % len(CHART_TYPES)]}\n{data}\n```"]
+    return "\n\n".join(parts)
+
+
+def main(args):
+    rng = random.Random(0)
+    content = json.dumps({
+        "labels": [str(2000 + i) for i in range(args.points)],
+        "sales": [rng.randint(1000, 100000) for _ in range(args.points)],
+        "costs": [rng.randint(1000, 100000) for _ in range(args.points)],
+    })
+    cases = {}
+    for chart_type in CHART_TYPES:
+        cases[f"{chart_type} previous png"] = ("png", lambda path, t=chart_type: previous_render(path, content, t))
+        for profile in CHART_PROFILES:
+            cases[f"{chart_type} {profile} png"] = (
+                "png", lambda path, t=chart_type, p=profile: generate_chart(path, content, t, profile=p)
+            )
+        for format in ("svg", "pdf"):
+            cases[f"{chart_type} print {format}"] = (
+                format, lambda path, t=chart_type: generate_chart(path, content, t, profile="print")
+            )
+
+    report = report_with_charts(args.charts)
+
+    def report_pdf(path, vector):
+        generate_pdf_module.VECTOR_CHARTS = vector
+        generate_pdf(path, report)
+
+    cases[f"pdf {args.charts} vector charts"] = ("pdf", lambda path: report_pdf(path, True))
+    cases[f"pdf {args.charts} image charts"] = ("pdf", lambda path: report_pdf(path, False))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'case':<28} {'p50':>10} {'p95':>10} {'bytes':>10}")
+        for name, (extension, render) in cases.items():
+            results[name] = result = measure(render, Path(directory) / f"out.{extension}", args.repeat)
+            print(f"{name:<28} {result['p50'] * 1000:8.1f}ms {result['p95'] * 1000:8.1f}ms {result['bytes']:>10}")
+
+    print(f"\nResults saved to {save('chart-profiles', results, args, args.output)}")
+    if args.compare:
+        compare(args.compare, results, metrics=("p50", "p95", "bytes"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chart render profile benchmark")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--points", type=int, default=12, help="Labels per chart (two series)")
+    parser.add_argument("--charts", type=int, default=4, help="Charts in the PDF report")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/chart-profiles-<date>-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare with")
+    main(parser.parse_args())
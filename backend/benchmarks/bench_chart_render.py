@@ -0,0 +1,86 @@
+"""
+Render time vs. point count for every chart type.
+
+Renders synthetic two-series datasets of growing size with generate_chart
+and, for bar and line charts, with the previous single-series renderer
+(one `ax.text` per bar, every point drawn). Run from the backend directory:
+
+    python -m benchmarks.bench_chart_render --points 10 100 1000 10000 100000
+"""
+import argparse
+import contextlib
+import io
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+from tools.generate_chart import DRAWERS, generate_chart, parse_data_from_text
+from tools.render_options import CHART_FIGSIZE
+
+# The legacy renderer needs minutes past this size
+LEGACY_MAX_POINTS = 10_000
+
+
+def legacy_render(filepath, content, chart_type, dpi):
+    # Bar and line drawing as done by generate_chart before multi-series support
+    data = parse_data_from_text(content)
+    labels = data['labels']
+    values = data['values']
+    plt.style.use('seaborn-v0_8-darkgrid')
+    fig, ax = plt.subplots(figsize=CHART_FIGSIZE)
+    if chart_type == 'bar':
+        bars = ax.bar(labels, values, color='steelblue', alpha=0.8, edgecolor='black')
+        if len(labels) > 5:
+            plt.xticks(rotation=45, ha='right')
+        for bar in bars:
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width() / 2., height, f'{height:.1f}',
+                    ha='center', va='bottom', fontsize=10)
+    else:
+        ax.plot(labels, values, marker='o', linewidth=2, markersize=8,
+                color='steelblue', markerfacecolor='orange', markeredgecolor='black')
+        if len(labels) > 5:
+            plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    plt.savefig(str(filepath), dpi=dpi, bbox_inches='tight', facecolor='white')
+    plt.close(fig)
+
+
+def dataset(points, rng):
+    return json.dumps({
+        "labels": [f"p{i}" for i in range(points)],
+        "trend": rng.normal(size=points).cumsum().round(3).tolist(),
+        "noise": rng.normal(size=points).round(3).tolist(),
+    })
+
+
+def timed(render, directory, content, chart_type, dpi):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        render(Path(directory) / "chart.png", content, chart_type, dpi)
+    return f"{(time.perf_counter() - start) * 1000:10.0f}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chart render benchmark")
+    parser.add_argument("--points", type=int, nargs="+", default=[10, 100, 1_000, 10_000, 100_000])
+    parser.add_argument("--dpi", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'type':<10} {'points':>8} {'legacy ms':>10} {'render ms':>10}")
+        for points in args.points:
+            content = dataset(points, rng)
+            for chart_type in DRAWERS:
+                legacy = f"{'-':>10}"
+                if chart_type in ('bar', 'line') and points <= LEGACY_MAX_POINTS:
+                    legacy = timed(legacy_render, directory, content, chart_type, args.dpi)
+                render = timed(generate_chart, directory, content, chart_type, args.dpi)
+                print(f"{chart_type:<10} {points:>8} {legacy} {render}")
@@ -0,0 +1,94 @@
+"""
+Conversation store benchmark.
+
+Simulates long conversations and reports, as they grow, the size of the
+prompt sent upstream when the whole history is resent against the windowed
+context (recent turns plus rolling summary). Then compares write throughput
+of the batched store with one committed INSERT per message. Run from the
+backend directory:
+
+    python -m benchmarks.bench_conversation --turns 1000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from services.conversation_store import ConversationStore, estimate_tokens, with_context
+
+WORDS = (
+    "presupuesto gastos ingresos departamento informe trimestre ventas cliente "
+    "proyecto equipo objetivo resultado análisis datos año empresa plan mercado"
+).split()
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def message(rng):
+    return " ".join(sentence(rng, rng.randint(6, 20)) for _ in range(rng.randint(1, 6)))
+
+
+async def bench_context(path, turns, rng):
+    store = ConversationStore(path)
+    await store.start()
+    history = []
+    print(f"{'turns':>6} {'resend-all tokens':>18} {'windowed tokens':>16}")
+    checkpoints = {10, 50, 100, 500, 1000, 5000, turns}
+    for turn in range(1, turns + 1):
+        question, answer = message(rng), message(rng)
+        summary, recent = await store.context("bench")
+        if turn in checkpoints:
+            full = "\n".join(history + [question])
+            print(f"{turn:>6} {estimate_tokens(full):>18} {estimate_tokens(with_context(question, summary, recent)):>16}")
+        await store.append("bench", "user", question)
+        await store.append("bench", "assistant", answer)
+        history += [question, answer]
+    await store.close()
+
+
+async def bench_batched(path, messages, rng):
+    store = ConversationStore(path)
+    await store.start()
+    texts = [message(rng) for _ in range(messages)]
+    start = time.perf_counter()
+    for i, text in enumerate(texts):
+        await store.append(f"conv-{i % 50}", "user", text)
+    await store.flush()
+    elapsed = time.perf_counter() - start
+    await store.close()
+    return elapsed
+
+
+def bench_per_row(path, messages, rng):
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("CREATE TABLE messages (conversation_id TEXT, seq INTEGER, role TEXT, content TEXT, created REAL)")
+    texts = [message(rng) for _ in range(messages)]
+    start = time.perf_counter()
+    for i, text in enumerate(texts):
+        with db:
+            db.execute("INSERT INTO messages VALUES (?, ?, ?, ?, ?)", (f"conv-{i % 50}", i, "user", text, time.time()))
+    elapsed = time.perf_counter() - start
+    db.close()
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conversation store benchmark")
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(bench_context(os.path.join(directory, "context.db"), args.turns, rng))
+
+        batched = asyncio.run(bench_batched(os.path.join(directory, "batched.db"), args.messages, rng))
+        per_row = bench_per_row(os.path.join(directory, "per_row.db"), args.messages, rng)
+        print(f"Writes ({args.messages} messages): per-row commit {args.messages / per_row:,.0f} msg/s, "
+              f"batched store {args.messages / batched:,.0f} msg/s")
@@ -0,0 +1,71 @@
+"""
+File store benchmark.
+
+Fills a flat directory and a sharded file store with the same number of
+small files, then compares the per-request lookup of /files/{filename}: the
+old is_file() + stat() in one big directory against the store's in-memory
+index. Also times loading the store index on startup and a sweep that
+evicts a tenth of the files. Run from the backend directory:
+
+    python -m benchmarks.bench_file_store --files 100000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from services.file_store import FileStore
+
+
+def per_lookup(func, names):
+    start = time.perf_counter()
+    for name in names:
+        func(name)
+    return (time.perf_counter() - start) / len(names) * 1e6
+
+
+def flat_lookup(directory):
+    def lookup(name):
+        path = directory / name
+        if path.is_file():
+            return os.stat(path).st_size
+    return lookup
+
+
+async def main(args):
+    names = [f"chart_bar_topic_{i}_{i:016x}.png" for i in range(args.files)]
+    lookups = random.Random(0).choices(names, k=args.lookups)
+    with tempfile.TemporaryDirectory() as directory:
+        flat = Path(directory) / "flat"
+        flat.mkdir()
+        start = time.perf_counter()
+        for name in names:
+            (flat / name).write_bytes(b"x" * 64)
+        print(f"{args.files} files, {args.lookups} lookups (written in {time.perf_counter() - start:.1f}s)")
+
+        store = FileStore(Path(directory) / "store", max_entries=args.files)
+        for name in names:
+            with store.writing(name) as path:
+                path.write_bytes(b"x" * 64)
+
+        print(f"flat is_file() + stat()  {per_lookup(flat_lookup(flat), lookups):8.2f} µs/lookup")
+        print(f"store resolve()          {per_lookup(store.resolve, lookups):8.2f} µs/lookup")
+
+        start = time.perf_counter()
+        store = FileStore(Path(directory) / "store", max_entries=args.files)
+        print(f"store load               {time.perf_counter() - start:8.2f} s")
+
+        store.max_entries = args.files - args.files // 10
+        start = time.perf_counter()
+        evicted = await store.sweep()
+        print(f"sweep, {evicted} evicted  {time.perf_counter() - start:8.2f} s (deleted in a thread, off the event loop)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="File store benchmark")
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,90 @@
+"""
+Golden corpus check and micro-benchmark of the intent router.
+
+Verifies every message in intent_corpus.json routes to the expected
+intent, chart type and topic, then compares the router against the
+previous chain of `user_message.lower()` substring checks. Run from the
+backend directory:
+
+    python -m benchmarks.bench_intent --iterations 2000
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+from services.intent_router import build_default_router
+
+CORPUS = Path(__file__).with_name("intent_corpus.json")
+
+
+def legacy_route(user_message):
+    # Detection as it was done inline in chat_router before the router existed
+    should_generate_pdf = (
+        ("generar" in user_message.lower() or "genera" in user_message.lower())
+        and "pdf" in user_message.lower()
+    )
+    should_generate_chart = (
+        ("generar" in user_message.lower() or "genera" in user_message.lower() or "crear" in user_message.lower() or "crea" in user_message.lower())
+        and ("gráfica" in user_message.lower() or "grafica" in user_message.lower() or "gráfico" in user_message.lower() or "grafico" in user_message.lower() or "chart" in user_message.lower())
+    )
+    chart_type = 'bar'
+    if should_generate_chart:
+        if "línea" in user_message.lower() or "linea" in user_message.lower() or "line" in user_message.lower():
+            chart_type = 'line'
+        elif "circular" in user_message.lower() or "pie" in user_message.lower() or "pastel" in user_message.lower():
+            chart_type = 'pie'
+        elif "dispersión" in user_message.lower() or "dispersion" in user_message.lower() or "scatter" in user_message.lower():
+            chart_type = 'scatter'
+    topic = user_message.lower().replace("genera", "").replace("generar", "").replace("crea", "").replace("crear", "").replace("gráfica", "").replace("grafica", "").replace("gráfico", "").replace("grafico", "").replace("chart", "").replace("un", "").replace("de", "").strip()
+    topic_slug = re.sub(r'[^\w\s-]', '', topic).strip().replace(' ', '_')[:50]
+    if should_generate_chart:
+        return "chart", chart_type, topic_slug
+    if should_generate_pdf:
+        return "pdf", None, topic_slug
+    return "chat", None, topic_slug
+
+
+def check_corpus(router, corpus):
+    failures = 0
+    for case in corpus:
+        route = router.route(case["message"])
+        expected = (case["intent"], case["variant"], case["topic"])
+        if tuple(route) != expected:
+            failures += 1
+            print(f"❌ {case['message']!r}: got {tuple(route)}, expected {expected}")
+    print(f"Golden corpus: {len(corpus) - failures}/{len(corpus)} messages routed as expected")
+    return failures
+
+
+def bench(label, func, messages, iterations, repeat=7):
+    # Best of `repeat` runs, so other load on the machine does not skew the comparison
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for message in messages:
+                func(message)
+        best = min(best, time.perf_counter() - start)
+    per_message = best / (iterations * len(messages)) * 1e6
+    print(f"{label:<8} {per_message:7.2f} µs/message")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Intent router benchmark")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    router = build_default_router()
+    corpus = json.loads(CORPUS.read_text(encoding="utf-8"))
+    failures = check_corpus(router, corpus)
+
+    messages = [case["message"] for case in corpus]
+    long_messages = [message * 20 for message in messages]
+    bench("legacy", legacy_route, messages, args.iterations)
+    bench("router", router.route, messages, args.iterations)
+    bench("legacy", legacy_route, long_messages, args.iterations // 20 or 1)
+    bench("router", router.route, long_messages, args.iterations // 20 or 1)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,128 @@
+"""
+MCP tool benchmark.
+
+Connects an in-memory MCP client to the backend's MCP server (with the
+stub LLM standing in for the model) and compares generate_chart called
+with a message (the model is asked for the data first) and with the data
+as structured arguments, one call at a time and many at once. Every call
+uses different data, so the render cache does not answer. Run from the
+backend directory:
+
+    python -m benchmarks.bench_mcp --latency 1.0 --calls 8
+
+With `--stdio`, the web server (`python main.py`) and the stdio MCP server
+(`python main.py --mcp`) run at the same time from one working directory
+instead, and the charts made over stdio are downloaded from the web
+server, which checks that both share the files directory:
+
+    python -m benchmarks.bench_mcp --stdio
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.stub_llm import start_stub_server
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def chart_arguments(mode, i):
+    if mode == "message":
+        return {"message": f"genera un gráfico de barras de las ventas de la tienda {i}", "dpi": 100}
+    return {"data": {"2020": 50 + i, "2021": 55 + i, "2022": 60 + i}, "chartType": "bar", "dpi": 100}
+
+
+async def timed_call(session, arguments):
+    start = time.perf_counter()
+    result = await session.call_tool("generate_chart", arguments)
+    if result.isError:
+        raise RuntimeError(result.content[0].text)
+    return time.perf_counter() - start
+
+
+async def wait_for_health(client, timeout=120):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.05)
+    raise TimeoutError(f"web server not up after {timeout}s")
+
+
+async def main_stdio(args):
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    env = {**os.environ, "PORT": str(args.port + 1), "LOG_LEVEL": "WARNING"}
+    server = subprocess.Popen([sys.executable, MAIN], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port + 1}", timeout=120) as client:
+            await wait_for_health(client)
+            parameters = StdioServerParameters(command=sys.executable, args=[MAIN, "--mcp"], env=env)
+            async with stdio_client(parameters) as streams, ClientSession(*streams) as session:
+                await session.initialize()
+                print(f"generate_chart over stdio next to the web server, {args.calls} calls")
+                start = time.perf_counter()
+                results = await asyncio.gather(*(
+                    session.call_tool("generate_chart", chart_arguments("data", i)) for i in range(args.calls)
+                ))
+                elapsed = time.perf_counter() - start
+                served = 0
+                for result in results:
+                    if result.isError:
+                        raise RuntimeError(result.content[0].text)
+                    filename = json.loads(result.content[0].text)["filename"]
+                    response = await client.get(f"/files/{filename}")
+                    served += response.status_code == 200
+                print(f"  {args.calls} concurrent {elapsed * 1000:7.0f} ms   served by the web server {served}/{args.calls}")
+                if served != args.calls:
+                    raise RuntimeError("the web server did not find the files written over stdio")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def main(args):
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    import main as backend
+
+    async with backend.app.router.lifespan_context(backend.app):
+        await backend.render_pool.warm_up()
+        async with create_connected_server_and_client_session(backend.get_mcp_server()) as session:
+            print(f"generate_chart, model latency {args.latency:g}s, {args.calls} calls")
+            offset = 0
+            for mode in ("message", "data"):
+                one = await timed_call(session, chart_arguments(mode, offset))
+                offset += 1
+                start = time.perf_counter()
+                await asyncio.gather(*(
+                    timed_call(session, chart_arguments(mode, offset + i)) for i in range(args.calls)
+                ))
+                offset += args.calls
+                print(
+                    f"  {mode + ' arguments':<18} one call {one * 1000:7.0f} ms   "
+                    f"{args.calls} concurrent {(time.perf_counter() - start) * 1000:7.0f} ms"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MCP tool benchmark")
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--calls", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--stdio", action="store_true", help="run the stdio MCP server next to the web server")
+    args = parser.parse_args()
+    os.environ["ANYTHING_LLM_URL"] = start_stub_server(port=args.port, latency=args.latency, token_delay=0)
+    os.chdir(tempfile.mkdtemp())
+    asyncio.run(main_stdio(args) if args.stdio else main(args))
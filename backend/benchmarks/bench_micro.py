@@ -0,0 +1,96 @@
+"""
+Micro-benchmarks of the tools behind the chat, chart and PDF endpoints.
+
+Times parse_data_from_text (small and 10k-point JSON, 'Label: value'
+lines, records), generate_chart (bar, line, pie, scatter) and generate_pdf
+(reports of about 2 KB, 20 KB and 200 KB, as generated by the stub LLM) in
+this process, without the render pool. Reports p50/p95/p99 per case and
+saves the results as JSON (see benchmarks/results.py), so two commits can
+be compared. Run from the backend directory:
+
+    python -m benchmarks.bench_micro --repeat 20
+    python -m benchmarks.bench_micro --cases parse chart --compare benchmarks/results/micro-...json
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.results import compare, save, summarize
+from benchmarks.stub_llm import chart_answer, report_answer
+from tools.chart_data import parse_data_from_text
+from tools.generate_chart import generate_chart
+from tools.generate_pdf import generate_pdf
+
+CHART_TYPES = ("bar", "line", "pie", "scatter")
+PDF_SIZES = {"2KB": 2_000, "20KB": 20_000, "200KB": 200_000}
+
+
+def parse_inputs():
+    rng = random.Random(0)
+    return {
+        "small json": f"Aquí están los datos: {chart_answer(rng, 8)}",
+        "10k-point json": json.dumps({f"p{i}": rng.random() * 1000 for i in range(10_000)}),
+        "label lines": "\n".join(f"Región {i}: {rng.randint(10, 999)}" for i in range(50)),
+        "records": json.dumps([
+            {"year": 2000 + i, "sales": rng.randint(10, 999), "costs": rng.randint(10, 999)} for i in range(100)
+        ]),
+    }
+
+
+def measure(func, repeat):
+    func()  # warm-up: imports, font cache, styles
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def run(args, directory):
+    cases = {}
+    if "parse" in args.cases:
+        for name, text in parse_inputs().items():
+            cases[f"parse {name}"] = lambda text=text: parse_data_from_text(text)
+    if "chart" in args.cases:
+        content = chart_answer(random.Random(0), 12)
+        for chart_type in CHART_TYPES:
+            path = directory / f"{chart_type}.png"
+            cases[f"chart {chart_type}"] = (
+                lambda path=path, chart_type=chart_type: generate_chart(path, content, chart_type, dpi=args.dpi)
+            )
+    if "pdf" in args.cases:
+        for name, size in PDF_SIZES.items():
+            content = report_answer(random.Random(0), size)
+            path = directory / f"{name}.pdf"
+            cases[f"pdf {name}"] = lambda path=path, content=content: generate_pdf(path, content)
+
+    results = {}
+    print(f"{'case':<22} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for name, func in cases.items():
+        # Fewer rounds for the slow cases, so a default run stays short
+        repeat = max(3, args.repeat // 4) if name in ("pdf 200KB", "parse 10k-point json") else args.repeat
+        results[name] = result = measure(func, repeat)
+        print(f"{name:<22} " + " ".join(f"{result[key] * 1000:8.2f}ms" for key in ("p50", "p95", "p99")))
+    return results
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        results = run(args, Path(directory))
+    print(f"\nResults saved to {save('micro', results, args, args.output)}")
+    if args.compare:
+        compare(args.compare, results, metrics=("p50", "p95", "p99"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tool micro-benchmarks")
+    parser.add_argument("--cases", nargs="+", choices=("parse", "chart", "pdf"), default=["parse", "chart", "pdf"])
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per case (after one warm-up run)")
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/micro-<date>-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare with")
+    main(parser.parse_args())
@@ -0,0 +1,104 @@
+"""
+PDF generation benchmark.
+
+Generates long markdown-ish reports (sections with headings, paragraphs,
+lists and a table) with generate_pdf, which lays pages out as the text
+arrives, and with the previous renderer (the whole `story` of Paragraphs
+built first, then one `doc.build`). Reports time, peak traced memory and
+output size per document length. Run from the backend directory:
+
+    python -m benchmarks.bench_pdf --sections 10 100 500
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from reportlab.lib.enums import TA_JUSTIFY
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+from tools.generate_pdf import PdfStream, generate_pdf
+from tools.render_options import PDF_STYLE
+
+PARAGRAPH = (
+    "Las ventas del trimestre crecieron de forma sostenida en todas las regiones, impulsadas por "
+    "la demanda de **productos de consumo** y por la mejora de los márgenes en la distribución. "
+) * 4
+
+
+def report(sections):
+    for i in range(sections):
+        rows = "\n".join(f"| Región {j} | {j * 100 + i} | {j * 110 + i} |" for j in range(8))
+        yield (
+            f"## Sección {i + 1}\n\n{PARAGRAPH}\n\n- Primer punto\n- Segundo punto\n  - Detalle\n\n"
+            f"| Región | 2023 | 2024 |\n|---|---|---|\n{rows}\n\n{PARAGRAPH}\n\n"
+        )
+
+
+def legacy_pdf(filepath, content):
+    # generate_pdf before incremental layout: full story in memory, styles fetched per call
+    doc = SimpleDocTemplate(
+        str(filepath), pagesize=A4,
+        rightMargin=PDF_STYLE["margin_cm"] * cm, leftMargin=PDF_STYLE["margin_cm"] * cm,
+        topMargin=PDF_STYLE["margin_cm"] * cm, bottomMargin=PDF_STYLE["margin_cm"] * cm,
+    )
+    styles = getSampleStyleSheet()
+    style_normal = styles['Normal']
+    style_normal.alignment = TA_JUSTIFY
+    style_normal.fontSize = PDF_STYLE["font_size"]
+    style_normal.leading = PDF_STYLE["leading"]
+    style_title = styles['Heading1']
+    story = []
+    for i, para_text in enumerate(content.replace("**", "").split('\n\n')):
+        if para_text.strip():
+            style = style_title if i == 0 and len(para_text) < 100 else style_normal
+            story.append(Paragraph(para_text.replace('\n', '<br/>'), style))
+            story.append(Spacer(1, 0.3 * cm))
+    doc.build(story)
+
+
+def streamed_pdf(filepath, chunks):
+    # Text fed as it would arrive from the model, in small chunks
+    pdf = PdfStream(filepath)
+    for chunk in chunks:
+        for start in range(0, len(chunk), 64):
+            pdf.feed(chunk[start:start + 64])
+    pdf.close()
+
+
+def measure(func, filepath, content):
+    # Timed and traced in separate runs, since tracemalloc slows allocations down
+    start = time.perf_counter()
+    func(filepath, content)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(filepath, content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024, os.path.getsize(filepath) / 1024
+
+
+def main(args):
+    generate_pdf(os.devnull, "warm up")  # style and font setup
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "report.pdf")
+        print(f"{'sections':>8} {'renderer':<14} {'time':>8} {'peak mem':>10} {'size':>9}")
+        for sections in args.sections:
+            content = "".join(report(sections))
+            for name, func, data in (
+                ("previous", legacy_pdf, content),
+                ("generate_pdf", generate_pdf, content),
+                ("streamed", streamed_pdf, list(report(sections))),
+            ):
+                elapsed, peak, size = measure(func, path, data)
+                print(f"{sections:>8} {name:<14} {elapsed:7.2f}s {peak:8.1f}MB {size:7.0f}KB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF generation benchmark")
+    parser.add_argument("--sections", type=int, nargs="+", default=[10, 100, 500])
+    main(parser.parse_args())
@@ -0,0 +1,119 @@
+"""
+Local RAG benchmark.
+
+Ingests synthetic text documents through IngestManager (the same reader,
+chunker and embedding pool used by /upload) into a temporary index and
+reports throughput. Then, at each corpus size, compares query latency of the
+flat scan with the IVF index on queries that paraphrase ingested passages,
+and reports the IVF recall@k against the flat results. Run from the backend directory:
+
+    python -m benchmarks.bench_rag --mb 1 5 20 --queries 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from services.rag_index import VectorIndex
+from services.rag_ingest import IngestManager, embed_texts
+
+WORDS = (
+    "presupuesto gastos ingresos departamento informe trimestre ventas cliente proyecto equipo "
+    "objetivo resultado análisis datos año empresa plan mercado contrato proveedor factura "
+    "producto región auditoría inversión beneficio coste nómina estrategia riesgo calidad"
+).split()
+TOPICS = 200
+TOPIC_WORDS = 300
+
+
+def make_topics(rng):
+    # Real documents are topical: each section draws, Zipf-weighted, from its own vocabulary
+    vocabulary = WORDS + [f"ref{i}" for i in range(20_000)]
+    weights = [1 / (rank + 1) for rank in range(TOPIC_WORDS)]
+    return [(rng.sample(vocabulary, TOPIC_WORDS), weights) for _ in range(TOPICS)]
+
+
+def write_document(path, megabytes, rng, topics, excerpts):
+    # Some paragraphs are kept as query sources: questions paraphrase a passage
+    with open(path, "w", encoding="utf-8") as f:
+        size = 0
+        while size < megabytes * 1024 * 1024:
+            words, weights = rng.choice(topics)
+            for _ in range(rng.randint(5, 30)):
+                paragraph = rng.choices(words, weights, k=rng.randint(8, 25))
+                if rng.random() < 0.01:
+                    excerpts.append(paragraph)
+                size += f.write(" ".join(paragraph).capitalize() + ".\n\n")
+    return os.path.getsize(path)
+
+
+def make_queries(excerpts, count, rng):
+    queries = []
+    for words in rng.sample(excerpts, min(count, len(excerpts))):
+        queries.append(" ".join(rng.sample(words, max(3, len(words) // 2))))
+    return queries
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def ingest(manager, path):
+    start = time.perf_counter()
+    job = manager.submit(path, os.path.basename(path), delete_after=False)
+    while job["status"] in ("queued", "running"):
+        await asyncio.sleep(0.05)
+    if job["status"] == "error":
+        raise RuntimeError(job["error"])
+    return job["chunks"], time.perf_counter() - start
+
+
+def bench_queries(index, queries, k):
+    vectors = embed_texts(queries)
+    flat, approx, recall = [], [], []
+    for query in vectors:
+        start = time.perf_counter()
+        exact = index.search(query, k)
+        flat.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        found = index.search(query, k, approximate=True)
+        approx.append(time.perf_counter() - start)
+        expected = {i for i, _ in exact}
+        recall.append(len(expected & {i for i, _ in found}) / max(1, len(expected)))
+    return flat, approx, statistics.mean(recall)
+
+
+async def main(args):
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        index = VectorIndex(os.path.join(directory, "index"))
+        manager = IngestManager(index)
+        topics = make_topics(rng)
+        excerpts = []
+        print(f"{'corpus MB':>9} {'chunks':>8} {'MB/s':>7} {'chunks/s':>9} "
+              f"{'flat p50 ms':>12} {'flat p95 ms':>12} {'ivf p50 ms':>11} {'ivf p95 ms':>11} {'recall@k':>9}")
+        total = 0
+        for number, megabytes in enumerate(args.mb):
+            path = os.path.join(directory, f"doc{number}.txt")
+            size = write_document(path, megabytes, rng, topics, excerpts)
+            chunks, elapsed = await ingest(manager, path)
+            total += size
+            queries = make_queries(excerpts, args.queries, rng)
+            flat, approx, recall = bench_queries(index, queries, args.k)
+            print(f"{total / 1024 / 1024:>9.1f} {index.count:>8} {size / 1024 / 1024 / elapsed:>7.2f} "
+                  f"{chunks / elapsed:>9,.0f} {percentile(flat, 0.5) * 1000:>12.2f} "
+                  f"{percentile(flat, 0.95) * 1000:>12.2f} {percentile(approx, 0.5) * 1000:>11.2f} "
+                  f"{percentile(approx, 0.95) * 1000:>11.2f} {recall:>9.2f}")
+        await manager.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local RAG benchmark")
+    parser.add_argument("--mb", type=float, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,108 @@
+"""
+Model routing benchmark.
+
+Runs the same calls through ModelRouter pools of in-process providers with
+simulated latency and compares routing policies:
+
+- tail latency: replica A is faster on average but 10% of its answers are
+  slow, replica B is steady. Fixed order (A first), lowest p95, and fixed
+  order with hedging after B's usual latency.
+- a dead replica: failover cost per call before and after it is taken out
+  of rotation.
+- weighted balancing: share of calls per replica with weights 3:1:1.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_routing --calls 400
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+
+from services.providers import ModelRouter, StubProvider
+from services.stats import percentiles
+from services.upstream import UpstreamError
+
+
+class TailProvider(StubProvider):
+    """Answers after `latency` seconds, or `slow` seconds for a `tail` fraction of calls."""
+
+    def __init__(self, name, latency, slow=0.0, tail=0.0, weight=1.0, rng=None):
+        super().__init__(name, latency=latency, weight=weight)
+        self.slow = slow
+        self.tail = tail
+        self.rng = rng or random.Random(0)
+
+    async def chat(self, message, rules, summary="", turns=()):
+        await asyncio.sleep(self.slow if self.rng.random() < self.tail else self.latency)
+        return self.name
+
+
+class DeadProvider(StubProvider):
+    """Fails every call after a connection timeout."""
+
+    async def chat(self, message, rules, summary="", turns=()):
+        await asyncio.sleep(self.latency)
+        raise UpstreamError(f"{self.name} unreachable")
+
+
+async def run(router, calls, concurrency=8):
+    latencies = []
+    winners = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call():
+        async with semaphore:
+            start = time.perf_counter()
+            winners[await router.chat("local", "hola", "rules")] += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(call() for _ in range(calls)))
+    return percentiles(latencies), winners
+
+
+def tail_pool(policy, hedge_after=0.0):
+    router = ModelRouter(policy=policy, hedge_after=hedge_after, health_interval=0)
+    router.register("local", TailProvider("A", 0.02, slow=0.5, tail=0.1))
+    router.register("local", TailProvider("B", 0.06))
+    return router
+
+
+async def main(args):
+    print(f"Tail latency, {args.calls} calls (A: 20 ms, 10% at 500 ms; B: 60 ms)")
+    for label, router in (
+        ("failover (A first)", tail_pool("failover")),
+        ("lowest p95", tail_pool("p95")),
+        ("failover + hedge 80ms", tail_pool("failover", hedge_after=0.08)),
+    ):
+        latency, winners = await run(router, args.calls)
+        print(
+            f"  {label:<24} p50 {latency['p50'] * 1000:6.1f} ms  p95 {latency['p95'] * 1000:6.1f} ms  "
+            f"max {latency['max'] * 1000:6.1f} ms  answered {dict(winners)}  hedged {router.hedged}"
+        )
+
+    print("Dead replica (fails after 100 ms) ahead of a 20 ms one")
+    router = ModelRouter(policy="failover", health_interval=0, unhealthy_after=3)
+    router.register("local", DeadProvider("dead", latency=0.1))
+    router.register("local", TailProvider("alive", 0.02))
+    for phase in ("first calls", "after removal"):
+        latency, _ = await run(router, 20, concurrency=1)
+        print(
+            f"  {phase:<24} p50 {latency['p50'] * 1000:6.1f} ms  max {latency['max'] * 1000:6.1f} ms  "
+            f"failovers {router.failovers}  dead healthy: {router.providers['dead'].healthy}"
+        )
+
+    router = ModelRouter(policy="weighted", health_interval=0)
+    for name, weight in (("replica-1", 3), ("replica-2", 1), ("replica-3", 1)):
+        router.register("local", TailProvider(name, 0.001, weight=weight))
+    _, winners = await run(router, args.calls)
+    shares = ", ".join(f"{name} {winners[name] / args.calls:.0%}" for name in sorted(winners))
+    print(f"Weighted 3:1:1, {args.calls} calls: {shares}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Model routing benchmark")
+    parser.add_argument("--calls", type=int, default=400)
+    asyncio.run(main(parser.parse_args()))
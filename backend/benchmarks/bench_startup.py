@@ -0,0 +1,89 @@
+"""
+Startup benchmark.
+
+Launches the backend with `python main.py` from an empty working directory
+(no cached files) against the local stub LLM server, and reports:
+
+- the time until the port answers /health (process start and imports),
+- the time until /ready reports the warm-up done,
+- the latency of the first chart and PDF requests, sent either right after
+  /health (`--no-wait`, what a request routed to a cold instance pays) or
+  after /ready,
+- the latency of a second chart request, for reference.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_startup --runs 3
+    python -m benchmarks.bench_startup --runs 3 --no-wait
+    python -m benchmarks.bench_startup --workers 2
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.stub_llm import start_stub_server
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def wait_for(client, path, start, timeout=120):
+    while time.perf_counter() - start < timeout:
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"{path} not ready after {timeout}s")
+
+
+def timed_post(client, message):
+    start = time.perf_counter()
+    response = client.post("/api/chat", json={"message": message, "cache": False})
+    assert response.json().get("type") in ("image", "file"), response.text
+    return time.perf_counter() - start
+
+
+def run_once(args, llm_url):
+    env = {**os.environ, "ANYTHING_LLM_URL": llm_url, "PORT": str(args.port),
+           "WEB_CONCURRENCY": str(args.workers), "LOG_LEVEL": "WARNING"}
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        server = subprocess.Popen([sys.executable, MAIN], cwd=directory, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=120) as client:
+                result = {"health": wait_for(client, "/health", start)}
+                if not args.no_wait:
+                    result["ready"] = wait_for(client, "/ready", start)
+                result["first chart"] = timed_post(client, "genera un gráfico de barras de ventas 2020")
+                result["first pdf"] = timed_post(client, "genera un pdf del informe anual")
+                result["second chart"] = timed_post(client, "genera un gráfico de líneas de ventas 2021")
+                return result
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main(args):
+    llm_url = start_stub_server(port=args.port + 1, latency=0, token_delay=0)
+    runs = [run_once(args, llm_url) for _ in range(args.runs)]
+    mode = "requests right after /health" if args.no_wait else "requests after /ready"
+    print(f"{args.runs} runs, {args.workers} worker process(es), {mode} (median seconds)")
+    for key in runs[0]:
+        print(f"{key:<14} {statistics.median(run[key] for run in runs):7.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startup benchmark")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--no-wait", action="store_true")
+    parser.add_argument("--port", type=int, default=8780)
+    main(parser.parse_args())
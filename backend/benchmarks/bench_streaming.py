@@ -0,0 +1,55 @@
+"""
+Time-to-first-token of /api/chat with and without streaming.
+
+Runs the backend on a local port against the local stub LLM server and
+measures when the first byte of the answer reaches the client. Run from
+the backend directory:
+
+    python -m benchmarks.bench_streaming --latency 0.3 --token-delay 0.05
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from benchmarks.stub_llm import serve_in_thread, start_stub_server
+
+
+async def measure(client, payload):
+    start = time.perf_counter()
+    first = None
+    async with client.stream("POST", "/api/chat", json=payload) as response:
+        async for _ in response.aiter_raw():
+            if first is None:
+                first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+async def main(latency, token_delay, runs, port):
+    os.environ["ANYTHING_LLM_URL"] = start_stub_server(
+        port=port, latency=latency, token_delay=token_delay
+    )
+    import main as backend
+
+    backend_url = serve_in_thread(backend.app, port + 1)
+    async with httpx.AsyncClient(base_url=backend_url, timeout=60) as client:
+        for label, payload in [
+            ("blocking", {"message": "hola"}),
+            ("stream", {"message": "hola", "stream": True}),
+        ]:
+            results = [await measure(client, payload) for _ in range(runs)]
+            ttft = sum(r[0] for r in results) / runs
+            total = sum(r[1] for r in results) / runs
+            print(f"{label:<10} ttft {ttft * 1000:8.1f} ms   total {total * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming TTFT benchmark")
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.05)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+    asyncio.run(main(args.latency, args.token_delay, args.runs, args.port))
@@ -0,0 +1,53 @@
+"""
+Concurrent-request throughput of the upstream call path.
+
+Compares the old blocking call (a synchronous HTTP request made inside an
+async handler) against the pooled async UpstreamClient, both hitting the
+local stub LLM server. Run from the backend directory:
+
+    python -m benchmarks.bench_upstream --requests 40 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.stub_llm import start_stub_server
+from services.upstream import UpstreamClient, anything_llm_chat
+
+PAYLOAD = {"message": "hola", "rules": "Answer always in the user language"}
+
+
+async def blocking_handler(base_url):
+    # Same shape as the previous requests.post(..., timeout=180) call
+    with httpx.Client(timeout=180) as client:
+        response = client.post(f"{base_url}/api/v1/workspace/rag/chat", json=PAYLOAD)
+    return response.json().get("textResponse", "")
+
+
+async def run(label, handler, total):
+    start = time.perf_counter()
+    await asyncio.gather(*(handler() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {total} requests in {elapsed:6.2f}s -> {total / elapsed:7.2f} req/s")
+
+
+async def main(total, latency, concurrency, port):
+    base_url = start_stub_server(port=port, latency=latency)
+    client = UpstreamClient("stub", base_url, max_concurrency=concurrency)
+
+    print(f"Stub latency {latency}s, per-host concurrency {concurrency}")
+    await run("blocking", lambda: blocking_handler(base_url), total)
+    await run("async", lambda: anything_llm_chat(client, PAYLOAD["message"], PAYLOAD["rules"]), total)
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upstream client benchmark")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency, args.concurrency, args.port))
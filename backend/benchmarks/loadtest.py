@@ -0,0 +1,173 @@
+"""
+End-to-end load test.
+
+Starts the stub LLM server (generated answers, configurable latency, token
+rate and payload size) and the backend (`python main.py` in a temporary
+working directory, so every run starts with empty caches), then sends
+closed-loop load for each scenario at each concurrency level: every client
+sends its next request as soon as the previous one is answered. Messages
+are unique, so every chart and PDF is really rendered. Reports throughput
+and p50/p95/p99 latency (and time to first token for streams), and saves
+the results as JSON (see benchmarks/results.py). Run from the backend
+directory:
+
+    python -m benchmarks.loadtest --concurrency 1 4 16 --requests 40
+    python -m benchmarks.loadtest --scenarios chat stream --latency 0.5 --tokens-per-second 30
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000   # an already running backend
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.results import compare, save, summarize
+from benchmarks.stub_llm import start_stub_server
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+# Scenario: (message template, extra request fields, expected response type)
+SCENARIOS = {
+    "chat": ("cuéntame algo sobre el tema número {n}", {}, "text"),
+    "stream": ("cuéntame algo sobre el tema número {n}", {"stream": True}, "stream"),
+    "bar": ("genera un gráfico de barras de las ventas de la tienda {n}", {}, "image"),
+    "line": ("genera un gráfico de líneas de las ventas de la tienda {n}", {}, "image"),
+    "pie": ("genera un gráfico circular de las ventas de la tienda {n}", {}, "image"),
+    "scatter": ("genera un gráfico de dispersión de las ventas de la tienda {n}", {}, "image"),
+    "pdf": ("genera un pdf del informe anual de la tienda {n}", {}, "file"),
+}
+
+
+async def send(client, scenario, n):
+    """Sends one request; returns (latency, time to first byte) or raises on a wrong answer."""
+    template, extra, expected = SCENARIOS[scenario]
+    payload = {"message": template.format(n=n), "cache": False, **extra}
+    start = time.perf_counter()
+    if expected == "stream":
+        first = None
+        async with client.stream("POST", "/api/chat", json=payload) as response:
+            async for line in response.aiter_lines():
+                if first is None and line.startswith("data:"):
+                    first = time.perf_counter() - start
+                if '"type": "error"' in line:
+                    raise RuntimeError(line)
+        return time.perf_counter() - start, first
+
+    response = await client.post("/api/chat", json=payload)
+    body = response.json()
+    if response.status_code != 200 or body.get("type") != expected:
+        raise RuntimeError(f"HTTP {response.status_code}: {str(body)[:200]}")
+    return time.perf_counter() - start, None
+
+
+async def run_level(client, scenario, concurrency, requests, numbers):
+    latencies, firsts, errors = [], [], []
+    remaining = itertools.count()
+
+    async def worker():
+        while next(remaining) < requests:
+            try:
+                latency, first = await send(client, scenario, next(numbers))
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            latencies.append(latency)
+            if first is not None:
+                firsts.append(first)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    result = {**summarize(latencies), "errors": len(errors), "throughput": round(len(latencies) / elapsed, 3)}
+    if firsts:
+        result["ttfb"] = summarize(firsts)
+    if errors:
+        print(f"    first error: {errors[0]}")
+    return result
+
+
+def wait_ready(base_url, timeout=120):
+    start = time.perf_counter()
+    with httpx.Client(base_url=base_url, timeout=5) as client:
+        while time.perf_counter() - start < timeout:
+            try:
+                if client.get("/ready").status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.1)
+    raise TimeoutError(f"Backend not ready after {timeout}s")
+
+
+async def run(args, base_url):
+    results = {}
+    numbers = itertools.count()
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=600, limits=limits) as client:
+        print(f"{'scenario':<10} {'conc':>4} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>6}")
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                result = await run_level(client, scenario, concurrency, args.requests, numbers)
+                results[f"{scenario} c={concurrency}"] = result
+                ttfb = f"   first token p50 {result['ttfb']['p50'] * 1000:.0f} ms" if "ttfb" in result else ""
+                p = {key: f"{result[key] * 1000:7.0f}ms" if result[key] is not None else "      -" for key in ("p50", "p95", "p99")}
+                print(
+                    f"{scenario:<10} {concurrency:>4} {result['throughput']:8.2f} {p['p50']:>9} "
+                    f"{p['p95']:>9} {p['p99']:>9} {result['errors']:>6}{ttfb}"
+                )
+    return results
+
+
+def main(args):
+    server = None
+    directory = None
+    llm_url = start_stub_server(
+        port=args.port + 1, latency=args.latency, text=None,
+        token_delay=1 / args.tokens_per_second if args.tokens_per_second > 0 else 0,
+        payload_bytes=args.payload_bytes, points=args.points, jitter=args.jitter,
+    )
+    base_url = args.url
+    if base_url is None:
+        directory = tempfile.TemporaryDirectory()
+        env = {**os.environ, "ANYTHING_LLM_URL": llm_url, "PORT": str(args.port), "LOG_LEVEL": "WARNING"}
+        server = subprocess.Popen([sys.executable, MAIN], cwd=directory.name, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_ready(base_url)
+        print(
+            f"Model stub: {args.latency}s latency, {args.tokens_per_second:g} tokens/s, "
+            f"{args.payload_bytes} bytes answers, {args.points} chart points; {args.requests} requests per level"
+        )
+        results = asyncio.run(run(args, base_url))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            directory.cleanup()
+
+    print(f"\nResults saved to {save('loadtest', results, args, args.output)}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end load test")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=20, help="Requests per scenario and concurrency level")
+    parser.add_argument("--latency", type=float, default=0.2, help="Model latency before the first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra model latency, up to this")
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--payload-bytes", type=int, default=2000, help="Size of chat and PDF answers")
+    parser.add_argument("--points", type=int, default=12, help="Labels in chart answers")
+    parser.add_argument("--url", help="Benchmark this running backend instead of starting one")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/loadtest-<date>-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare with")
+    main(parser.parse_args())
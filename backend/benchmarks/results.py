@@ -0,0 +1,101 @@
+"""
+Latency summaries and JSON result files shared by the benchmark suite
+(loadtest and bench_micro).
+
+Results are saved under benchmarks/results/ as
+`<kind>-<date>-<commit>.json`, with the commit, machine and arguments they
+were measured with, and can be compared with an earlier file:
+
+    python -m benchmarks.loadtest --compare benchmarks/results/loadtest-...json
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def summarize(samples):
+    """Count, mean and p50/p95/p99/max of latency samples, in seconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 6),
+        "p50": round(percentile(ordered, 50), 6),
+        "p95": round(percentile(ordered, 95), 6),
+        "p99": round(percentile(ordered, 99), 6),
+        "max": round(ordered[-1], 6),
+    }
+
+
+def _git(*args):
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=Path(__file__).parent, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def metadata():
+    """Commit and machine the results were measured on."""
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def save(kind, results, args, path=None):
+    """
+    Writes results to a JSON file.
+
+    Args:
+        kind: Benchmark name, used in the default file name
+        results: Dict of case name to summary dict
+        args: argparse namespace the benchmark ran with
+        path: Output file (defaults to benchmarks/results/<kind>-<date>-<commit>.json)
+
+    Returns:
+        Path: The written file
+    """
+    meta = metadata()
+    if path is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}-{meta['commit'] or 'nogit'}.json"
+    path = Path(path)
+    payload = {"kind": kind, "meta": meta, "args": vars(args), "results": results}
+    path.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def compare(previous_path, results, metrics=("p50", "p95", "p99", "throughput")):
+    """Prints the change of every metric against an earlier result file."""
+    previous = json.loads(Path(previous_path).read_text(encoding="utf-8"))
+    print(f"\nCompared with {previous['meta'].get('commit')} ({previous['meta'].get('date')}):")
+    for name, current in results.items():
+        before = previous["results"].get(name)
+        if before is None:
+            continue
+        changes = []
+        for metric in metrics:
+            old, new = before.get(metric), current.get(metric)
+            if old and new is not None:
+                changes.append(f"{metric} {(new - old) / old * 100:+6.1f}%")
+        print(f"  {name:<28} {'  '.join(changes)}")
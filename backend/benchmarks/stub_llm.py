@@ -0,0 +1,192 @@
+"""
+Local stand-in for the AnythingLLM and OpenAI chat endpoints.
+
+Answers after a fixed delay (plus optional random jitter) and streams tokens
+at a fixed rate, so the backend can be load-tested without a real model. By
+default every answer is the same short JSON text; with `text=None` the
+answer is generated from the prompt, deterministically: chart data with
+`points` labels for JSON prompts, a markdown report of about
+`payload_bytes` for PDF prompts and plain prose otherwise. Run it
+standalone with:
+
+    python -m benchmarks.stub_llm --port 8765 --latency 0.5 --tokens-per-second 50 --generate
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import zlib
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+STUB_TEXT = '{"2020": 50000000, "2021": 55000000, "2022": 60000000, "2023": 58000000}'
+
+WORDS = (
+    "el informe resume la evolución de las ventas los costes y los márgenes de la empresa durante "
+    "el último año con especial atención a las regiones con mayor crecimiento y a los riesgos"
+).split()
+
+
+def chart_answer(rng, points):
+    """JSON object of `points` year labels to values."""
+    return json.dumps({str(2000 + i): rng.randint(1000, 100000) for i in range(points)})
+
+
+def prose_answer(rng, size):
+    """Plain sentences up to about `size` bytes."""
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    text = " ".join(words)
+    return ". ".join(sentence.capitalize() for sentence in text.split(" y ")) + "."
+
+
+def report_answer(rng, size):
+    """Markdown-ish report (title, sections, lists, tables) of about `size` bytes."""
+    parts = ["Informe generado"]
+    section = 0
+    while sum(len(part) for part in parts) < size:
+        section += 1
+        rows = "\n".join(f"| Región {j} | {rng.randint(10, 999)} | {rng.randint(10, 999)} |" for j in range(4))
+        parts += [
+            f"## Sección {section}",
+            prose_answer(rng, 400),
+            "- Primer punto\n- Segundo punto\n- Tercer punto",
+            f"| Región | 2023 | 2024 |\n|---|---|---|\n{rows}",
+        ]
+    return "\n\n".join(parts)
+
+
+def answer_for(prompt, text=STUB_TEXT, payload_bytes=2000, points=8):
+    """Returns the fixed text, or an answer generated from the prompt when `text` is None."""
+    if text is not None:
+        return text
+    rng = random.Random(zlib.crc32(prompt.encode("utf-8")))
+    if "JSON" in prompt:
+        return chart_answer(rng, points)
+    if "pdf" in prompt.lower():
+        return report_answer(rng, payload_bytes)
+    return prose_answer(rng, payload_bytes)
+
+
+def create_stub_app(latency=0.5, text=STUB_TEXT, token_delay=0.02, payload_bytes=2000, points=8, jitter=0.0):
+    """
+    Builds the stub application.
+
+    Args:
+        latency: Seconds to wait before answering (or before the first token)
+        text: Text returned as the model response, or None to generate it
+            from the prompt
+        token_delay: Seconds between streamed tokens (1 / token rate); whole
+            answers also take this long per token
+        payload_bytes: Approximate size of generated prose and reports
+        points: Number of labels of generated chart data
+        jitter: Up to this many seconds are added at random to the latency
+    """
+    app = FastAPI(title="Stub LLM")
+
+    def tokens_for(prompt):
+        return [t + " " for t in answer_for(prompt, text, payload_bytes, points).split(" ")]
+
+    async def think():
+        await asyncio.sleep(latency + (random.uniform(0, jitter) if jitter else 0))
+
+    async def sse(events):
+        await think()
+        for event in events:
+            yield f"data: {json.dumps(event)}\n\n"
+            await asyncio.sleep(token_delay)
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"online": True}
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model"}]}
+
+    @app.post("/api/v1/workspace/{workspace}/chat")
+    async def anything_llm_chat(workspace: str, request: Request):
+        body = await request.json()
+        tokens = tokens_for(body.get("message", ""))
+        await think()
+        await asyncio.sleep(token_delay * len(tokens))
+        return {"textResponse": "".join(tokens).rstrip()}
+
+    @app.post("/api/v1/workspace/{workspace}/stream-chat")
+    async def anything_llm_stream(workspace: str, request: Request):
+        body = await request.json()
+        events = [
+            {"type": "textResponseChunk", "textResponse": t, "close": False}
+            for t in tokens_for(body.get("message", ""))
+        ]
+        events.append({"type": "textResponseChunk", "textResponse": "", "close": True})
+        return StreamingResponse(sse(events), media_type="text/event-stream")
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat(request: Request):
+        body = await request.json()
+        messages = body.get("messages") or [{}]
+        tokens = tokens_for(messages[-1].get("content", ""))
+        if body.get("stream"):
+            events = [{"choices": [{"delta": {"content": t}}]} for t in tokens]
+
+            async def openai_events():
+                async for line in sse(events):
+                    yield line
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(openai_events(), media_type="text/event-stream")
+
+        await think()
+        await asyncio.sleep(token_delay * len(tokens))
+        return {"choices": [{"message": {"role": "assistant", "content": "".join(tokens).rstrip()}}]}
+
+    return app
+
+
+def serve_in_thread(app, port):
+    """Runs an ASGI app with uvicorn in a background thread and returns its base URL."""
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def start_stub_server(port=8765, latency=0.5, text=STUB_TEXT, token_delay=0.02, **options):
+    """
+    Starts the stub in a background thread and returns its base URL.
+    `options` are passed to create_stub_app (payload_bytes, points, jitter).
+    """
+    return serve_in_thread(create_stub_app(latency, text, token_delay, **options), port)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub LLM server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=50)
+    parser.add_argument("--generate", action="store_true", help="Generate answers from the prompt")
+    parser.add_argument("--payload-bytes", type=int, default=2000)
+    parser.add_argument("--points", type=int, default=8)
+    args = parser.parse_args()
+    uvicorn.run(
+        create_stub_app(
+            args.latency, None if args.generate else STUB_TEXT,
+            1 / args.tokens_per_second if args.tokens_per_second > 0 else 0,
+            args.payload_bytes, args.points, args.jitter,
+        ),
+        host="127.0.0.1",
+        port=args.port,
+    )
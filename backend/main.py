@@ -1,36 +1,178 @@
+import time
+
+STARTED = time.perf_counter()
+
 import os
-import re
 import json
-import requests
-import base64
+import uuid
+import asyncio
+import sys
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request
+
+# Before the services read their settings from the environment
+load_dotenv()
+
+from fastapi import FastAPI, File, Form, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from mcp.server import Server
-import mcp.types as types
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import logging
 from pathlib import Path
-from tools.generate_pdf import generate_pdf
-from tools.generate_chart import generate_chart
+from tools.chart_data import parse_data_from_text
+from tools.render_options import (
+    CHART_DPI, CHART_FORMATS, CHART_PROFILES, CHART_TYPES, DEFAULT_CHART_PROFILE, PDF_STYLE,
+)
+from services.providers import LOCAL_POOL, OPENAI_POOL, build_model_router
+from services.render_pool import RenderPool, RenderQueueFull, RenderTimeout
+from services.file_store import FileStore
+from services.render_cache import RenderCache, render_key
+from services.response_cache import ResponseCache
+from services.file_response import file_response
+from services.intent_router import build_default_router, slugify
+from services.conversation_store import (
+    HISTORY_PAGE_SIZE,
+    ConversationStore,
+    is_valid_conversation_id,
+    with_context,
+)
+from services.admission import SingleFlight, UpstreamOverloaded, current_client
+from services.batch import BATCH_MAX_JOBS, BatchManager
+from services.metrics import CONTENT_TYPE, CallbackMetric, exposition
+from services.tracing import TracingMiddleware, span
+from services.rag_index import RAG_APPROXIMATE, RAG_DIR, RAG_TOP_K, VectorIndex
+from services.rag_ingest import RAG_EXTENSIONS, IngestManager, embed_texts, save_upload
 
 # Logging configuration
+# Per-request details are logged at DEBUG: set LOG_LEVEL=DEBUG to see them
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
 logger = logging.getLogger(__name__)
 
-# Environment variables
-load_dotenv()
+# Services, built by build_services() when the app starts. The render and
+# ingest workers re-import this module (spawn), so importing it must not open
+# databases, scan the files directory or allocate caches.
+model_router = None
+upstream_calls = None
+render_pool = None
+batch_manager = None
+intent_router = None
+response_cache = None
+conversation_store = None
+rag_index = None
+ingest_manager = None
+file_store = None
+render_cache = None
+
+FILES_DIR = Path("files")
+UPLOADS_DIR = RAG_DIR / "uploads"
+
+# Render jobs, by name: matplotlib, reportlab and Pillow are only imported
+# by the render workers, which keeps the API process quick to start
+GENERATE_CHART = "tools.generate_chart:generate_chart"
+GENERATE_PDF = "tools.generate_pdf:generate_pdf"
+MAKE_PREVIEW = "tools.image_variants:make_preview"
+CONVERT_IMAGE = "tools.image_variants:convert_image"
+BUNDLERS = {"zip": "tools.bundle:bundle_zip", "pdf": "tools.bundle:bundle_pdf"}
+
+# Web server (python main.py); each worker process runs its own render pool
+# and caches, and one of them sweeps the shared files directory
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+
+# Set once warm-up is done; /ready answers 503 until then
+warmed_up = asyncio.Event()
+
+
+def build_services(sweep_files=True):
+    """
+    Builds the stores, caches, pools and routers used by the endpoints.
+
+    Args:
+        sweep_files: Whether this process may take over sweeping the files
+            directory; the stdio MCP server only writes and looks files up,
+            so it runs next to the web server on the same directory
+    """
+    global model_router, upstream_calls, render_pool, batch_manager, intent_router, response_cache
+    global conversation_store, rag_index, ingest_manager, file_store, render_cache
+
+    # Model providers (AnythingLLM, LM Studio replicas, OpenAI), grouped in pools
+    # and routed by latency, weight or failover order
+    model_router = build_model_router()
+
+    # Identical concurrent upstream calls share one request
+    upstream_calls = SingleFlight()
+
+    # Process pool for chart and PDF rendering
+    render_pool = RenderPool()
+
+    # Batch generation: bounded model fan-out, renders kept within the pool's workers
+    batch_manager = BatchManager(render_concurrency=render_pool.workers)
+
+    # Keyword router deciding between chart, PDF and plain chat
+    intent_router = build_default_router()
+
+    # Cache of model answers (opt-in with RESPONSE_CACHE_ENABLED), namespaced by pool
+    response_cache = ResponseCache()
+
+    # Conversation history (SQLite) and prompt context windowing
+    conversation_store = ConversationStore()
+
+    # Local document retrieval (RAG) backing /upload and /query
+    rag_index = VectorIndex()
+    ingest_manager = IngestManager(rag_index)
+
+    # Generated files and the cache of rendered charts and PDFs
+    file_store = FileStore(FILES_DIR, sweep=sweep_files)
+    render_cache = RenderCache(file_store)
+
+
+async def warm_up():
+    """
+    Starts the render workers (each one renders a throwaway chart and PDF)
+    and runs the data parser and embedder once, so the first real request
+    does not pay for imports, font caches or styles.
+    """
+    start = time.perf_counter()
+    try:
+        await render_pool.warm_up()
+        parse_data_from_text('{"a": 1, "b": 2}')
+        embed_texts(["warm up"])
+    except Exception as e:
+        logger.error(f"❌ Warm-up failed: {str(e)}")
+        return
+    warmed_up.set()
+    logger.info(
+        f"✅ Ready: warm-up {time.perf_counter() - start:.2f}s, "
+        f"{time.perf_counter() - STARTED:.2f}s since start"
+    )
+
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-ANYTHING_LLM_URL = os.getenv("ANYTHING_LLM_URL")
-ANYTHING_LLM_API_KEY = os.getenv("ANYTHING_LLM_API_KEY")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    build_services(sweep_files=getattr(app.state, "sweep_files", True))
+    await conversation_store.start()
+    file_store.start()
+    model_router.start()
+    # Warm-up runs in the background: the server accepts connections (and
+    # answers /health) right away, and reports ready on /ready once done
+    warm_up_task = asyncio.create_task(warm_up())
+    yield
+    warm_up_task.cancel()
+    await file_store.close()
+    await conversation_store.close()
+    await ingest_manager.shutdown()
+    await batch_manager.shutdown()
+    await model_router.close()
+    render_pool.shutdown()
 
-# MCP Server and FastAPI app
-mcp_server = Server("atom-llm-server")
-app = FastAPI(title="Atom LLM Backend")
+
+# FastAPI app
+app = FastAPI(title="Atom LLM Backend", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -39,65 +181,165 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-Id"],
 )
+# Per-request trace: Server-Timing header, latency histogram, slow request log
+app.add_middleware(TracingMiddleware)
 
-# Files configuration
-FILES_DIR = Path("files")
-FILES_DIR.mkdir(exist_ok=True)
+def preview_name(filename):
+    """Returns the filename of the preview rendition of a chart."""
+    return f"{filename.rsplit('.', 1)[0]}.preview.webp"
 
-# Chat endpoint
-@app.post("/api/chat")
-async def chat_router(request: Request):
+
+def sse_event(payload):
+    """Formats a payload as a Server-Sent Events message."""
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def client_id(request):
+    """Identifies the client for fair upstream queueing (X-Client-Id header or IP)."""
+    return request.headers.get("x-client-id") or (request.client.host if request.client else "anonymous")
+
+
+def overloaded_response(error, content):
+    """503 answer for a request shed by upstream admission control."""
+    logger.warning(f"🚦 {str(error)}")
+    return JSONResponse(status_code=503, content=content, headers={"Retry-After": str(error.retry_after)})
+
+
+def stream_response(chunks, on_complete=None, start=None):
     """
-    Receives a message from the frontend and routes it to the appropriate model.
-    If the message contains keywords like 'generar' and 'pdf', it triggers a local tool.
+    Wraps an upstream token generator into an SSE response.
+
+    Tokens are forwarded one by one as they arrive. Starlette only pulls the
+    next token once the previous one has been written to the socket, and it
+    cancels the generator when the client disconnects, which closes the
+    upstream connection as well.
 
     Args:
-        request (Request): The incoming request containing the message and model choice.
+        chunks: Async generator of text chunks
+        on_complete: Optional coroutine function receiving the full text
+            once the stream finished without errors
+        start: perf_counter() value time to first token is measured from
+            (defaults to when the response starts)
 
     Returns:
-        dict: A response dictionary containing either text or file information.
+        StreamingResponse: text/event-stream response
     """
-    logger.info("📨 New request received at /api/chat")
+    async def events():
+        started = start or time.perf_counter()
+        ttft = None
+        parts = []
+        try:
+            async for chunk in chunks:
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                    logger.debug("⚡ Time to first token: %.3fs", ttft)
+                if on_complete:
+                    parts.append(chunk)
+                yield sse_event({"type": "token", "text": chunk})
+            if on_complete:
+                await on_complete("".join(parts))
+            yield sse_event({"type": "done", "ttft": ttft})
+        except Exception as e:
+            logger.error(f"❌ Error while streaming: {str(e)}")
+            yield sse_event({"type": "error", "response": str(e)})
+        finally:
+            await chunks.aclose()
 
-    body = await request.json()
-    user_message = body.get("message", "")
-    is_using_chatgpt = body.get("isUsingChatGPT", False)
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    logger.info(f"💬 User message: {user_message[:100]}...")
-    logger.info(f"🤖 Using ChatGPT: {is_using_chatgpt}")
 
+async def single_chunk(text):
+    """Async generator yielding a whole cached answer as one chunk."""
+    yield text
+
+
+async def prepend(first, chunks):
+    """Async generator yielding an already received chunk and then the rest."""
     try:
-        logger.info("🔍 Checking if it's a PDF generation request...")
-        should_generate_pdf = (
-            ("generar" in user_message.lower() or "genera" in user_message.lower()) 
-            and "pdf" in user_message.lower()
-            and not is_using_chatgpt
-        )
-        
-        logger.info("🔍 Checking if it's a chart generation request...")
-        should_generate_chart = (
-            ("generar" in user_message.lower() or "genera" in user_message.lower() or "crear" in user_message.lower() or "crea" in user_message.lower()) 
-            and ("gráfica" in user_message.lower() or "grafica" in user_message.lower() or "gráfico" in user_message.lower() or "grafico" in user_message.lower() or "chart" in user_message.lower())
-            and not is_using_chatgpt
+        yield first
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await chunks.aclose()
+
+
+async def open_stream(chunks, on_complete=None):
+    """
+    Waits for the first upstream chunk and then answers with stream_response.
+
+    Admission control and upstream errors happen before the first token, so
+    waiting for it lets them be answered with a proper HTTP status (503 when
+    the request was shed) instead of an SSE error event.
+    """
+    start = time.perf_counter()
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        return stream_response(single_chunk(""), on_complete, start)
+    except BaseException:
+        await chunks.aclose()
+        raise
+    return stream_response(prepend(first, chunks), on_complete, start)
+
+
+async def ask_model(message, rules, use_cache=True, target=LOCAL_POOL, summary="", turns=()):
+    """
+    Calls a model pool (or provider) through the router, going through the
+    response cache. Identical calls already in flight are shared instead of
+    sent again.
+
+    Args:
+        message: Prompt sent to the model
+        rules: Extra instructions for the model
+        use_cache: False to bypass the response cache for this request
+        target: Pool or provider name
+        summary: Summary of the earlier conversation, if any
+        turns: Recent conversation turns, if any
+
+    Returns:
+        str: Raw text response of the model
+    """
+    # Answers depend on the context, so it is part of the cache key
+    prompt = with_context(message, summary, turns)
+    if use_cache:
+        cached = response_cache.get(target, target, rules, prompt)
+        if cached is not None:
+            logger.debug("♻️ Response cache hit")
+            return cached
+
+    with span("llm"):
+        text_response = await upstream_calls.do(
+            (target, rules, prompt),
+            lambda: model_router.chat(target, message, rules, summary, turns),
         )
-        
-        # Detect chart type
-        chart_type = 'bar'  # Default
-        if should_generate_chart:
-            if "línea" in user_message.lower() or "linea" in user_message.lower() or "line" in user_message.lower():
-                chart_type = 'line'
-            elif "circular" in user_message.lower() or "pie" in user_message.lower() or "pastel" in user_message.lower():
-                chart_type = 'pie'
-            elif "dispersión" in user_message.lower() or "dispersion" in user_message.lower() or "scatter" in user_message.lower():
-                chart_type = 'scatter'
-        
-        if should_generate_chart:
-            logger.info(f"📊 Action detected: chart generation type {chart_type} with local model!")
-            logger.info("📝 Getting data from local model first...")
-            
-            # Create specific prompt to get data in JSON format
-            json_prompt = f"""{user_message}
+    if use_cache:
+        response_cache.put(target, target, rules, prompt, text_response)
+    return text_response
+
+
+async def remember_turn(conversation_id, reply, data=None):
+    """Stores the assistant answer of a conversation turn, if the request has a conversation."""
+    if conversation_id:
+        await conversation_store.append(conversation_id, "assistant", reply, data)
+
+
+def remember_turn_of(conversation_id):
+    """Returns a stream_response completion callback storing the answer."""
+    async def remember(text):
+        await remember_turn(conversation_id, text)
+    return remember
+
+
+async def chart_data(user_message, use_cache=True, target=LOCAL_POOL):
+    """Asks a model for the data of a chart, as JSON text."""
+    # Create specific prompt to get data in JSON format
+    json_prompt = f"""{user_message}
 
 IMPORTANT: Respond ONLY with a valid JSON object in this exact format:
 {{"label1": value1, "label2": value2, "label3": value3}}
@@ -107,193 +349,760 @@ Example for football club income:
 
 - Keys must be labels or categories (years, months, names, etc.)
 - Values must be numbers
+- For several series use: {{"series": {{"name1": {{"label1": value1}}, "name2": {{"label1": value1}}}}}}
 - DO NOT include explanatory text, ONLY the JSON
 - DO NOT use markdown or code blocks, ONLY pure JSON"""
-            
-            logger.info(f"🏠 Calling local model to generate data...")
-            response = requests.post(
-                f"{ANYTHING_LLM_URL}/api/v1/workspace/rag/chat",
-                headers={
-                    "Authorization": f"Bearer {ANYTHING_LLM_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={"message": json_prompt, "rules": "Answer always in the user language. Return ONLY valid JSON, no explanatory text."},
-                timeout=180,
-            )
-            data = response.json()
-            text_response = data.get("textResponse", "").replace("**", "").strip()
-            
-            logger.info(f"📄 Model response: {text_response[:200]}...")
-            
-            logger.info(f"📄 Data generated ({len(text_response)} characters)")
-            
-            import time
-            timestamp = int(time.time())
-            topic = user_message.lower().replace("genera", "").replace("generar", "").replace("crea", "").replace("crear", "").replace("gráfica", "").replace("grafica", "").replace("gráfico", "").replace("grafico", "").replace("chart", "").replace("un", "").replace("de", "").strip()
-            topic_slug = re.sub(r'[^\w\s-]', '', topic).strip().replace(' ', '_')[:50]
-            filename = f"chart_{chart_type}_{topic_slug}_{timestamp}.png"
-            filepath = FILES_DIR / filename
-            
-            logger.info(f"📊 Generating chart: {filename}")
-            logger.info(f"📊 Saving to: {filepath}")
-            generate_chart(filepath, text_response, chart_type)
-            logger.info(f"✅ Chart generated successfully!")
-            logger.info(f"📂 File exists: {filepath.exists()}")
-            logger.info(f"📊 File size: {filepath.stat().st_size if filepath.exists() else 0} bytes")
-            
-            # Read image and convert to base64 to display in chat
-            with open(filepath, 'rb') as image_file:
-                image_data = base64.b64encode(image_file.read()).decode('utf-8')
-            
-            response_data = {
-                "type": "image",
-                "filename": filename,
-                "imageData": f"data:image/png;base64,{image_data}",
-                "url": f"http://localhost:8000/files/{filename}",
-                "message": f"Chart type {chart_type} generated successfully",
-            }
-            logger.info(f"📤 Sending response to frontend with base64 image")
+    
+    logger.debug("🧠 Calling %s model to generate data...", target)
+    text_response = await ask_model(
+        json_prompt,
+        "Answer always in the user language. Return ONLY valid JSON, no explanatory text.",
+        use_cache,
+        target,
+    )
+    text_response = text_response.replace("**", "").strip()
+    
+    logger.debug("📄 Data generated (%d characters): %.200s", len(text_response), text_response)
+    return text_response
+
+
+def chart_render_options(values):
+    """
+    Reads the render options of a chart request: "profile" ('preview',
+    'standard', 'print'), "format" ('png', 'svg', 'pdf') and "dpi" (the
+    profile's by default, between 50 and CHART_DPI).
+
+    Raises:
+        ValueError: If the profile, format or dpi is invalid
+    """
+    profile = values.get("profile") or DEFAULT_CHART_PROFILE
+    if not isinstance(profile, str) or profile not in CHART_PROFILES:
+        raise ValueError(f"Unknown profile '{profile}'")
+    format = values.get("format") or "png"
+    if not isinstance(format, str) or format not in CHART_FORMATS:
+        raise ValueError(f"Unknown format '{format}'")
+    dpi = values.get("dpi")
+    if dpi is None:
+        dpi = CHART_PROFILES[profile]["dpi"]
+    else:
+        try:
+            dpi = min(max(int(dpi), 50), CHART_DPI)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid dpi '{dpi}': expected a whole number such as 150") from None
+    return {"profile": profile, "format": format, "dpi": dpi}
+
+
+async def render_chart(text_response, chart_type, topic_slug, profile=DEFAULT_CHART_PROFILE, format="png", dpi=None):
+    """
+    Renders a chart from the model data, going through the render cache.
+
+    Returns:
+        dict: Image response with the chart and preview URLs (a file
+        response for PDF charts)
+    """
+    dpi = dpi or CHART_PROFILES[profile]["dpi"]
+    # Same data, type and render options always produce the same file
+    with span("parse"):
+        parsed_data = parse_data_from_text(text_response)
+    cache_key = render_key("chart", {
+        "data": parsed_data or text_response,
+        "chart_type": chart_type,
+        "dpi": dpi,
+        "figsize": CHART_PROFILES[profile]["figsize"],
+        "format": format,
+    })
+
+    async with render_cache.lock(cache_key):
+        filename = render_cache.get(cache_key)
+        if filename:
+            logger.debug("♻️ Render cache hit: %s", filename)
+        else:
+            filename = f"chart_{chart_type}_{topic_slug}_{cache_key}.{format}"
+
+            logger.debug("📊 Generating chart: %s (%s, %d dpi)", filename, profile, dpi)
+            with span("render"), file_store.writing(filename) as filepath:
+                # The output format follows the file extension
+                await render_pool.run(GENERATE_CHART, filepath, text_response, chart_type, dpi, profile)
+            render_cache.put(cache_key, filename)
+
+        preview = preview_name(filename)
+        if preview not in file_store:
+            with span("preview"), file_store.writing(preview) as filepath:
+                if format == "png":
+                    await render_pool.run(MAKE_PREVIEW, file_store.path_of(filename), filepath)
+                else:
+                    # Vector charts are not read back: the preview is rendered directly
+                    await render_pool.run(GENERATE_CHART, filepath, text_response, chart_type, None, "preview")
+
+    # The full image is fetched by URL; the chat only shows the small preview
+    response_data = {
+        "type": "file" if format == "pdf" else "image",
+        "filename": filename,
+        "url": f"http://localhost:8000/files/{filename}",
+        "previewUrl": f"http://localhost:8000/files/{preview}",
+        "message": f"Chart type {chart_type} generated successfully",
+    }
+    return response_data
+
+
+PDF_RULES = (
+    "Answer always in the user language. To include a chart, add a block that starts with a line "
+    "```chart bar (or line, pie, scatter), then a JSON object of labels to numbers, then a line ```"
+)
+
+
+async def pdf_content(user_message, use_cache=True, target=LOCAL_POOL):
+    """Asks a model for the content of a PDF document."""
+    logger.debug("🧠 Calling %s model to generate content...", target)
+    text_response = await ask_model(user_message, PDF_RULES, use_cache, target)
+    # Markdown-ish emphasis, headings, lists, tables and charts are laid out by generate_pdf
+    text_response = text_response.strip()
+    
+    logger.debug("📄 Content generated (%d characters)", len(text_response))
+    return text_response
+
+
+async def render_pdf(text_response, topic_slug):
+    """
+    Renders a PDF from the model content, going through the render cache.
+
+    Returns:
+        dict: File response with the PDF URL
+    """
+    cache_key = render_key("pdf", {"text": text_response, "style": PDF_STYLE})
+
+    async with render_cache.lock(cache_key):
+        filename = render_cache.get(cache_key)
+        if filename:
+            logger.debug("♻️ Render cache hit: %s", filename)
+        else:
+            filename = f"document_{topic_slug}_{cache_key}.pdf"
+
+            logger.debug("📝 Generating PDF: %s", filename)
+            with span("render"), file_store.writing(filename) as filepath:
+                await render_pool.run(GENERATE_PDF, filepath, text_response)
+            render_cache.put(cache_key, filename)
+
+    response_data = {
+        "type": "file",
+        "filename": filename,
+        "url": f"http://localhost:8000/files/{filename}",
+        "message": "PDF generated successfully",
+    }
+    return response_data
+
+
+# Chat endpoint
+@app.post("/api/chat")
+async def chat_router(request: Request):
+    """
+    Receives a message from the frontend and routes it to the appropriate model.
+    If the message contains keywords like 'generar' and 'pdf', it triggers a tool,
+    whichever model answers it.
+    "provider" names the model pool or provider (default "local";
+    "isUsingChatGPT": true selects "openai").
+    Plain chat messages sent with "stream": true are answered as Server-Sent Events.
+    Sending "cache": false bypasses the response cache for the request.
+    Charts take a render "profile" ('preview', 'standard', 'print'), a
+    "format" ('png', 'svg', 'pdf') and a "dpi" override.
+    With a "conversationId", the turn is stored and plain chat messages are
+    sent with the recent turns and a summary of older ones as context.
+    Answers 503 with Retry-After when the upstream model is overloaded.
+
+    Args:
+        request (Request): The incoming request containing the message and model choice.
+
+    Returns:
+        dict: A response dictionary containing either text or file information,
+        or a text/event-stream response when streaming was requested.
+    """
+    body = await request.json()
+    current_client.set(client_id(request))
+    user_message = body.get("message", "")
+    is_using_chatgpt = body.get("isUsingChatGPT", False)
+    target = body.get("provider") or (OPENAI_POOL if is_using_chatgpt else LOCAL_POOL)
+    stream = body.get("stream", False)
+    use_cache = body.get("cache", True)
+    conversation_id = body.get("conversationId")
+    if conversation_id is not None and not is_valid_conversation_id(conversation_id):
+        return JSONResponse(status_code=400, content={"type": "error", "response": "Invalid conversationId"})
+    if target not in model_router:
+        return JSONResponse(status_code=400, content={"type": "error", "response": f"Unknown provider '{target}'"})
+
+    logger.debug("💬 User message (provider: %s): %.100s", target, user_message)
+
+    try:
+        route = intent_router.route(user_message)
+        logger.debug("🔍 Intent: %s (variant: %s, topic: %s)", route.intent, route.variant, route.topic)
+
+        should_generate_chart = route.intent == "chart"
+        should_generate_pdf = route.intent == "pdf"
+        chart_type = route.variant or 'bar'
+        topic_slug = route.topic
+        if should_generate_chart:
+            # Render options only apply to charts; other messages ignore them
+            try:
+                render_options = chart_render_options(body)
+            except ValueError as e:
+                return JSONResponse(status_code=400, content={"type": "error", "response": str(e)})
+
+        # Context is read before the new message joins the conversation
+        summary, turns = ("", [])
+        if conversation_id:
+            with span("history"):
+                summary, turns = await conversation_store.context(conversation_id)
+            await conversation_store.append(conversation_id, "user", user_message)
+        
+        if should_generate_chart:
+            logger.debug("📊 Action detected: chart generation type %s with %s model", chart_type, target)
+            text_response = await chart_data(user_message, use_cache, target)
+            response_data = await render_chart(text_response, chart_type, topic_slug, **render_options)
+            await remember_turn(conversation_id, response_data["message"], response_data)
             return response_data
         
         if should_generate_pdf:
-            logger.info("🧾 Action detected: PDF generation with local model!")
-            logger.info("📝 Getting content from local model first...")
-            
-            logger.info(f"🏠 Calling local model to generate content...")
-            response = requests.post(
-                f"{ANYTHING_LLM_URL}/api/v1/workspace/rag/chat",
-                headers={
-                    "Authorization": f"Bearer {ANYTHING_LLM_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={"message": user_message, "rules": "Answer always in the user language"},
-                timeout=180,
-            )
-            data = response.json()
-            text_response = data.get("textResponse", "").replace("**", "").strip()
-            
-            logger.info(f"📄 Content generated ({len(text_response)} characters)")
-            
-            import time
-            timestamp = int(time.time())
-            topic = user_message.lower().replace("genera", "").replace("generar", "").replace("pdf", "").replace("un", "").replace("de", "").strip()
-            topic_slug = re.sub(r'[^\w\s-]', '', topic).strip().replace(' ', '_')[:50]
-            filename = f"document_{topic_slug}_{timestamp}.pdf"
-            filepath = FILES_DIR / filename
-            
-            logger.info(f"📝 Generating PDF: {filename}")
-            logger.info(f"📝 Saving to: {filepath}")
-            generate_pdf(filepath, text_response)
-            logger.info(f"✅ PDF generated successfully!")
-            logger.info(f"📂 File exists: {filepath.exists()}")
-            logger.info(f"📊 File size: {filepath.stat().st_size if filepath.exists() else 0} bytes")
-            
-            response_data = {
-                "type": "file",
-                "filename": filename,
-                "url": f"http://localhost:8000/files/{filename}",
-                "message": "PDF generated successfully",
-            }
-            logger.info(f"📤 Sending response to frontend: {json.dumps(response_data, indent=2)}")
+            logger.debug("🧾 Action detected: PDF generation with %s model", target)
+            text_response = await pdf_content(user_message, use_cache, target)
+            response_data = await render_pdf(text_response, topic_slug)
+            await remember_turn(conversation_id, response_data["message"], response_data)
             return response_data
         
-        logger.info("💬 Not PDF generation (or using ChatGPT), processing as normal message...")
-        
-        if is_using_chatgpt:
-            logger.info("🌐 Calling ChatGPT API...")
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {OPENAI_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": "gpt-4o-mini",
-                    "messages": [
-                        {"role": "system", "content": "Answer always in the user language"},
-                        {"role": "user", "content": user_message},
-                    ],
-                },
-                timeout=180,
-            )
-            data = response.json()
-            text_response = data["choices"][0]["message"]["content"].strip()
-            return {"type": "text", "response": text_response}
-
-        logger.info(f"🏠 Calling local model: {ANYTHING_LLM_URL}/api/v1/workspace/rag/chat")
-        response = requests.post(
-            f"{ANYTHING_LLM_URL}/api/v1/workspace/rag/chat",
-            headers={
-                "Authorization": f"Bearer {ANYTHING_LLM_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={"message": user_message, "rules": "Answer always in the user language"},
-            timeout=180,
-        )
+        rules = "Answer always in the user language"
+        if stream:
+            # Answers depend on the context, so it is part of the cache key
+            prompt = with_context(user_message, summary, turns)
+            cached = response_cache.get(target, target, rules, prompt) if use_cache else None
+            if cached is not None:
+                logger.debug("♻️ Response cache hit")
+                return stream_response(single_chunk(cached), remember_turn_of(conversation_id))
 
-        data = response.json()
-        text_response = data.get("textResponse", "").replace("**", "").strip()
+            async def remember(text):
+                if use_cache:
+                    response_cache.put(target, target, rules, prompt, text)
+                await remember_turn(conversation_id, text.replace("**", "").strip())
 
-        logger.info("💡 Text response from local model sent.")
+            logger.debug("🧠 Streaming from %s model", target)
+            return await open_stream(model_router.stream(target, user_message, rules, summary, turns), remember)
+
+        logger.debug("🧠 Calling %s model", target)
+        text_response = await ask_model(user_message, rules, use_cache, target, summary, turns)
+        text_response = text_response.replace("**", "").strip()
+        await remember_turn(conversation_id, text_response)
         return {"type": "text", "response": text_response}
 
+    except UpstreamOverloaded as e:
+        return overloaded_response(e, {"type": "error", "response": str(e)})
+
+    except RenderQueueFull as e:
+        logger.warning(f"🚦 {str(e)}")
+        return JSONResponse(status_code=429, content={"type": "error", "response": str(e)})
+
+    except RenderTimeout as e:
+        logger.error(f"⏱️ {str(e)}")
+        return JSONResponse(status_code=504, content={"type": "error", "response": str(e)})
+
     except Exception as e:
         logger.error(f"❌ Error in chat_router: {str(e)}")
         return {"type": "error", "response": str(e)}
 
 
+# Batch generation endpoints
+def parse_batch_job(raw):
+    """
+    Validates one batch job: {"message", "type" ("chart"/"pdf", detected
+    from the message if missing), "chartType", "profile", "dpi"}. Batch
+    charts are PNG images, so they can be bundled.
+
+    Raises:
+        ValueError: If the job is not a chart or PDF request
+    """
+    message = raw.get("message") if isinstance(raw, dict) else None
+    if not isinstance(message, str) or not message.strip():
+        raise ValueError("Every job needs a non-empty 'message'")
+    route = intent_router.route(message)
+    kind = raw.get("type") or route.intent
+    if kind not in ("chart", "pdf"):
+        raise ValueError(f"Jobs must be 'chart' or 'pdf' requests: {message[:50]}")
+    chart_type = raw.get("chartType") or route.variant or "bar"
+    if chart_type not in CHART_TYPES:
+        raise ValueError(f"Unknown chartType '{chart_type}'")
+    render_options = chart_render_options({**raw, "format": "png"})
+    return {
+        "type": kind,
+        "message": message,
+        "chart_type": chart_type,
+        "topic": route.topic,
+        "profile": render_options["profile"],
+        "dpi": render_options["dpi"],
+    }
+
+
+def batch_steps(use_cache, bundle, target=LOCAL_POOL):
+    """Returns the fetch, render and finish steps of a batch for BatchManager."""
+    async def fetch(job):
+        if job["type"] == "chart":
+            return await chart_data(job["message"], use_cache, target)
+        return await pdf_content(job["message"], use_cache, target)
+
+    async def render(job, text_response):
+        if job["type"] == "chart":
+            return await render_chart(
+                text_response, job["chart_type"], job["topic"], job["profile"], dpi=job["dpi"]
+            )
+        return await render_pdf(text_response, job["topic"])
+
+    async def finish(results):
+        # Resolving marks the files as just used, so the sweep does not evict them mid-bundle;
+        # a file already deleted is left out and reported instead of failing the whole bundle
+        filenames, paths, missing = [], [], []
+        for result in results:
+            stored = file_store.resolve(result["filename"])
+            if stored is None:
+                logger.warning(f"⚠️ Batch file deleted before bundling: {result['filename']}")
+                missing.append(result["filename"])
+            else:
+                filenames.append(stored.name)
+                paths.append(stored.path)
+        if not paths:
+            raise RuntimeError("Every batch file was deleted before bundling")
+
+        # The bundle is content-addressed like any render, so it is cached and evicted the same way
+        cache_key = render_key("bundle", {"kind": bundle, "files": filenames})
+        filename = f"batch_{cache_key}.{bundle}"
+        async with render_cache.lock(cache_key):
+            if not render_cache.get(cache_key):
+                with span("bundle"), file_store.writing(filename) as filepath:
+                    await render_pool.run(BUNDLERS[bundle], filepath, paths)
+                render_cache.put(cache_key, filename)
+        result = {"filename": filename, "url": f"http://localhost:8000/files/{filename}"}
+        if missing:
+            result["missing"] = [{"filename": name, "error": "File deleted before bundling"} for name in missing]
+        return result
+
+    return fetch, render, finish if bundle else None
+
+
+def ndjson_response(events):
+    """Streams batch events as newline-delimited JSON."""
+    async def lines():
+        async for event in events:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/api/batch")
+async def create_batch(request: Request):
+    """
+    Starts a batch of chart and PDF jobs.
+
+    Body: {"jobs": [{"message", "type", "chartType", "profile", "dpi"}, ...],
+    "bundle": "zip" | "pdf" (optional), "provider": model pool or provider
+    (default "local"), "stream": bool, "cache": bool}.
+    Model calls run with bounded concurrency and renders in parallel. With
+    "stream": true the results are sent as NDJSON lines as each job
+    finishes; otherwise the batch id and its status/stream URLs are returned.
+    """
+    body = await request.json()
+    current_client.set(client_id(request))
+    raw_jobs = body.get("jobs")
+    bundle = body.get("bundle")
+    if not isinstance(raw_jobs, list) or not 0 < len(raw_jobs) <= BATCH_MAX_JOBS:
+        return JSONResponse(status_code=400, content={"error": f"'jobs' must be a list of 1 to {BATCH_MAX_JOBS} jobs"})
+    if bundle is not None and bundle not in BUNDLERS:
+        return JSONResponse(status_code=400, content={"error": "'bundle' must be 'zip' or 'pdf'"})
+    target = body.get("provider") or LOCAL_POOL
+    if target not in model_router:
+        return JSONResponse(status_code=400, content={"error": f"Unknown provider '{target}'"})
+    try:
+        jobs = [parse_batch_job(raw) for raw in raw_jobs]
+    except (ValueError, TypeError) as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    batch = batch_manager.submit(jobs, *batch_steps(body.get("cache", True), bundle, target))
+    if body.get("stream"):
+        return ndjson_response(batch_manager.events(batch["id"]))
+    return JSONResponse(status_code=202, content={
+        "id": batch["id"],
+        "status": batch["status"],
+        "total": batch["total"],
+        "statusUrl": f"http://localhost:8000/api/batch/{batch['id']}",
+        "streamUrl": f"http://localhost:8000/api/batch/{batch['id']}/stream",
+    })
+
+
+@app.get("/api/batch/metrics")
+async def batch_metrics():
+    """Returns running batches and job counters."""
+    return batch_manager.stats()
+
+
+@app.get("/api/batch/{batch_id}")
+async def batch_status(batch_id: str):
+    """Returns the status of a batch and the results of its finished jobs."""
+    batch = batch_manager.status(batch_id)
+    if batch is None:
+        return JSONResponse(status_code=404, content={"error": "Batch not found"})
+    return batch
+
+
+@app.get("/api/batch/{batch_id}/stream")
+async def batch_stream(batch_id: str):
+    """Follows a batch as NDJSON: finished jobs so far, then the rest as they finish."""
+    if batch_manager.status(batch_id) is None:
+        return JSONResponse(status_code=404, content={"error": "Batch not found"})
+    return ndjson_response(batch_manager.events(batch_id))
+
+
+# Render pool metrics endpoint
+@app.get("/api/render/metrics")
+async def render_metrics():
+    """Returns render queue depth, job counters, render latency and cache usage."""
+    return {**render_pool.metrics(), "cache": render_cache.stats(), "files": file_store.stats()}
+
+
+# Liveness and readiness probes
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once warm-up is done, 503 before."""
+    if not warmed_up.is_set():
+        return JSONResponse(status_code=503, content={"status": "warming up"})
+    return {"status": "ready"}
+
+
+# Prometheus metrics
+def upstream_clients():
+    """HTTP clients of the registered providers (the stub has none)."""
+    return [provider.client for provider in model_router.providers.values() if hasattr(provider, "client")]
+
+
+def _by_upstream(key):
+    return lambda: {(client.name,): client.admission.metrics()[key] for client in upstream_clients()}
+
+
+CallbackMetric("atom_upstream_in_flight", "Upstream requests running", _by_upstream("in_flight"), ("upstream",))
+CallbackMetric("atom_upstream_queued", "Upstream requests waiting for a slot", _by_upstream("queued"), ("upstream",))
+CallbackMetric("atom_upstream_admitted", "Upstream requests given a slot", _by_upstream("admitted"), ("upstream",),
+               kind="counter")
+CallbackMetric("atom_upstream_rejected", "Upstream requests shed because the queue was full",
+               _by_upstream("rejected"), ("upstream",), kind="counter")
+CallbackMetric("atom_upstream_timed_out", "Upstream requests shed after waiting too long for a slot",
+               _by_upstream("timed_out"), ("upstream",), kind="counter")
+CallbackMetric(
+    "atom_upstream_coalesced", "Requests that shared an identical in-flight upstream call",
+    lambda: upstream_calls.stats()["shared"], kind="counter",
+)
+CallbackMetric(
+    "atom_llm_provider_healthy", "1 while a model provider is in rotation",
+    lambda: {(provider.name,): int(provider.healthy) for provider in model_router.providers.values()},
+    ("provider",),
+)
+CallbackMetric("atom_llm_hedged", "Model calls hedged with a second provider", lambda: model_router.hedged,
+               kind="counter")
+CallbackMetric("atom_llm_failovers", "Model calls retried on another provider after a failure",
+               lambda: model_router.failovers, kind="counter")
+CallbackMetric("atom_render_queue_depth", "Render jobs pending or running", lambda: render_pool.metrics()["queue_depth"])
+CallbackMetric(
+    "atom_response_cache_lookups", "Response cache lookups by result",
+    lambda: {
+        ("exact",): response_cache.exact_hits, ("similar",): response_cache.similar_hits,
+        ("miss",): response_cache.misses,
+    },
+    ("result",), kind="counter",
+)
+CallbackMetric("atom_files_bytes", "Bytes of generated files on disk", lambda: file_store.stats()["bytes"])
+CallbackMetric("atom_files", "Generated files on disk", lambda: file_store.stats()["files"])
+CallbackMetric(
+    "atom_files_deleted", "Generated files entries deleted by retention",
+    lambda: {("expired",): file_store.expired, ("evicted",): file_store.evicted}, ("reason",), kind="counter",
+)
+CallbackMetric("atom_rag_chunks", "Chunks in the local document index", lambda: rag_index.count)
+CallbackMetric("atom_batches_running", "Batches not finished yet", lambda: batch_manager.stats()["batches_running"])
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage, upstream, render and HTTP latency histograms plus queue gauges."""
+    return PlainTextResponse(exposition(), media_type=CONTENT_TYPE)
+
+
+# Upstream admission metrics endpoint
+@app.get("/api/upstream/metrics")
+async def upstream_metrics():
+    """Returns per-upstream queue depth, admission counters and coalesced calls."""
+    return {
+        **{client.name.lower(): client.admission.metrics() for client in upstream_clients()},
+        "coalescing": upstream_calls.stats(),
+    }
+
+
+# Model routing endpoint
+@app.get("/api/models")
+async def models():
+    """Returns the routing policy, the pools and each provider's health and latency."""
+    return model_router.stats()
+
+
+# Response cache metrics endpoint
+@app.get("/api/cache/metrics")
+async def cache_metrics():
+    """Returns response cache size and hit/miss counters."""
+    return response_cache.stats()
+
+
+# Conversation history endpoints
+@app.get("/api/conversations/{conversation_id}/messages")
+async def conversation_messages(conversation_id: str, before: int = None, limit: int = HISTORY_PAGE_SIZE):
+    """
+    Returns one page of a conversation, oldest message first. Pass the
+    returned `next` value as `before` to get the previous page.
+    """
+    if not is_valid_conversation_id(conversation_id):
+        return JSONResponse(status_code=400, content={"error": "Invalid conversation id"})
+    return await conversation_store.page(conversation_id, before, min(max(limit, 1), 200))
+
+
+@app.delete("/api/conversations/{conversation_id}")
+async def delete_conversation(conversation_id: str):
+    """Deletes a conversation and its history."""
+    if not is_valid_conversation_id(conversation_id):
+        return JSONResponse(status_code=400, content={"error": "Invalid conversation id"})
+    await conversation_store.delete(conversation_id)
+    return {"deleted": conversation_id}
+
+
+@app.get("/api/conversations/metrics")
+async def conversation_metrics():
+    """Returns conversation store cache and write batching counters."""
+    return conversation_store.stats()
+
+
+# Local RAG endpoints
+@app.post("/upload")
+async def upload_document(file: UploadFile = File(...)):
+    """
+    Stores an uploaded PDF or text file and queues it for ingestion into the
+    local RAG index. Ingestion runs in the background; poll the returned
+    progress URL to follow it.
+    """
+    filename = Path(file.filename or "document.txt").name
+    if not filename.lower().endswith(RAG_EXTENSIONS):
+        return JSONResponse(status_code=415, content={"error": f"Supported files: {', '.join(RAG_EXTENSIONS)}"})
+
+    UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+    destination = UPLOADS_DIR / f"{uuid.uuid4().hex}_{filename}"
+    try:
+        size = await asyncio.to_thread(save_upload, file.file, destination)
+    except ValueError as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+
+    job = ingest_manager.submit(destination, filename)
+    logger.info(f"📥 Upload queued for ingestion: {filename} ({size} bytes)")
+    return {
+        "file": filename,
+        "job": job["id"],
+        "status": job["status"],
+        "progressUrl": f"http://localhost:8000/upload/{job['id']}",
+    }
+
+
+@app.get("/upload/{job_id}")
+async def upload_progress(job_id: str):
+    """Returns the status, progress (0-1) and chunk count of an ingestion job."""
+    job = ingest_manager.job(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return job
+
+
+@app.post("/query")
+async def query_documents(
+    request: Request,
+    question: str = Form(...),
+    k: int = Form(RAG_TOP_K),
+    approximate: bool = Form(RAG_APPROXIMATE),
+    provider: str = Form(LOCAL_POOL),
+):
+    """
+    Answers a question with a model pool (the local one by default), using
+    the most similar chunks of the uploaded documents as context.
+    """
+    logger.debug("🔎 RAG query: %.100s", question)
+    current_client.set(client_id(request))
+    if provider not in model_router:
+        return JSONResponse(status_code=400, content={"error": f"Unknown provider '{provider}'"})
+    with span("retrieval"):
+        query = embed_texts([question])[0]
+        hits = await asyncio.to_thread(rag_index.search, query, min(max(k, 1), 20), approximate)
+    chunks = rag_index.chunks([chunk_id for chunk_id, _ in hits])
+    sources = [
+        {"file": chunks[chunk_id][0], "chunk": chunks[chunk_id][1], "score": round(score, 4)}
+        for chunk_id, score in hits if chunk_id in chunks
+    ]
+
+    prompt = question
+    if sources:
+        excerpts = "\n\n".join(
+            f"[{n}] ({chunks[chunk_id][0]}) {chunks[chunk_id][2]}"
+            for n, (chunk_id, _) in enumerate(hits, start=1) if chunk_id in chunks
+        )
+        prompt = f"Document excerpts:\n{excerpts}\n\nQuestion: {question}"
+
+    try:
+        answer = await ask_model(
+            prompt, "Answer always in the user language, using the document excerpts when relevant",
+            target=provider,
+        )
+    except UpstreamOverloaded as e:
+        return overloaded_response(e, {"answer": f"⚠️ {str(e)}", "sources": sources})
+    except Exception as e:
+        logger.error(f"❌ Error in query_documents: {str(e)}")
+        return JSONResponse(status_code=502, content={"answer": f"⚠️ {str(e)}", "sources": sources})
+    return {"answer": answer.strip(), "sources": sources}
+
+
+@app.get("/api/rag/documents")
+async def rag_documents():
+    """Lists ingested documents with their chunk count and status."""
+    return rag_index.documents()
+
+
+@app.get("/api/rag/metrics")
+async def rag_metrics():
+    """Returns index size and ingestion counters."""
+    return ingest_manager.stats()
+
+
 # File retrieval endpoint
 @app.get("/files/{filename}")
-async def get_file(filename: str):
-    """Returns a generated file (PDF or PNG)."""
-    logger.info(f"📥 File download request: {filename}")
-    file_path = FILES_DIR / filename
-    logger.info(f"📂 Full path: {file_path}")
-    logger.info(f"📂 File exists: {file_path.exists()}")
-    
-    if not file_path.exists():
+async def get_file(filename: str, request: Request, format: str = None):
+    """
+    Returns a generated file (PDF, PNG or preview).
+
+    Content-addressed files are served with a strong ETag and
+    `Cache-Control: immutable`, and byte ranges are supported. PNG charts can
+    be requested as WebP with `?format=webp`; the conversion is done once and
+    kept next to the original.
+    """
+    logger.debug("📥 File download request: %s", filename)
+    stored = file_store.resolve(filename)
+    if stored is None:
         logger.warning(f"❌ File not found: {filename}")
-        return {"error": "File not found"}
-    
-    # Determine file type
-    if filename.endswith('.png'):
-        media_type = "image/png"
-    elif filename.endswith('.pdf'):
-        media_type = "application/pdf"
-    else:
-        media_type = "application/octet-stream"
-    
-    logger.info(f"✅ Sending file: {filename} ({file_path.stat().st_size} bytes, type: {media_type})")
-    return FileResponse(
-        file_path, 
-        filename=filename,
-        media_type=media_type,
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        return JSONResponse(status_code=404, content={"error": "File not found"})
+
+    if format == "webp" and filename.endswith(".png"):
+        webp_name = f"{filename[:-4]}.webp"
+        if webp_name not in file_store:
+            # Concurrent requests for the same image convert it only once
+            async with render_cache.lock(webp_name):
+                if webp_name not in file_store:
+                    with span("encode"), file_store.writing(webp_name) as webp_path:
+                        await render_pool.run(CONVERT_IMAGE, stored.path, webp_path)
+        filename, stored = webp_name, file_store.resolve(webp_name)
+
+    etag = RenderCache.etag_of(filename)
+    return file_response(
+        request, stored.path, stored.media_type, filename, etag=etag, immutable=etag is not None,
+        size=stored.size, modified=stored.created,
     )
 
 
-# MCP Tool listing
-@mcp_server.list_tools()
-async def list_tools():
-    return [
-        types.Tool(
-            name="chat",
-            description="Send a message to either ChatGPT or the local model",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "message": {"type": "string"},
-                    "isUsingChatGPT": {"type": "boolean"},
-                },
-                "required": ["message"],
-            },
-        )
-    ]
+# MCP tools: the same pipeline as /api/chat, with structured arguments
+async def mcp_chat(arguments, progress):
+    target = arguments.get("provider") or (OPENAI_POOL if arguments.get("isUsingChatGPT") else LOCAL_POOL)
+    await progress(0, 1, f"Asking the {target} model")
+    text_response = await ask_model(arguments["message"], "Answer always in the user language", target=target)
+    return {"type": "text", "response": text_response.replace("**", "").strip()}
+
+
+async def mcp_generate_chart(arguments, progress):
+    target = arguments.get("provider") or LOCAL_POOL
+    message = arguments.get("message", "")
+    chart_type = arguments.get("chartType") or intent_router.route(message).variant or "bar"
+    render_options = chart_render_options(arguments)
+    topic_slug = slugify(arguments.get("topic") or "") or intent_router.route(message).topic or "data"
+    if arguments.get("data") is not None:
+        # Structured data goes straight to the renderer, without a model round trip
+        text_response = json.dumps(arguments["data"], ensure_ascii=False)
+        await progress(1, 2, "Rendering chart")
+    else:
+        await progress(0, 2, f"Asking the {target} model for the data")
+        text_response = await chart_data(message, target=target)
+        await progress(1, 2, "Rendering chart")
+    return await render_chart(text_response, chart_type, topic_slug, **render_options)
+
+
+async def mcp_generate_pdf(arguments, progress):
+    target = arguments.get("provider") or LOCAL_POOL
+    message = arguments.get("message", "")
+    topic_slug = slugify(arguments.get("topic") or "") or intent_router.route(message).topic or "document"
+    if arguments.get("content"):
+        text_response = arguments["content"].strip()
+        await progress(1, 2, "Rendering PDF")
+    else:
+        await progress(0, 2, f"Asking the {target} model for the content")
+        text_response = await pdf_content(message, target=target)
+        await progress(1, 2, "Rendering PDF")
+    return await render_pdf(text_response, topic_slug)
+
+
+@lru_cache(maxsize=None)
+def get_mcp_server():
+    """Builds the MCP server on first use (the mcp package is slow to import)."""
+    from services.mcp_server import create_mcp_server
+
+    return create_mcp_server({
+        "chat": mcp_chat,
+        "generate_chart": mcp_generate_chart,
+        "generate_pdf": mcp_generate_pdf,
+    })
+
+
+@lru_cache(maxsize=None)
+def get_mcp_http_app():
+    from services.mcp_server import sse_app
+
+    return sse_app(get_mcp_server())
+
+
+async def mcp_http(scope, receive, send):
+    """MCP over HTTP/SSE: GET /mcp/sse opens a session, messages are posted to /mcp/messages/."""
+    await get_mcp_http_app()(scope, receive, send)
+
+
+app.mount("/mcp", mcp_http)
+
+
+async def serve_mcp_stdio():
+    """Runs the MCP server over stdin/stdout with the app's stores, router and render pool."""
+    from services.mcp_server import serve_stdio
+
+    # The web server (or another stdio server) may be running on the same
+    # files directory: leave the lock and the sweep to it
+    app.state.sweep_files = False
+    async with lifespan(app):
+        await serve_stdio(get_mcp_server())
 
 
 # Run the app
 if __name__ == "__main__":
+    if "--mcp" in sys.argv[1:]:
+        # stdout carries the MCP protocol; logs go to stderr
+        logger.info("🧰 Starting Atom LLM MCP server on stdio...")
+        asyncio.run(serve_mcp_stdio())
+        sys.exit(0)
+
     import uvicorn
 
-    logger.info("🚀 Starting Atom LLM server...")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    logger.info(f"🚀 Starting Atom LLM server ({WEB_CONCURRENCY} worker processes)...")
+    if WEB_CONCURRENCY > 1:
+        # Each worker process imports the app by name and warms up on its own
+        uvicorn.run("main:app", host=HOST, port=PORT, workers=WEB_CONCURRENCY)
+    else:
+        uvicorn.run(app, host=HOST, port=PORT)
@@ -0,0 +1,216 @@
+import asyncio
+import contextvars
+import logging
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from services.metrics import Histogram
+from services.stats import percentiles
+
+logger = logging.getLogger(__name__)
+
+# Admission defaults (overridable through environment variables)
+UPSTREAM_MAX_QUEUE = int(os.getenv("UPSTREAM_MAX_QUEUE", "64"))
+UPSTREAM_MAX_QUEUE_WAIT = float(os.getenv("UPSTREAM_MAX_QUEUE_WAIT", "30"))
+RETRY_AFTER_MAX = 60
+
+QUEUE_SECONDS = Histogram("atom_upstream_queue_seconds", "Time waited for an upstream slot", ("upstream",))
+
+# Client on whose behalf upstream calls are made (set per request by the API)
+current_client = contextvars.ContextVar("current_client", default="anonymous")
+
+
+class UpstreamOverloaded(Exception):
+    """Raised when an upstream call is shed because its queue is full or too slow."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a fair waiting queue for one upstream server.
+
+    At most `max_concurrency` calls run at once. Callers beyond that wait in
+    one FIFO queue per client, and freed slots are handed to the clients in
+    turn (round robin), so a client firing many requests cannot starve the
+    others. A call is shed with UpstreamOverloaded when `max_queue` callers
+    are already waiting, or when it waited `max_wait` seconds without a
+    slot; the error carries a Retry-After estimate based on the recent
+    service time.
+    """
+
+    def __init__(self, name, max_concurrency, max_queue=UPSTREAM_MAX_QUEUE, max_wait=UPSTREAM_MAX_QUEUE_WAIT):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._active = 0
+        self._queued = 0
+        self._queues = OrderedDict()  # client -> deque of waiting futures, in turn order
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._queue_wait = deque(maxlen=500)
+        self._service_time = deque(maxlen=500)
+
+    @asynccontextmanager
+    async def slot(self, client=None):
+        """
+        Holds one upstream slot for the duration of the block.
+
+        Args:
+            client: Client id used for fair queueing (defaults to current_client)
+
+        Raises:
+            UpstreamOverloaded: If the call is shed instead of admitted
+        """
+        await self._acquire(client or current_client.get())
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._service_time.append(time.perf_counter() - start)
+            self._release()
+
+    async def _acquire(self, client):
+        if self._active < self.max_concurrency and not self._queued:
+            self._active += 1
+            self._admitted += 1
+            self._queue_wait.append(0.0)
+            QUEUE_SECONDS.labels(self.name).observe(0.0)
+            return
+
+        if self._queued >= self.max_queue:
+            self._rejected += 1
+            raise UpstreamOverloaded(
+                f"{self.name} is overloaded ({self._queued} requests waiting)", self.retry_after()
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client, deque()).append(future)
+        self._queued += 1
+        start = time.perf_counter()
+        try:
+            # asyncio.wait does not cancel the future, so a slot handed over
+            # right at the deadline is not lost
+            done, _ = await asyncio.wait({future}, timeout=self.max_wait)
+        except asyncio.CancelledError:
+            self._abandon(client, future)
+            raise
+        if not done:
+            self._abandon(client, future)
+            self._timed_out += 1
+            raise UpstreamOverloaded(
+                f"{self.name} did not accept the request within {self.max_wait:g}s", self.retry_after()
+            )
+        self._admitted += 1
+        wait = time.perf_counter() - start
+        self._queue_wait.append(wait)
+        QUEUE_SECONDS.labels(self.name).observe(wait)
+
+    def _abandon(self, client, future):
+        if future.done():
+            # The slot was handed over while giving up: pass it on
+            self._release()
+            return
+        future.cancel()
+        queue = self._queues.get(client)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            self._queued -= 1
+            if not queue:
+                del self._queues[client]
+
+    def _release(self):
+        # Hand the slot to the first waiter of the next client in turn
+        while self._queues:
+            client, queue = next(iter(self._queues.items()))
+            future = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    def retry_after(self):
+        """Seconds a shed client should wait: time to drain the current queue."""
+        if not self._service_time:
+            return 1
+        average = sum(self._service_time) / len(self._service_time)
+        drain = average * (self._queued + 1) / self.max_concurrency
+        return min(RETRY_AFTER_MAX, max(1, math.ceil(drain)))
+
+    def metrics(self):
+        """Returns slot usage, queue depth per client, counters and wait percentiles."""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self._active,
+            "queued": self._queued,
+            "queued_by_client": {client: len(queue) for client, queue in self._queues.items()},
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "timed_out": self._timed_out,
+            "queue_wait_seconds": percentiles(self._queue_wait),
+            "service_seconds": percentiles(self._service_time),
+        }
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls into one.
+
+    The first caller for a key starts the call in its own task; callers
+    arriving with the same key while it runs wait for that task and get the
+    same result or exception. The call is cancelled only when every caller
+    waiting for it has been cancelled (for example all clients disconnected).
+    Nothing is kept once the call finishes: caching is ResponseCache's job.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> [task, waiters]
+        self._leaders = 0
+        self._shared = 0
+
+    async def do(self, key, func):
+        """
+        Runs `func()` unless a call with the same key is already in flight.
+
+        Args:
+            key: Hashable identity of the call
+            func: Coroutine function without arguments
+
+        Returns:
+            The result of the (possibly shared) call
+        """
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.create_task(func())
+            call = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+            self._leaders += 1
+        else:
+            self._shared += 1
+            logger.debug("🔗 Joined an identical in-flight upstream request")
+
+        call[1] += 1
+        try:
+            return await asyncio.shield(call[0])
+        except asyncio.CancelledError:
+            if call[1] == 1:
+                call[0].cancel()
+            raise
+        finally:
+            call[1] -= 1
+
+    def stats(self):
+        return {"in_flight": len(self._calls), "calls": self._leaders, "shared": self._shared}
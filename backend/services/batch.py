@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Batch defaults (overridable through environment variables)
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", "100"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+MAX_BATCHES_KEPT = 50
+
+
+class BatchManager:
+    """
+    Runs batches of generation jobs in the background.
+
+    Every job goes through two steps: `fetch` (the model call) and `render`
+    (turning its answer into a file). At most `llm_concurrency` fetches and
+    `render_concurrency` renders run at once across all batches, and a job
+    releases its model slot before rendering, so model calls and renders of
+    different jobs overlap. Results are recorded as each job finishes and can
+    be polled (status) or followed (events); an optional `finish` step builds
+    a bundle once every job is done.
+    """
+
+    def __init__(self, llm_concurrency=BATCH_LLM_CONCURRENCY, render_concurrency=1):
+        self._llm_slots = asyncio.Semaphore(llm_concurrency)
+        self._render_slots = asyncio.Semaphore(render_concurrency)
+        self._batches = OrderedDict()  # batch id -> status dict
+        self._changed = {}  # batch id -> asyncio.Condition
+        self._tasks = set()
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+
+    def submit(self, jobs, fetch, render, finish=None):
+        """
+        Starts a batch.
+
+        Args:
+            jobs: List of job descriptions, passed as-is to the steps
+            fetch: Coroutine function `fetch(job)` returning the model answer
+            render: Coroutine function `render(job, answer)` returning a result dict
+            finish: Optional coroutine function `finish(results)` returning a
+                bundle dict (or None), where results are the successful
+                results in job order
+
+        Returns:
+            dict: The batch status (see status())
+        """
+        batch = {
+            "id": uuid.uuid4().hex,
+            "status": "running",
+            "total": len(jobs),
+            "completed": 0,
+            "failed": 0,
+            "results": [],
+            "bundle": None,
+            "created": time.time(),
+            "finished": None,
+        }
+        self._batches[batch["id"]] = batch
+        self._changed[batch["id"]] = asyncio.Condition()
+        while len(self._batches) > MAX_BATCHES_KEPT:
+            oldest = next(iter(self._batches.values()))
+            if oldest["status"] != "done":
+                break
+            self._batches.popitem(last=False)
+            self._changed.pop(oldest["id"], None)
+
+        task = asyncio.create_task(self._run(batch, jobs, fetch, render, finish))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        logger.info(f"📦 Batch {batch['id']} started: {len(jobs)} jobs")
+        return batch
+
+    def status(self, batch_id):
+        return self._batches.get(batch_id)
+
+    async def _notify(self, batch):
+        changed = self._changed.get(batch["id"])
+        if changed is not None:
+            async with changed:
+                changed.notify_all()
+
+    async def _run(self, batch, jobs, fetch, render, finish):
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(self._run_job(batch, index, job, fetch, render) for index, job in enumerate(jobs))
+        )
+        if finish is not None and batch["completed"]:
+            batch["status"] = "bundling"
+            await self._notify(batch)
+            try:
+                batch["bundle"] = await finish([result for result in results if result is not None])
+            except Exception as e:
+                logger.error(f"❌ Error bundling batch {batch['id']}: {str(e)}")
+                batch["bundle"] = {"error": str(e)}
+        batch["status"] = "done"
+        batch["finished"] = time.time()
+        await self._notify(batch)
+        logger.info(
+            f"📦 Batch {batch['id']} done: {batch['completed']}/{batch['total']} jobs "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+    async def _run_job(self, batch, index, job, fetch, render):
+        start = time.perf_counter()
+        entry = {"index": index}
+        result = None
+        try:
+            async with self._llm_slots:
+                answer = await fetch(job)
+            async with self._render_slots:
+                result = await render(job, answer)
+            entry.update(status="done", **result)
+            batch["completed"] += 1
+            self.jobs_completed += 1
+        except Exception as e:
+            logger.error(f"❌ Batch job {index} failed: {str(e)}")
+            entry.update(status="error", error=str(e))
+            batch["failed"] += 1
+            self.jobs_failed += 1
+        entry["seconds"] = round(time.perf_counter() - start, 3)
+        batch["results"].append(entry)
+        await self._notify(batch)
+        return result
+
+    async def events(self, batch_id):
+        """
+        Yields the batch progress as events: one 'result' per finished job
+        (in completion order, starting with those already finished), then
+        'bundle' if one was built, then 'done'.
+        """
+        batch = self._batches[batch_id]
+        changed = self._changed[batch_id]
+        sent = 0
+        while True:
+            async with changed:
+                await changed.wait_for(
+                    lambda: len(batch["results"]) > sent or batch["status"] == "done"
+                )
+            for entry in batch["results"][sent:]:
+                yield {"event": "result", **entry}
+            sent = len(batch["results"])
+            if batch["status"] == "done" and sent == len(batch["results"]):
+                break
+        if batch["bundle"]:
+            yield {"event": "bundle", **batch["bundle"]}
+        yield {
+            "event": "done",
+            "completed": batch["completed"],
+            "failed": batch["failed"],
+            "seconds": round(batch["finished"] - batch["created"], 3),
+        }
+
+    def stats(self):
+        statuses = [batch["status"] for batch in self._batches.values()]
+        return {
+            "batches_running": len(statuses) - statuses.count("done"),
+            "jobs_completed": self.jobs_completed,
+            "jobs_failed": self.jobs_failed,
+        }
+
+    async def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
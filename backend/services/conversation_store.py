@@ -0,0 +1,366 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Conversation store defaults (overridable through environment variables)
+CONVERSATION_DB = os.getenv("CONVERSATION_DB", "conversations.db")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "300"))
+CONVERSATION_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_FLUSH_INTERVAL", "0.5"))
+CONVERSATION_BATCH_SIZE = int(os.getenv("CONVERSATION_BATCH_SIZE", "64"))
+CONVERSATION_CACHE_SIZE = int(os.getenv("CONVERSATION_CACHE_SIZE", "256"))
+HISTORY_PAGE_SIZE = 50
+
+CONVERSATION_ID = re.compile(r"[\w-]{1,64}$")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+SUMMARY_LINE_CHARS = 160
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    summary TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    created REAL NOT NULL,
+    data TEXT,
+    PRIMARY KEY (conversation_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (about 4 characters per token for English/Spanish
+    BPE vocabularies); close enough to size a prompt without a tokenizer.
+    """
+    return len(text) // 4 + 1
+
+
+def is_valid_conversation_id(conversation_id):
+    return isinstance(conversation_id, str) and CONVERSATION_ID.match(conversation_id) is not None
+
+
+def _summary_line(role, content):
+    first = SENTENCE_END.split(content.strip(), 1)[0]
+    if len(first) > SUMMARY_LINE_CHARS:
+        first = first[:SUMMARY_LINE_CHARS].rsplit(" ", 1)[0] + "…"
+    return f"{role}: {first}"
+
+
+class _Window:
+    """Recent turns of a conversation that fit in the token budget, plus the summary."""
+
+    def __init__(self, summary, turns):
+        self.summary = deque(line for line in summary.splitlines() if line)
+        self.summary_tokens = sum(estimate_tokens(line) for line in self.summary)
+        self.turns = deque(turns)  # (role, content, tokens)
+        self.tokens = sum(turn[2] for turn in self.turns)
+
+
+class ConversationStore:
+    """
+    Conversation history persisted in SQLite, with server-side context windowing.
+
+    The database runs in WAL mode and is only touched from one dedicated
+    thread. Appends are queued in memory and written in batches (every
+    CONVERSATION_FLUSH_INTERVAL seconds, or as soon as CONVERSATION_BATCH_SIZE
+    rows are pending), one transaction per batch. Sequence numbers are
+    assigned by SQLite when a row is written, so they never collide, even
+    with several processes on one database. If a batch hits an integrity
+    error, its rows are retried one by one and only the failing ones are
+    dropped.
+
+    Each active conversation keeps a window in memory (LRU-bounded): the most
+    recent turns that fit in CONTEXT_TOKEN_BUDGET, and a rolling extractive
+    summary of the turns pushed out of it, itself capped at
+    SUMMARY_TOKEN_BUDGET. Building the prompt context therefore costs no
+    database read and its size stays constant however long the conversation
+    grows.
+    """
+
+    def __init__(self, path=CONVERSATION_DB, token_budget=CONTEXT_TOKEN_BUDGET,
+                 summary_budget=SUMMARY_TOKEN_BUDGET, flush_interval=CONVERSATION_FLUSH_INTERVAL,
+                 batch_size=CONVERSATION_BATCH_SIZE, cache_size=CONVERSATION_CACHE_SIZE):
+        self.path = path
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-db")
+        self._db = None
+        self._windows = OrderedDict()  # conversation id -> _Window
+        self._load_lock = asyncio.Lock()
+        self._pending_messages = []
+        self._pending_summaries = {}  # conversation id -> (summary, updated)
+        self._wake = asyncio.Event()
+        self._flusher = None
+        self._closing = False
+        self.flushes = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    # Database thread
+
+    def _open(self):
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def _insert(self, messages):
+        self._db.executemany(
+            "INSERT OR IGNORE INTO conversations (id, created, updated) VALUES (?, ?, ?)",
+            [(m[0], m[4], m[4]) for m in messages],
+        )
+        self._db.executemany(
+            "INSERT INTO messages (conversation_id, seq, role, content, tokens, created, data)"
+            " SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ?, ?, ? FROM messages WHERE conversation_id = ?",
+            [(*m, m[0]) for m in messages],
+        )
+
+    def _write(self, messages, summaries):
+        """Writes a batch and returns the number of rows dropped as invalid."""
+        updates = [(summary, updated, cid) for cid, (summary, updated) in summaries.items()]
+        try:
+            with self._db:
+                self._insert(messages)
+                self._db.executemany("UPDATE conversations SET summary = ?, updated = ? WHERE id = ?", updates)
+            return 0
+        except sqlite3.IntegrityError:
+            pass
+
+        # Retry row by row so one bad row does not block the whole batch forever
+        dropped = 0
+        for message in messages:
+            try:
+                with self._db:
+                    self._insert([message])
+            except sqlite3.IntegrityError as e:
+                dropped += 1
+                logger.error(f"❌ Dropping a message of conversation {message[0]}: {str(e)}")
+        with self._db:
+            self._db.executemany("UPDATE conversations SET summary = ?, updated = ? WHERE id = ?", updates)
+        return dropped
+
+    def _read_window(self, conversation_id):
+        row = self._db.execute(
+            "SELECT summary FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        turns = []
+        used = 0
+        for role, content, tokens in self._db.execute(
+            "SELECT role, content, tokens FROM messages WHERE conversation_id = ?"
+            " ORDER BY seq DESC LIMIT 200",
+            (conversation_id,),
+        ):
+            if used + tokens > self.token_budget:
+                break
+            used += tokens
+            turns.append((role, content, tokens))
+        turns.reverse()
+        return _Window(row[0] if row else "", turns)
+
+    def _read_page(self, conversation_id, before, limit):
+        return self._db.execute(
+            "SELECT seq, role, content, created, data FROM messages"
+            " WHERE conversation_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (conversation_id, before, limit + 1),
+        ).fetchall()
+
+    def _delete(self, conversation_id):
+        with self._db:
+            self._db.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+            self._db.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+    # Event loop side
+
+    async def start(self):
+        await self._run(self._open)
+        self._flusher = asyncio.create_task(self._flush_loop())
+        logger.info(f"🗂️ Conversation store ready: {self.path}")
+
+    async def _flush_loop(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Error writing conversations: {str(e)}")
+
+    async def flush(self):
+        """Writes every pending message and summary in one transaction."""
+        if not self._pending_messages and not self._pending_summaries:
+            return
+        messages, self._pending_messages = self._pending_messages, []
+        summaries, self._pending_summaries = self._pending_summaries, {}
+        try:
+            dropped = await self._run(self._write, messages, summaries)
+        except Exception:
+            # Keep the batch for the next attempt (database locked, disk full...)
+            self._pending_messages = messages + self._pending_messages
+            self._pending_summaries = {**summaries, **self._pending_summaries}
+            raise
+        self.flushes += 1
+        self.rows_written += len(messages) - dropped
+        self.rows_dropped += dropped
+
+    async def _window(self, conversation_id):
+        window = self._windows.get(conversation_id)
+        if window is None:
+            async with self._load_lock:
+                window = self._windows.get(conversation_id)
+                if window is None:
+                    # Rows of an evicted window may still be queued
+                    await self.flush()
+                    window = await self._run(self._read_window, conversation_id)
+                    self._windows[conversation_id] = window
+                    while len(self._windows) > self.cache_size:
+                        self._windows.popitem(last=False)
+        self._windows.move_to_end(conversation_id)
+        return window
+
+    async def append(self, conversation_id, role, content, data=None):
+        """
+        Adds a message to a conversation (created on first use).
+
+        Args:
+            conversation_id: Client-chosen id ([A-Za-z0-9_-], up to 64 chars)
+            role: 'user' or 'assistant'
+            content: Message text
+            data: Optional JSON-serializable attachment (e.g. file URLs)
+        """
+        window = await self._window(conversation_id)
+        tokens = estimate_tokens(content)
+        now = time.time()
+        self._pending_messages.append((
+            conversation_id, role, content, tokens, now,
+            json.dumps(data, ensure_ascii=False) if data is not None else None,
+        ))
+
+        window.turns.append((role, content, tokens))
+        window.tokens += tokens
+        folded = False
+        while window.tokens > self.token_budget and window.turns:
+            old_role, old_content, old_tokens = window.turns.popleft()
+            window.tokens -= old_tokens
+            line = _summary_line(old_role, old_content)
+            window.summary.append(line)
+            window.summary_tokens += estimate_tokens(line)
+            folded = True
+        while window.summary_tokens > self.summary_budget and len(window.summary) > 1:
+            window.summary_tokens -= estimate_tokens(window.summary.popleft())
+        if folded:
+            self._pending_summaries[conversation_id] = ("\n".join(window.summary), now)
+
+        if len(self._pending_messages) >= self.batch_size:
+            self._wake.set()
+
+    async def context(self, conversation_id):
+        """
+        Returns the context to send upstream with the next message.
+
+        Returns:
+            tuple: (summary of older turns, list of {'role', 'content'} recent turns)
+        """
+        window = await self._window(conversation_id)
+        turns = [{"role": role, "content": content} for role, content, _ in window.turns]
+        return "\n".join(window.summary), turns
+
+    async def page(self, conversation_id, before=None, limit=HISTORY_PAGE_SIZE):
+        """
+        Returns one page of history, oldest message first.
+
+        Args:
+            conversation_id: Conversation to read
+            before: Only messages with a lower sequence number (None for the latest)
+            limit: Maximum number of messages
+
+        Returns:
+            dict: {'messages': [...], 'next': sequence number to pass as
+            `before` for the previous page, or None at the start}
+        """
+        await self.flush()
+        rows = await self._run(self._read_page, conversation_id, before or 2 ** 62, limit)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        messages = [
+            {
+                "seq": seq,
+                "role": role,
+                "content": content,
+                "created": created,
+                "data": json.loads(data) if data else None,
+            }
+            for seq, role, content, created, data in reversed(rows)
+        ]
+        return {"messages": messages, "next": messages[0]["seq"] if has_more else None}
+
+    async def delete(self, conversation_id):
+        """Deletes a conversation and its messages."""
+        await self.flush()
+        self._windows.pop(conversation_id, None)
+        await self._run(self._delete, conversation_id)
+
+    async def close(self):
+        # The flusher is stopped rather than cancelled so a batch being
+        # written is never abandoned halfway
+        self._closing = True
+        self._wake.set()
+        if self._flusher:
+            await self._flusher
+        await self.flush()
+        if self._db is not None:
+            await self._run(self._db.close)
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        return {
+            "cached_conversations": len(self._windows),
+            "pending_rows": len(self._pending_messages),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "token_budget": self.token_budget,
+            "summary_budget": self.summary_budget,
+        }
+
+
+def with_context(message, summary, turns):
+    """
+    Renders the conversation context and the new message as a single prompt,
+    for upstreams that only accept one message (AnythingLLM).
+    """
+    if not summary and not turns:
+        return message
+    parts = []
+    if summary:
+        parts.append(f"Summary of the earlier conversation:\n{summary}")
+    if turns:
+        parts.append("Recent conversation:\n" + "\n".join(
+            f"{turn['role']}: {turn['content']}" for turn in turns
+        ))
+    parts.append(f"Current message:\n{message}")
+    return "\n\n".join(parts)
@@ -0,0 +1,100 @@
+import os
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from urllib.parse import quote
+
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+
+CHUNK_SIZE = 64 * 1024
+RANGE_HEADER = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def _read_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_response(request, path, media_type, filename, etag=None, immutable=False, size=None, modified=None):
+    """
+    Serves a file with HTTP caching and single byte-range support.
+
+    Answers 304 when the client already has the same version (If-None-Match
+    or If-Modified-Since), and 206 with Content-Range for `Range: bytes=`
+    requests, so large images and PDFs can be resumed or fetched in parts.
+
+    Args:
+        request: Incoming request (for conditional and range headers)
+        path: Path of the file on disk
+        media_type: Content-Type of the file
+        filename: Name suggested to the browser when downloading
+        etag: Strong entity tag; derived from size and mtime if omitted
+        immutable: True for content-addressed files that never change
+        size: File size in bytes, if already known (saves a stat call)
+        modified: Modification timestamp, if already known
+
+    Returns:
+        Response: 200, 206, 304 or 416 response
+    """
+    if size is None or modified is None:
+        stat = os.stat(path)
+        size, modified = stat.st_size, stat.st_mtime
+    last_modified = datetime.fromtimestamp(int(modified), tz=timezone.utc)
+    etag = f'"{etag or f"{size:x}-{int(modified):x}"}"'
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=31536000, immutable" if immutable else "no-cache",
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match:
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+    elif if_modified_since:
+        try:
+            if last_modified <= parsedate_to_datetime(if_modified_since):
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range == etag):
+        match = RANGE_HEADER.match(range_header.strip())
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:
+                start = max(0, size - int(match.group(2)))
+                end = size - 1
+            if start > end or start >= size:
+                return Response(
+                    status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"}
+                )
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                _read_range(path, start, end),
+                status_code=206,
+                media_type=media_type,
+                headers=headers,
+            )
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(
+        _read_range(path, 0, size - 1), media_type=media_type, headers=headers
+    )
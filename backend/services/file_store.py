@@ -0,0 +1,429 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: the directory lock is not enforced
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# File store defaults (overridable through environment variables; the
+# RENDER_CACHE_* names are still read for existing deployments)
+FILES_MAX_MB = float(os.getenv("FILES_MAX_MB", os.getenv("RENDER_CACHE_MAX_MB", "500")))
+FILES_MAX_ENTRIES = int(os.getenv("FILES_MAX_ENTRIES", os.getenv("RENDER_CACHE_MAX_ENTRIES", "2000")))
+FILES_MAX_AGE_HOURS = float(os.getenv("FILES_MAX_AGE_HOURS", "168"))
+FILES_SWEEP_INTERVAL = float(os.getenv("FILES_SWEEP_INTERVAL", "60"))
+
+MEDIA_TYPES = {
+    ".png": "image/png",
+    ".webp": "image/webp",
+    ".pdf": "application/pdf",
+    ".svg": "image/svg+xml",
+    ".zip": "application/zip",
+}
+
+# Names the resolver accepts: a single path component that is not hidden
+SAFE_NAME = re.compile(r"[^\W_][\w.\-]*")
+TEMP_PREFIX = ".tmp-"
+# Temporary files younger than this may still be written by another process
+# (a render worker of the previous server process, finishing its last job)
+TEMP_MAX_AGE = 3600
+LOCK_NAME = ".lock"
+
+
+def stem_of(name):
+    """Returns the part of a filename shared by all its renditions (before the first dot)."""
+    return name.split(".", 1)[0]
+
+
+def shard_of(name):
+    """Returns the shard directory of a file: 2 hex chars of a hash of its stem."""
+    return hashlib.blake2b(stem_of(name).encode("utf-8"), digest_size=1).hexdigest()
+
+
+class StoredFile:
+    """Metadata of a stored file, kept in memory."""
+
+    __slots__ = ("name", "path", "size", "media_type", "created", "accessed")
+
+    def __init__(self, name, path, size, created):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.media_type = MEDIA_TYPES.get(Path(name).suffix, "application/octet-stream")
+        self.created = created
+        self.accessed = created
+
+
+class _Entry:
+    # A file and its renditions, kept and deleted together
+    __slots__ = ("names", "size", "accessed")
+
+    def __init__(self):
+        self.names = set()
+        self.size = 0
+        self.accessed = 0.0
+
+
+class FileStore:
+    """
+    Generated files on disk, sharded by name, with their metadata in memory.
+
+    Files live in `<root>/<shard>/<name>`, where the shard is derived from the
+    name's stem, so renditions of the same file (`<stem>.png`,
+    `<stem>.preview.webp`) end up together and no directory grows past a few
+    thousand files. The index is loaded once on startup, so lookups never
+    touch the disk. Files are written under a temporary name and renamed into
+    place, so a half-written file is never served.
+
+    A file and its renditions form one entry for retention: a background
+    sweep deletes entries not used for `max_age` seconds, then the least
+    recently used ones while the store is over its size or entry quota.
+
+    Several processes can share a directory (web workers, the stdio MCP
+    server). The one holding the directory lock owns it: it cleans up on
+    startup and sweeps, after rescanning the disk for the files the others
+    wrote or used. The others never delete anything; they check the disk
+    when looking files up and store their last use in the files' mtime.
+    A store created with `sweep=False` never takes the lock.
+    """
+
+    def __init__(self, root, max_bytes=FILES_MAX_MB * 1024 * 1024, max_entries=FILES_MAX_ENTRIES,
+                 max_age=FILES_MAX_AGE_HOURS * 3600, sweep_interval=FILES_SWEEP_INTERVAL, sweep=True):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self._files = {}  # name -> StoredFile
+        self._entries = OrderedDict()  # stem -> _Entry, least recently used first
+        self._total_bytes = 0
+        self._touched = set()  # stems used since the last sweep
+        self._listeners = []
+        self._over_quota = asyncio.Event()
+        self._task = None
+        self.expired = 0
+        self.evicted = 0
+        self.sweeps = sweep
+        self._lock = None
+        self.owner = sweep and self._acquire_lock()
+        self._load()
+
+    def _acquire_lock(self):
+        """Takes the directory lock if no other process holds it; returns whether it did."""
+        if fcntl is None:
+            # No advisory locks (Windows): every sweeping store owns its directory
+            return True
+        lock = open(self.root / LOCK_NAME, "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return False
+        self._lock = lock
+        return True
+
+    def _load(self):
+        start = time.perf_counter()
+        files = []
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and len(entry.name) == 2:
+                files += self._scan_shard(entry.path)
+            elif entry.is_file() and self.owner:
+                # Files from the flat layout move into their shard
+                files.append(self._scan(entry, migrate=True))
+        for stored in sorted(filter(None, files), key=lambda stored: stored.created):
+            self._add(stored)
+        logger.info(
+            f"🗄️ File store loaded: {len(self._files)} files, {self._total_bytes} bytes "
+            f"in {time.perf_counter() - start:.2f}s{'' if self.owner else ' (shared, not sweeping)'}"
+        )
+
+    def _scan_shard(self, directory):
+        files = []
+        for item in os.scandir(directory):
+            try:
+                files.append(self._scan(item))
+            except FileNotFoundError:
+                pass  # deleted meanwhile
+        return files
+
+    def _scan(self, item, migrate=False):
+        if item.name.startswith(TEMP_PREFIX):
+            # Leftover of an interrupted write
+            try:
+                if self.owner and item.stat().st_mtime < time.time() - TEMP_MAX_AGE:
+                    os.unlink(item.path)
+            except FileNotFoundError:
+                pass
+            return None
+        if not SAFE_NAME.fullmatch(item.name):
+            return None
+        stat = item.stat()
+        path = Path(item.path)
+        if migrate:
+            path = self.path_of(item.name)
+            path.parent.mkdir(exist_ok=True)
+            os.replace(item.path, path)
+        return StoredFile(item.name, path, stat.st_size, stat.st_mtime)
+
+    def path_of(self, name):
+        """Returns where a file with this name is (or would be) stored."""
+        return self.root / shard_of(name) / name
+
+    def __contains__(self, name):
+        return SAFE_NAME.fullmatch(name) is not None and self._lookup(name) is not None
+
+    def names(self):
+        return list(self._files)
+
+    def resolve(self, name):
+        """
+        Looks a file up by its public name and marks it as used.
+
+        Names with path separators, `..` or a leading dot are rejected
+        before reaching the filesystem. A name missing from the index is
+        looked up on disk, in case another process sharing the directory (a
+        web worker, the stdio MCP server) wrote it. A store that does not
+        own the directory also checks that an indexed file is still on disk,
+        since the owner may have swept it.
+
+        Returns:
+            StoredFile: The file metadata, or None if there is no such file
+        """
+        if not SAFE_NAME.fullmatch(name):
+            return None
+        stored = self._lookup(name)
+        if stored is None:
+            return None
+        now = time.time()
+        stored.accessed = now
+        stem = stem_of(name)
+        entry = self._entries[stem]
+        entry.accessed = now
+        self._entries.move_to_end(stem)
+        self._touched.add(stem)
+        return stored
+
+    def _lookup(self, name):
+        stored = self._files.get(name)
+        if stored is None:
+            return self._discover(name)
+        if not self.owner and not os.path.exists(stored.path):
+            # Deleted by the sweep of the process that owns the directory
+            self._remove(stem_of(name))
+            return None
+        return stored
+
+    def _discover(self, name):
+        path = self.path_of(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        stored = StoredFile(name, path, stat.st_size, stat.st_mtime)
+        self._add(stored)
+        return stored
+
+    @contextmanager
+    def writing(self, name):
+        """
+        Yields a temporary path to write a file to; when the block succeeds
+        the file is renamed to its final path and indexed, otherwise it is
+        deleted. The temporary name keeps the extension, since renderers pick
+        the output format from it.
+        """
+        if not SAFE_NAME.fullmatch(name):
+            raise ValueError(f"Invalid file name: {name!r}")
+        path = self.path_of(name)
+        path.parent.mkdir(exist_ok=True)
+        temp = path.with_name(f"{TEMP_PREFIX}{uuid.uuid4().hex[:8]}-{name}")
+        try:
+            yield temp
+            size = os.stat(temp).st_size
+            os.replace(temp, path)
+        except BaseException:
+            try:
+                os.unlink(temp)
+            except FileNotFoundError:
+                pass
+            raise
+        self._add(StoredFile(name, path, size, time.time()))
+
+    def _add(self, stored):
+        previous = self._files.get(stored.name)
+        stem = stem_of(stored.name)
+        entry = self._entries.get(stem)
+        if entry is None:
+            entry = self._entries[stem] = _Entry()
+        if previous is not None:
+            entry.size -= previous.size
+            self._total_bytes -= previous.size
+        self._files[stored.name] = stored
+        entry.names.add(stored.name)
+        entry.size += stored.size
+        entry.accessed = max(entry.accessed, stored.accessed)
+        self._entries.move_to_end(stem)
+        self._total_bytes += stored.size
+        if self.owner and (self._total_bytes > self.max_bytes or len(self._entries) > self.max_entries):
+            self._over_quota.set()
+
+    def add_listener(self, callback):
+        """Registers `callback(names)`, called with the names of deleted files."""
+        self._listeners.append(callback)
+
+    def _remove(self, stem):
+        entry = self._entries.pop(stem)
+        self._touched.discard(stem)
+        paths = [self._files.pop(name).path for name in entry.names]
+        self._total_bytes -= entry.size
+        for callback in self._listeners:
+            callback(entry.names)
+        return paths
+
+    async def sweep(self):
+        """
+        Deletes expired entries, then least recently used ones until the
+        store is within its quota. Entries leave the index right away; their
+        files are deleted in a thread. A store that does not own its
+        directory only saves the last use of its files.
+
+        Returns:
+            int: Number of entries deleted
+        """
+        started = time.time()
+        files = await asyncio.to_thread(self._scan_all)
+        if not self.owner:
+            self._forget_deleted(files, started)
+            await asyncio.to_thread(self._apply, [], self._touched_files())
+            return 0
+        # Files the other processes wrote or used since the last sweep
+        self._refresh(files)
+
+        paths = []
+        expired = evicted = 0
+        if self.max_age > 0:
+            deadline = time.time() - self.max_age
+            while self._entries and next(iter(self._entries.values())).accessed < deadline:
+                paths += self._remove(next(iter(self._entries)))
+                expired += 1
+        while self._entries and (
+            self._total_bytes > self.max_bytes or len(self._entries) > self.max_entries
+        ):
+            paths += self._remove(next(iter(self._entries)))
+            evicted += 1
+        self._over_quota.clear()
+
+        await asyncio.to_thread(self._apply, paths, self._touched_files())
+
+        self.expired += expired
+        self.evicted += evicted
+        if expired or evicted:
+            logger.info(f"🧹 File store sweep: {expired} expired, {evicted} evicted")
+        return expired + evicted
+
+    def _touched_files(self):
+        # Last use is kept in the mtime, so retention survives restarts and
+        # is seen by the other processes
+        touched = [
+            (stored.path, stored.accessed)
+            for stem in self._touched
+            for stored in (self._files[name] for name in self._entries[stem].names)
+        ]
+        self._touched.clear()
+        return touched
+
+    def _scan_all(self):
+        files = []
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and len(entry.name) == 2:
+                files += self._scan_shard(entry.path)
+        return [stored for stored in files if stored is not None]
+
+    def _forget_deleted(self, files, before):
+        present = {stored.name for stored in files}
+        for stem in [
+            stem for stem, entry in self._entries.items()
+            if entry.accessed < before and not entry.names & present
+        ]:
+            self._remove(stem)
+
+    def _refresh(self, files):
+        reorder = False
+        for stored in files:
+            known = self._files.get(stored.name)
+            if known is None:
+                self._add(stored)
+            elif stored.created > known.accessed:
+                known.accessed = stored.created
+                entry = self._entries[stem_of(stored.name)]
+                if known.accessed > entry.accessed:
+                    entry.accessed = known.accessed
+                    reorder = True
+        if reorder:
+            self._entries = OrderedDict(sorted(self._entries.items(), key=lambda item: item[1].accessed))
+
+    @staticmethod
+    def _apply(deleted, touched):
+        for path in deleted:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        for path, accessed in touched:
+            try:
+                os.utime(path, (accessed, accessed))
+            except FileNotFoundError:
+                pass
+
+    async def _sweep_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._over_quota.wait(), self.sweep_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self.sweeps and not self.owner and self._acquire_lock():
+                # The owner stopped: this process takes the sweep over
+                self.owner = True
+                logger.info(f"🗄️ File store now sweeps {self.root}")
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"❌ File store sweep failed: {str(e)}")
+
+    def start(self):
+        """Starts the background sweep."""
+        self._task = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        # Persist the last use of files touched since the last sweep
+        await self.sweep()
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+            self.owner = False
+
+    def stats(self):
+        return {
+            "files": len(self._files),
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            "max_age_seconds": self.max_age,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,182 @@
+import re
+import unicodedata
+from collections import namedtuple
+
+Route = namedtuple("Route", ["intent", "variant", "topic"])
+
+# Words that never become part of the topic slug
+STOPWORDS = {
+    "a", "al", "an", "and", "about", "con", "de", "del", "el", "en", "for", "la",
+    "las", "los", "me", "of", "on", "para", "por", "sobre", "the", "to", "un",
+    "una", "unos", "unas", "y", "with",
+}
+
+
+WORD = re.compile(r"\w+")
+# Folded text is ASCII: everything but letters, digits and '_' separates words
+SEPARATORS = bytes(c if c < 128 and (chr(c).isalnum() or c == ord("_")) else ord(" ") for c in range(256))
+STOPWORD_BYTES = {word.encode() for word in STOPWORDS}
+
+
+def _fold_bytes(text):
+    text = text.casefold()
+    if text.isascii():
+        return text.encode("ascii")
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore")
+
+
+def fold(text):
+    """
+    Lowercases text and strips accents (e.g. 'Gráfica' -> 'grafica').
+    Characters without an ASCII base letter (such as '¿') are dropped.
+    """
+    return _fold_bytes(text).decode("ascii")
+
+
+def _word_bytes(text):
+    # Folded words as ASCII bytes: bytes.translate and split are much faster than a regex
+    return _fold_bytes(text).translate(SEPARATORS).split()
+
+
+def words_of(text):
+    """Folds text and splits it into words (the same words as `\\w+` on the folded text)."""
+    return [word.decode("ascii") for word in _word_bytes(text)]
+
+
+def slugify(text):
+    """Builds a file-name slug from free text (e.g. 'Ventas 2024' -> 'ventas_2024')."""
+    return "_".join(words_of(text))[:50].strip("_")
+
+
+class IntentRouter:
+    """
+    Keyword-based router that decides which tool handles a message.
+
+    The message is folded once and split into words with a byte
+    translation table; the words are intersected with a hash table built
+    from the whole lexicon, whose entries are bitmasks of labels, so the cost of
+    classifying a message (tool and tool variant such as the chart type)
+    does not grow with the number of keywords. Tools register their own
+    triggers:
+
+        router.add_keywords("pdf", ["pdf"])
+        router.register_tool("pdf", requires=["generate", "pdf"])
+
+    Keywords are matched on whole words after folding case and accents; a
+    trailing '*' matches any word starting with the keyword.
+    """
+
+    def __init__(self):
+        self._labels = {}  # label -> bit
+        self._keywords = {}  # keyword -> label bits
+        self._prefixes = {}  # keyword prefix (from 'word*') -> label bits
+        self._tools = []  # (name, required bits, [(variant, bit)], default_variant)
+        self._excluded = set(STOPWORD_BYTES)  # words never part of the topic
+
+    def _bit(self, label):
+        return self._labels.setdefault(label, 1 << len(self._labels))
+
+    def add_keywords(self, label, words):
+        """Adds trigger words under a label (e.g. 'chart', 'pdf')."""
+        bit = self._bit(label)
+        for word in words:
+            word = _fold_bytes(word)
+            if word.endswith(b"*"):
+                self._prefixes[word[:-1]] = self._prefixes.get(word[:-1], 0) | bit
+            else:
+                self._keywords[word] = self._keywords.get(word, 0) | bit
+                self._excluded.add(word)
+
+    def register_tool(self, name, requires, variants=None, default_variant=None):
+        """
+        Registers a tool triggered when every label in `requires` is present.
+
+        Tools are checked in registration order. `variants` maps a variant
+        name to its trigger words; the first registered variant found in the
+        message wins, otherwise `default_variant` is used.
+        """
+        variant_labels = []
+        for variant, words in (variants or {}).items():
+            label = f"{name}:{variant}"
+            self.add_keywords(label, words)
+            variant_labels.append((variant, self._bit(label)))
+        required = 0
+        for label in requires:
+            required |= self._bit(label)
+        self._tools.append((name, required, variant_labels, default_variant))
+
+    def _prefix_labels(self, word):
+        labels = 0
+        for prefix, prefix_labels in self._prefixes.items():
+            if word.startswith(prefix):
+                labels |= prefix_labels
+        return labels
+
+    def route(self, message):
+        """
+        Classifies a message.
+
+        Args:
+            message: Raw user message
+
+        Returns:
+            Route: (intent, variant, topic) where intent is a tool name or
+            'chat', and topic is a slug built from the non-keyword words
+            (empty for plain chat, where no file is named after it)
+        """
+        words = _word_bytes(message)
+        found = 0
+        for word in self._keywords.keys() & words:
+            found |= self._keywords[word]
+        if self._prefixes:
+            prefixes = tuple(self._prefixes)
+            for word in words:
+                if word.startswith(prefixes):
+                    found |= self._prefix_labels(word)
+
+        if found:
+            for name, required, variant_labels, default_variant in self._tools:
+                if found & required == required:
+                    variant = next(
+                        (variant for variant, bit in variant_labels if found & bit),
+                        default_variant,
+                    )
+                    return Route(name, variant, self._topic(words))
+        return Route("chat", None, "")
+
+    def _topic(self, words):
+        excluded = self._excluded
+        topic_words = [word for word in words if word not in excluded]
+        if self._prefixes:
+            prefixes = tuple(self._prefixes)
+            topic_words = [word for word in topic_words if not word.startswith(prefixes)]
+        return b"_".join(topic_words)[:50].decode("ascii").strip("_")
+
+
+def build_default_router():
+    """Creates the router with the built-in chart and PDF triggers (Spanish/English)."""
+    generate = ["genera", "generar", "generame", "generalo", "generala", "genere", "generate"]
+    create = [
+        "crea", "crear", "creame", "crealo", "creala", "create", "dibuja", "dibujame", "draw",
+        "haz", "hazme", "make", "muestra", "muestrame", "show", "plot",
+    ]
+
+    router = IntentRouter()
+    router.add_keywords("generate", generate)
+    router.add_keywords("chart_action", generate + create)
+    router.add_keywords("chart", [
+        "grafica", "graficas", "grafico", "graficos", "chart", "charts", "graph",
+        "histograma", "histogramas", "histogram", "heatmap",
+    ])
+    router.add_keywords("pdf", ["pdf"])
+
+    router.register_tool("chart", ["chart_action", "chart"], {
+        "line": ["linea", "lineas", "line"],
+        "pie": ["circular", "pie", "pastel", "tarta"],
+        "scatter": ["dispersion", "scatter"],
+        "histogram": ["histograma", "histogramas", "histogram", "histograms"],
+        "heatmap": ["heatmap", "calor", "heat"],
+        "bar": ["barra", "barras", "bar", "bars"],
+    }, default_variant="bar")
+    router.register_tool("pdf", ["generate", "pdf"])
+    return router
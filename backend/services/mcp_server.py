@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import os
+import time
+
+import mcp.types as types
+from mcp.server import Server
+from mcp.server.sse import SseServerTransport
+from mcp.server.stdio import stdio_server
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+from services.metrics import Counter, Histogram
+from tools.render_options import CHART_DPI, CHART_FORMATS, CHART_PROFILES, CHART_TYPES, DEFAULT_CHART_PROFILE
+
+# The mcp package is slow to load: the web app only imports this module on
+# the first /mcp request, or when started with `python main.py --mcp`
+
+logger = logging.getLogger(__name__)
+
+# MCP defaults (overridable through environment variables)
+MCP_MAX_CONCURRENCY = int(os.getenv("MCP_MAX_CONCURRENCY", "8"))
+MCP_PROGRESS_INTERVAL = float(os.getenv("MCP_PROGRESS_INTERVAL", "2"))
+
+MCP_TOOL_CALLS = Counter("atom_mcp_tool_calls", "MCP tool calls by tool and outcome", ("tool", "outcome"))
+MCP_TOOL_SECONDS = Histogram("atom_mcp_tool_seconds", "MCP tool call latency, queueing included", ("tool",))
+
+PROVIDER_SCHEMA = {
+    "type": "string",
+    "description": "Model pool ('local', 'openai') or provider name; defaults to 'local'",
+}
+
+TOOLS = [
+    types.Tool(
+        name="chat",
+        description="Send a message to a model (the local one by default) and get its answer",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "message": {"type": "string"},
+                "provider": PROVIDER_SCHEMA,
+                "isUsingChatGPT": {"type": "boolean", "description": "Same as provider 'openai'"},
+            },
+            "required": ["message"],
+        },
+    ),
+    types.Tool(
+        name="generate_chart",
+        description=(
+            "Render a chart (PNG, SVG or PDF) and return its URL. Pass the values in `data` to render "
+            "them directly; with only a `message`, a model is asked for the data first."
+        ),
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "data": {
+                    "type": ["object", "array"],
+                    "description": (
+                        'Labels to numbers ({"2020": 10, "2021": 12}), several series '
+                        '({"series": {"sales": {"2020": 10}, "costs": {"2020": 7}}}), columns '
+                        '({"labels": ["Q1", "Q2"], "sales": [10, 12]}) or records '
+                        '([{"year": 2020, "sales": 10}])'
+                    ),
+                },
+                "message": {"type": "string", "description": "What to chart, when `data` is not given"},
+                "chartType": {"type": "string", "enum": list(CHART_TYPES), "default": "bar"},
+                "topic": {"type": "string", "description": "Short topic used in the file name"},
+                "profile": {
+                    "type": "string",
+                    "enum": list(CHART_PROFILES),
+                    "default": DEFAULT_CHART_PROFILE,
+                    "description": "'preview' (chat size), 'standard' or 'print' (high resolution)",
+                },
+                "format": {"type": "string", "enum": list(CHART_FORMATS), "default": "png"},
+                "dpi": {"type": "integer", "minimum": 50, "maximum": CHART_DPI, "description": "Overrides the profile's"},
+                "provider": PROVIDER_SCHEMA,
+            },
+            "anyOf": [{"required": ["data"]}, {"required": ["message"]}],
+        },
+    ),
+    types.Tool(
+        name="generate_pdf",
+        description=(
+            "Render a PDF document and return its URL. Pass markdown-ish `content` (headings, "
+            "lists, tables, ```chart <type> blocks with JSON data, drawn as vector charts) to "
+            "render it directly; with only a `message`, a model writes it first."
+        ),
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "content": {"type": "string", "description": "Document text; the first short paragraph is the title"},
+                "message": {"type": "string", "description": "What to write about, when `content` is not given"},
+                "topic": {"type": "string", "description": "Short topic used in the file name"},
+                "provider": PROVIDER_SCHEMA,
+            },
+            "anyOf": [{"required": ["content"]}, {"required": ["message"]}],
+        },
+    ),
+]
+
+
+class Progress:
+    """
+    Progress reporter of one tool call.
+
+    Tools report the step they start with `await progress(step, total,
+    message)`. While a step runs, a heartbeat repeats it every `interval`
+    seconds with the elapsed time and a slightly higher progress value, so
+    clients waiting on a long render see it is still alive. Without a
+    progress token from the client, nothing is sent.
+    """
+
+    def __init__(self, send=None, interval=MCP_PROGRESS_INTERVAL):
+        self._send = send
+        self._interval = interval
+        self._step = (0, None, "")
+        self._started = time.perf_counter()
+        self._task = None
+
+    async def __call__(self, step, total, message):
+        self._step = (step, total, message)
+        self._started = time.perf_counter()
+        if self._send is not None:
+            await self._send(step, total, message)
+
+    async def _beat(self):
+        beats = 0
+        while True:
+            await asyncio.sleep(self._interval)
+            beats += 1
+            step, total, message = self._step
+            elapsed = time.perf_counter() - self._started
+            # Progress must increase with every notification
+            await self._send(step + beats / (beats + 1), total, f"{message} ({elapsed:.0f}s)")
+
+    def start(self):
+        if self._send is not None and self._interval > 0:
+            self._task = asyncio.create_task(self._beat())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+class ToolExecutor:
+    """
+    Runs the tool calls of every MCP session (stdio and HTTP) with a shared
+    concurrency limit.
+
+    The MCP server handles each request in its own task, so calls from one
+    or many clients run concurrently; the executor caps how many run at
+    once (the rest wait for a slot) and counts them. Model calls and
+    renders then go through the same router, admission control and render
+    pool as the HTTP API.
+    """
+
+    def __init__(self, max_concurrency=MCP_MAX_CONCURRENCY):
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def run(self, name, func, arguments, progress):
+        start = time.perf_counter()
+        async with self._slots:
+            progress.start()
+            try:
+                result = await func(arguments, progress)
+            except Exception:
+                MCP_TOOL_CALLS.labels(name, "error").inc()
+                raise
+            finally:
+                progress.stop()
+                MCP_TOOL_SECONDS.labels(name).observe(time.perf_counter() - start)
+        MCP_TOOL_CALLS.labels(name, "ok").inc()
+        return result
+
+
+def create_mcp_server(handlers, executor=None):
+    """
+    Creates the MCP server exposing the chat, chart and PDF tools.
+
+    Args:
+        handlers: Dict of tool name to coroutine function
+            `handler(arguments, progress)` returning a result dict (the same
+            payload the HTTP API answers with)
+        executor: ToolExecutor shared by every session (a new one by default)
+
+    Returns:
+        Server: The MCP server, to be run with serve_stdio() or sse_app()
+    """
+    server = Server("atom-llm-server")
+    executor = executor or ToolExecutor()
+
+    @server.list_tools()
+    async def list_tools():
+        return TOOLS
+
+    @server.call_tool()
+    async def call_tool(name, arguments):
+        handler = handlers.get(name)
+        if handler is None:
+            raise ValueError(f"Unknown tool: {name}")
+
+        context = server.request_context
+        token = context.meta.progressToken if context.meta else None
+        send = None
+        if token is not None:
+            async def send(progress, total, message):
+                await context.session.send_progress_notification(
+                    token, progress, total, message, related_request_id=str(context.request_id)
+                )
+
+        logger.debug("🧰 MCP tool call: %s", name)
+        result = await executor.run(name, handler, arguments, Progress(send))
+        if result.get("type") == "text":
+            return [types.TextContent(type="text", text=result["response"])]
+        return result
+
+    return server
+
+
+async def serve_stdio(server):
+    """Serves MCP over stdin/stdout until the client disconnects."""
+    async with stdio_server() as (read_stream, write_stream):
+        await server.run(read_stream, write_stream, server.create_initialization_options())
+
+
+def sse_app(server):
+    """
+    ASGI app serving MCP over HTTP: clients open the event stream with
+    GET `<mount>/sse` and post their messages to `<mount>/messages/`.
+    """
+    transport = SseServerTransport("/messages/")
+
+    async def handle_sse(request):
+        async with transport.connect_sse(request.scope, request.receive, request._send) as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, server.create_initialization_options())
+        return Response()
+
+    return Starlette(routes=[
+        Route("/sse", endpoint=handle_sse, methods=["GET"]),
+        Mount("/messages/", app=transport.handle_post_message),
+    ])
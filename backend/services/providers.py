@@ -0,0 +1,426 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+
+from services.admission import UpstreamOverloaded
+from services.conversation_store import with_context
+from services.metrics import Counter
+from services.stats import percentiles
+from services.upstream import (
+    UpstreamClient,
+    UpstreamError,
+    anything_llm_chat,
+    anything_llm_stream,
+    openai_chat,
+    openai_stream,
+)
+
+logger = logging.getLogger(__name__)
+
+# Provider settings (overridable through environment variables)
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+ANYTHING_LLM_URL = os.getenv("ANYTHING_LLM_URL")
+ANYTHING_LLM_API_KEY = os.getenv("ANYTHING_LLM_API_KEY")
+ANYTHING_LLM_WORKSPACE = os.getenv("ANYTHING_LLM_WORKSPACE", "rag")
+LM_STUDIO_URLS = os.getenv("LM_STUDIO_URLS", "")  # "http://host:1234*3,http://other:1234"
+LM_STUDIO_MODEL = os.getenv("LM_STUDIO_MODEL", "local-model")
+LM_STUDIO_API_KEY = os.getenv("LM_STUDIO_API_KEY")
+LLM_STUB = os.getenv("LLM_STUB", "false").lower() == "true"
+
+# Routing settings
+LLM_ROUTING = os.getenv("LLM_ROUTING", "p95")  # p95, weighted or failover
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "0"))  # seconds, 0 disables hedging
+LLM_HEALTH_INTERVAL = float(os.getenv("LLM_HEALTH_INTERVAL", "15"))
+LLM_UNHEALTHY_AFTER = int(os.getenv("LLM_UNHEALTHY_AFTER", "3"))  # consecutive failures
+
+LOCAL_POOL = "local"
+OPENAI_POOL = "openai"
+ROUTING_POLICIES = ("p95", "weighted", "failover")
+STUB_TEXT = '{"2020": 50000000, "2021": 55000000, "2022": 60000000, "2023": 58000000}'
+
+ROUTED_CALLS = Counter("atom_llm_calls", "Model calls by provider and outcome", ("provider", "outcome"))
+
+
+def chat_messages(message, rules, summary="", turns=()):
+    """Builds an OpenAI-style message list: rules (and summary) as system prompt, then the turns."""
+    system = f"{rules}\n\nSummary of the earlier conversation:\n{summary}" if summary else rules
+    return [
+        {"role": "system", "content": system},
+        *turns,
+        {"role": "user", "content": message},
+    ]
+
+
+class Provider:
+    """
+    One model backend the router can send a chat to.
+
+    Subclasses implement `chat`, `stream` and `check`. The router records the
+    latency of every successful call (whole answer for chat, first chunk for
+    streams) and the consecutive failures, which drive routing and health.
+    """
+
+    kind = "provider"
+
+    def __init__(self, name, weight=1.0):
+        self.name = name
+        self.weight = weight
+        self.healthy = True
+        self.failures = 0  # consecutive
+        self.calls = 0
+        self.errors = 0
+        self._latency = {"chat": deque(maxlen=200), "stream": deque(maxlen=200)}
+
+    async def chat(self, message, rules, summary="", turns=()):
+        """Returns the whole answer to a message with its conversation context."""
+        raise NotImplementedError
+
+    def stream(self, message, rules, summary="", turns=()):
+        """Returns an async generator of answer chunks."""
+        raise NotImplementedError
+
+    async def check(self):
+        """Raises UpstreamError if the backend is not reachable."""
+
+    async def aclose(self):
+        pass
+
+    def p95(self, mode):
+        """
+        95th percentile latency of recent calls, as reported by stats(); 0
+        before the first one (so it gets tried).
+        """
+        return percentiles(self._latency[mode])["p95"] or 0.0
+
+    def record(self, mode, seconds):
+        self._latency[mode].append(seconds)
+        self.calls += 1
+        self.failures = 0
+        ROUTED_CALLS.labels(self.name, "ok").inc()
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "weight": self.weight,
+            "healthy": self.healthy,
+            "calls": self.calls,
+            "errors": self.errors,
+            "consecutive_failures": self.failures,
+            "chat_seconds": percentiles(self._latency["chat"]),
+            "first_chunk_seconds": percentiles(self._latency["stream"]),
+        }
+
+
+class AnythingLLMProvider(Provider):
+    """AnythingLLM workspace chat; the conversation context is rendered into the message."""
+
+    kind = "anythingllm"
+
+    def __init__(self, name, base_url, api_key=None, workspace="rag", weight=1.0):
+        super().__init__(name, weight)
+        self.client = UpstreamClient(name, base_url, api_key=api_key)
+        self.workspace = workspace
+
+    async def chat(self, message, rules, summary="", turns=()):
+        return await anything_llm_chat(self.client, with_context(message, summary, turns), rules, self.workspace)
+
+    def stream(self, message, rules, summary="", turns=()):
+        return anything_llm_stream(self.client, with_context(message, summary, turns), rules, self.workspace)
+
+    async def check(self):
+        await self.client.probe("/api/ping")
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class OpenAICompatibleProvider(Provider):
+    """OpenAI chat completions API, or any server speaking it (LM Studio, vLLM, llama.cpp)."""
+
+    kind = "openai"
+
+    def __init__(self, name, base_url, model, api_key=None, weight=1.0):
+        super().__init__(name, weight)
+        self.client = UpstreamClient(name, base_url, api_key=api_key)
+        self.model = model
+
+    async def chat(self, message, rules, summary="", turns=()):
+        return await openai_chat(self.client, chat_messages(message, rules, summary, turns), self.model)
+
+    def stream(self, message, rules, summary="", turns=()):
+        return openai_stream(self.client, chat_messages(message, rules, summary, turns), self.model)
+
+    async def check(self):
+        await self.client.probe("/v1/models")
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class StubProvider(Provider):
+    """In-process stand-in answering a fixed text, for tests and load tests without a model."""
+
+    kind = "stub"
+
+    def __init__(self, name="stub", text=STUB_TEXT, latency=0.0, token_delay=0.0, weight=1.0):
+        super().__init__(name, weight)
+        self.text = text
+        self.latency = latency
+        self.token_delay = token_delay
+
+    async def chat(self, message, rules, summary="", turns=()):
+        await asyncio.sleep(self.latency)
+        return self.text
+
+    async def stream(self, message, rules, summary="", turns=()):
+        await asyncio.sleep(self.latency)
+        for token in self.text.split(" "):
+            yield token + " "
+            await asyncio.sleep(self.token_delay)
+
+
+class NoProvider(Exception):
+    """Raised when a request names a pool or provider that is not registered."""
+
+
+class ModelRouter:
+    """
+    Registry of model providers, grouped in pools, with policy-based routing.
+
+    A request names a pool (or a single provider). Its healthy providers are
+    ordered by the routing policy: lowest recent p95 latency (`p95`), random
+    in proportion to their weight (`weighted`, to spread load over replicas)
+    or registration order (`failover`). The first one is called; when it
+    fails the next one is tried, and with `hedge_after` set, the next one is
+    also started when the first has not answered after that many seconds.
+    The first answer wins and the other calls are cancelled. Streams are
+    routed the same way up to their first chunk.
+
+    Providers failing `unhealthy_after` times in a row are taken out of
+    rotation until a background health check reaches them again. When a
+    pool has no healthy provider left, all of them are tried anyway.
+    """
+
+    def __init__(self, policy=LLM_ROUTING, hedge_after=LLM_HEDGE_AFTER,
+                 health_interval=LLM_HEALTH_INTERVAL, unhealthy_after=LLM_UNHEALTHY_AFTER):
+        if policy not in ROUTING_POLICIES:
+            raise ValueError(f"Unknown routing policy '{policy}' (use {', '.join(ROUTING_POLICIES)})")
+        self.policy = policy
+        self.hedge_after = hedge_after
+        self.health_interval = health_interval
+        self.unhealthy_after = unhealthy_after
+        self.providers = {}  # name -> Provider
+        self.pools = {}  # pool -> [provider names]
+        self._task = None
+        self.hedged = 0
+        self.failovers = 0
+
+    def register(self, pool, provider):
+        self.providers[provider.name] = provider
+        self.pools.setdefault(pool, []).append(provider.name)
+        logger.info(f"🔌 Model provider registered: {provider.name} ({provider.kind}) in pool '{pool}'")
+
+    def __contains__(self, target):
+        return target in self.pools or target in self.providers
+
+    def candidates(self, target, mode="chat"):
+        """
+        Returns the providers to try for a pool or provider name, in order.
+
+        Raises:
+            NoProvider: If nothing is registered under that name
+        """
+        if target in self.pools:
+            providers = [self.providers[name] for name in self.pools[target]]
+        elif target in self.providers:
+            return [self.providers[target]]
+        else:
+            raise NoProvider(f"No model provider or pool named '{target}'")
+
+        healthy = [provider for provider in providers if provider.healthy] or providers
+        if self.policy == "p95":
+            # A provider that just failed goes after the others, whatever its latency
+            return sorted(healthy, key=lambda provider: (provider.failures, provider.p95(mode)))
+        if self.policy == "weighted":
+            # Weighted random order without replacement (Efraimidis-Spirakis keys)
+            return sorted(healthy, key=lambda provider: random.random() ** (1 / provider.weight), reverse=True)
+        return healthy
+
+    async def chat(self, target, message, rules, summary="", turns=()):
+        """
+        Returns the whole answer from the first provider of the pool that succeeds.
+
+        Raises:
+            UpstreamError: If every provider failed
+            UpstreamOverloaded: If every provider was overloaded
+        """
+        async def attempt(provider):
+            return await provider.chat(message, rules, summary, turns)
+
+        _, text = await self._first_success(self.candidates(target, "chat"), "chat", attempt)
+        return text
+
+    async def stream(self, target, message, rules, summary="", turns=()):
+        """Yields the answer chunks of the first provider of the pool that starts answering."""
+        async def attempt(provider):
+            chunks = provider.stream(message, rules, summary, turns)
+            try:
+                return chunks, await chunks.__anext__()
+            except StopAsyncIteration:
+                return chunks, None
+            except BaseException:
+                await chunks.aclose()
+                raise
+
+        async def discard(result):
+            await result[0].aclose()
+
+        _, (chunks, first) = await self._first_success(self.candidates(target, "stream"), "stream", attempt, discard)
+        try:
+            if first is not None:
+                yield first
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    async def _first_success(self, providers, mode, attempt, discard=None):
+        remaining = list(providers)
+        running = {}  # task -> (provider, start)
+        error = None
+
+        def launch():
+            provider = remaining.pop(0)
+            running[asyncio.create_task(attempt(provider))] = (provider, time.perf_counter())
+
+        launch()
+        try:
+            while running:
+                hedge = self.hedge_after > 0 and remaining
+                done, _ = await asyncio.wait(
+                    running, timeout=self.hedge_after if hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    self.hedged += 1
+                    logger.debug("🏁 Hedging with %s", remaining[0].name)
+                    launch()
+                    continue
+                winner = None
+                for task in done:
+                    provider, start = running.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        self._failed(provider, error)
+                    elif winner is None:
+                        provider.record(mode, time.perf_counter() - start)
+                        winner = provider, task.result()
+                    elif discard:
+                        await discard(task.result())
+                if winner:
+                    return winner
+                if not running and remaining:
+                    self.failovers += 1
+                    logger.warning(f"🔀 Failing over to {remaining[0].name}: {str(error)}")
+                    launch()
+            raise error
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    def _failed(self, provider, error):
+        provider.errors += 1
+        ROUTED_CALLS.labels(provider.name, "error").inc()
+        if isinstance(error, UpstreamOverloaded):
+            # Busy, not broken: try elsewhere but keep it in rotation
+            return
+        provider.failures += 1
+        if provider.healthy and provider.failures >= self.unhealthy_after:
+            provider.healthy = False
+            logger.warning(f"🩺 {provider.name} taken out of rotation after {provider.failures} failures")
+
+    async def check_health(self):
+        """Probes every provider and updates its health."""
+        async def probe(provider):
+            try:
+                await provider.check()
+            except Exception as e:
+                if provider.healthy:
+                    logger.warning(f"🩺 {provider.name} failed its health check: {str(e)}")
+                provider.healthy = False
+                return
+            if not provider.healthy:
+                logger.info(f"🩺 {provider.name} is healthy again")
+            provider.healthy = True
+            provider.failures = 0
+
+        await asyncio.gather(*(probe(provider) for provider in self.providers.values()))
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.error(f"❌ Health check failed: {str(e)}")
+
+    def start(self):
+        """Starts the background health checks."""
+        if self.health_interval > 0:
+            self._task = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for provider in self.providers.values():
+            await provider.aclose()
+
+    def stats(self):
+        return {
+            "policy": self.policy,
+            "hedge_after_seconds": self.hedge_after,
+            "hedged": self.hedged,
+            "failovers": self.failovers,
+            "pools": self.pools,
+            "providers": {name: provider.stats() for name, provider in self.providers.items()},
+        }
+
+
+def parse_replicas(value):
+    """Parses "url*weight,url" into (url, weight) pairs."""
+    replicas = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        url, _, weight = item.partition("*")
+        replicas.append((url.strip(), float(weight) if weight else 1.0))
+    return replicas
+
+
+def build_model_router():
+    """
+    Creates the router from the environment: the `local` pool with AnythingLLM
+    and the LM Studio replicas, the `openai` pool with the OpenAI API, and the
+    stub provider in both when LLM_STUB is set.
+    """
+    router = ModelRouter()
+    replicas = parse_replicas(LM_STUDIO_URLS)
+    if ANYTHING_LLM_URL or not replicas:
+        router.register(LOCAL_POOL, AnythingLLMProvider(
+            "AnythingLLM", ANYTHING_LLM_URL, ANYTHING_LLM_API_KEY, ANYTHING_LLM_WORKSPACE
+        ))
+    for i, (url, weight) in enumerate(replicas, start=1):
+        router.register(LOCAL_POOL, OpenAICompatibleProvider(
+            f"LMStudio-{i}", url, LM_STUDIO_MODEL, LM_STUDIO_API_KEY, weight
+        ))
+    router.register(OPENAI_POOL, OpenAICompatibleProvider("OpenAI", OPENAI_BASE_URL, OPENAI_MODEL, OPENAI_API_KEY))
+    if LLM_STUB:
+        stub = StubProvider()
+        router.register(LOCAL_POOL, stub)
+        router.register(OPENAI_POOL, stub)
+    return router
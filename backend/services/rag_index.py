@@ -0,0 +1,244 @@
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Local RAG index defaults (overridable through environment variables)
+RAG_DIR = Path(os.getenv("RAG_DIR", "rag"))
+RAG_DIM = int(os.getenv("RAG_DIM", "512"))
+RAG_IVF_CELLS = int(os.getenv("RAG_IVF_CELLS", "256"))
+RAG_IVF_PROBES = int(os.getenv("RAG_IVF_PROBES", "8"))
+RAG_IVF_TRAIN = int(os.getenv("RAG_IVF_TRAIN", "4096"))
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+RAG_APPROXIMATE = os.getenv("RAG_APPROXIMATE", "false").lower() == "true"
+INITIAL_CAPACITY = 1024
+ASSIGN_BLOCK = 65536
+KMEANS_ITERATIONS = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL,
+    created REAL NOT NULL,
+    chunks INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+"""
+
+
+class VectorIndex:
+    """
+    Append-only store of chunk embeddings with exact and approximate top-k search.
+
+    Embeddings are unit-length float32 rows of a memory-mapped matrix
+    (`vectors.f32`), so the corpus does not have to fit in RAM and is
+    available right after a restart without re-embedding; its capacity
+    doubles when full. Chunk texts live in SQLite, with the chunk id equal to
+    the matrix row.
+
+    `search` scores every row with one matrix-vector product (flat). With
+    `approximate=True` it uses an inverted file: rows are grouped into
+    RAG_IVF_CELLS cells around k-means centroids, and only the rows of the
+    RAG_IVF_PROBES cells closest to the query are scored. The centroids are
+    trained once, on the first RAG_IVF_TRAIN chunks, and saved next to the
+    matrix; later chunks are just appended to their nearest cell, so the
+    index never needs a rebuild. Until then approximate queries scan
+    everything, which is cheap at that size.
+    """
+
+    def __init__(self, directory=RAG_DIR, dim=RAG_DIM, cells=RAG_IVF_CELLS, probes=RAG_IVF_PROBES,
+                 train_size=RAG_IVF_TRAIN):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.probes = probes
+        self.train_size = max(train_size, cells)
+        self._cells_wanted = cells
+        self._centroids = None
+        self._lists = []  # cell -> list of rows
+
+        self._db = sqlite3.connect(self.directory / "index.db", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self.count = self._db.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM chunks").fetchone()[0]
+
+        self._path = self.directory / "vectors.f32"
+        capacity = max(INITIAL_CAPACITY, self.count)
+        if self._path.exists():
+            capacity = max(capacity, self._path.stat().st_size // (4 * dim))
+        self._map(capacity)
+        self._centroids_path = self.directory / "centroids.npy"
+        if self._centroids_path.exists():
+            self._set_centroids(np.load(self._centroids_path))
+            for start in range(0, self.count, ASSIGN_BLOCK):
+                rows = np.arange(start, min(start + ASSIGN_BLOCK, self.count))
+                self._assign(rows, self._vectors[rows])
+        elif self.count >= self.train_size:
+            self._train()
+        logger.info(f"📚 RAG index loaded: {self.count} chunks")
+
+    def _map(self, capacity):
+        size = capacity * self.dim * 4
+        with open(self._path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self._vectors = np.memmap(self._path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.capacity = capacity
+
+    def _set_centroids(self, centroids):
+        self._centroids = centroids
+        self._lists = [[] for _ in range(len(centroids))]
+
+    def _assign(self, rows, vectors):
+        cells = np.argmax(vectors @ self._centroids.T, axis=1)
+        for row, cell in zip(rows.tolist(), cells.tolist()):
+            self._lists[cell].append(row)
+
+    def _train(self):
+        # Spherical k-means on the first train_size rows, seeded so it is reproducible
+        start = time.perf_counter()
+        sample = np.asarray(self._vectors[:self.train_size])
+        rng = np.random.default_rng(0)
+        centroids = sample[rng.choice(len(sample), self._cells_wanted, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            cells = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, cells, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]  # keep the previous centroid of an empty cell
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        np.save(self._centroids_path, centroids)
+        self._set_centroids(centroids)
+        for block in range(0, self.count, ASSIGN_BLOCK):
+            rows = np.arange(block, min(block + ASSIGN_BLOCK, self.count))
+            self._assign(rows, self._vectors[rows])
+        logger.info(
+            f"📚 RAG index trained: {len(centroids)} cells in {time.perf_counter() - start:.2f}s"
+        )
+
+    def add_document(self, filename):
+        """Registers a document being ingested and returns its id."""
+        with self._db:
+            cursor = self._db.execute(
+                "INSERT INTO documents (filename, created, status) VALUES (?, ?, 'ingesting')",
+                (filename, time.time()),
+            )
+        return cursor.lastrowid
+
+    def finish_document(self, document_id, status="ready"):
+        with self._db:
+            self._db.execute(
+                "UPDATE documents SET status = ?, chunks ="
+                " (SELECT COUNT(*) FROM chunks WHERE document_id = ?) WHERE id = ?",
+                (status, document_id, document_id),
+            )
+
+    def add(self, document_id, position, texts, vectors):
+        """
+        Appends a batch of chunks of a document.
+
+        Args:
+            document_id: Id returned by add_document
+            position: Index of the first chunk within the document
+            texts: Chunk texts
+            vectors: (len(texts), dim) unit-length float32 embeddings
+        """
+        n = len(texts)
+        if self.count + n > self.capacity:
+            self._vectors.flush()
+            capacity = self.capacity
+            while self.count + n > capacity:
+                capacity *= 2
+            self._map(capacity)
+        rows = np.arange(self.count, self.count + n)
+        self._vectors[rows] = vectors
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO chunks (id, document_id, position, text) VALUES (?, ?, ?, ?)",
+                [(row, document_id, position + i, text) for i, (row, text) in enumerate(zip(rows.tolist(), texts))],
+            )
+        self.count += n
+        if self._centroids is not None:
+            self._assign(rows, vectors)
+        elif self.count >= self.train_size:
+            self._train()
+
+    def _candidates(self, query):
+        scores = self._centroids @ query
+        probes = min(self.probes, len(scores))
+        found = [self._lists[cell] for cell in np.argpartition(-scores, probes - 1)[:probes]]
+        if not any(found):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.asarray(rows, dtype=np.int64) for rows in found if rows])
+
+    def search(self, query, k=5, approximate=False):
+        """
+        Returns the k most similar chunks to a unit-length query vector.
+
+        Args:
+            query: (dim,) float32 embedding
+            k: Number of results
+            approximate: Score only the rows of the closest IVF cells
+
+        Returns:
+            list: (chunk id, cosine score) pairs, best first
+        """
+        if self.count == 0:
+            return []
+        rows = None
+        if approximate and self._centroids is not None:
+            rows = self._candidates(query)
+            if len(rows) < k:
+                rows = None  # too few candidates: fall back to the exact scan
+        vectors = self._vectors[:self.count] if rows is None else self._vectors[rows]
+        scores = vectors @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        ids = top if rows is None else rows[top]
+        return [(int(i), float(scores[j])) for i, j in zip(ids, top)]
+
+    def chunks(self, ids):
+        """Returns {id: (filename, position, text)} for the given chunk ids."""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        rows = self._db.execute(
+            "SELECT chunks.id, documents.filename, chunks.position, chunks.text FROM chunks"
+            f" JOIN documents ON documents.id = chunks.document_id WHERE chunks.id IN ({placeholders})",
+            ids,
+        ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def documents(self):
+        rows = self._db.execute(
+            "SELECT id, filename, created, chunks, status FROM documents ORDER BY id"
+        ).fetchall()
+        return [
+            {"id": i, "filename": f, "created": c, "chunks": n, "status": s}
+            for i, f, c, n, s in rows
+        ]
+
+    def stats(self):
+        return {
+            "chunks": self.count,
+            "capacity": self.capacity,
+            "dim": self.dim,
+            "ivf_cells": len(self._lists),
+            "ivf_probes": self.probes,
+        }
+
+    def close(self):
+        self._vectors.flush()
+        self._db.close()
@@ -0,0 +1,309 @@
+import asyncio
+import codecs
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from services.intent_router import STOPWORDS, WORD, fold
+from services.rag_index import RAG_DIM
+
+logger = logging.getLogger(__name__)
+
+# Ingestion defaults (overridable through environment variables)
+RAG_WORKERS = int(os.getenv("RAG_WORKERS", str(min(2, os.cpu_count() or 1))))
+RAG_MAX_INGEST = int(os.getenv("RAG_MAX_INGEST", "2"))
+RAG_CHUNK_CHARS = int(os.getenv("RAG_CHUNK_CHARS", "1000"))
+RAG_CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "150"))
+RAG_EMBED_BATCH = int(os.getenv("RAG_EMBED_BATCH", "64"))
+RAG_MAX_UPLOAD_MB = float(os.getenv("RAG_MAX_UPLOAD_MB", "100"))
+RAG_EXTENSIONS = (".pdf", ".txt", ".md", ".csv", ".json", ".html")
+READ_SIZE = 64 * 1024
+MAX_JOBS_KEPT = 100
+
+# Preferred chunk boundaries, best first
+BOUNDARIES = ("\n\n", ". ", "\n", " ")
+
+
+def embed_texts(texts, dim=RAG_DIM):
+    """
+    CPU embeddings: signed feature hashing of folded words and word bigrams.
+
+    Stopwords are skipped, counts are damped with log1p and rows are
+    L2-normalized, so a dot product is a cosine similarity. Uses crc32, so
+    vectors are identical in every worker process and across restarts.
+
+    Args:
+        texts: List of strings
+        dim: Vector size
+
+    Returns:
+        np.ndarray: (len(texts), dim) float32 matrix
+    """
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = [word for word in WORD.findall(fold(text)) if word not in STOPWORDS]
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        if not features:
+            continue
+        hashes = np.fromiter(
+            (zlib.crc32(feature.encode()) for feature in features), dtype=np.uint32, count=len(features)
+        )
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+        matrix[row] = np.bincount(hashes % dim, weights=signs, minlength=dim)
+    matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def read_text(path):
+    """Yields (text, bytes read, total bytes) in READ_SIZE pieces of a UTF-8 file."""
+    total = os.path.getsize(path)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    done = 0
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(READ_SIZE)
+            done += len(data)
+            text = decoder.decode(data, final=not data)
+            if text:
+                yield text, done, total
+            if not data:
+                break
+
+
+def read_pdf(path):
+    """Yields (text, pages read, total pages) one PDF page at a time."""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("PDF ingestion requires the 'pypdf' package")
+    reader = PdfReader(path)
+    total = len(reader.pages)
+    for number, page in enumerate(reader.pages, start=1):
+        yield (page.extract_text() or "") + "\n\n", number, total
+
+
+def read_document(path):
+    """Picks the reader for a file by extension (PDF or plain text)."""
+    return read_pdf(path) if str(path).lower().endswith(".pdf") else read_text(path)
+
+
+def save_upload(source, destination, max_bytes=RAG_MAX_UPLOAD_MB * 1024 * 1024):
+    """
+    Copies an uploaded file object to disk in READ_SIZE pieces.
+
+    Raises:
+        ValueError: If the upload is larger than `max_bytes` (the partial file is removed)
+    """
+    size = 0
+    with open(destination, "wb") as f:
+        while data := source.read(READ_SIZE):
+            size += len(data)
+            if size > max_bytes:
+                break
+            f.write(data)
+    if size > max_bytes:
+        os.remove(destination)
+        raise ValueError(f"File larger than {max_bytes / 1024 / 1024:.0f} MB")
+    return size
+
+
+class Chunker:
+    """
+    Incremental chunker: feed text pieces as they are read, get chunks of
+    about `size` characters that end on a paragraph, sentence or word
+    boundary and overlap the previous chunk by about `overlap` characters.
+    Only the unfinished tail is kept in memory.
+    """
+
+    def __init__(self, size=RAG_CHUNK_CHARS, overlap=RAG_CHUNK_OVERLAP):
+        self.size = size
+        self.overlap = overlap
+        self._buffer = ""
+
+    def _cut(self, text, start):
+        end = start + self.size
+        for boundary in BOUNDARIES:
+            cut = text.rfind(boundary, start + self.size // 2, end)
+            if cut != -1:
+                return cut + len(boundary)
+        return end
+
+    def feed(self, text):
+        """Adds a piece of text and returns the chunks completed by it."""
+        buffer = self._buffer + text
+        chunks = []
+        start = 0
+        while len(buffer) - start > self.size:
+            cut = self._cut(buffer, start)
+            chunk = buffer[start:cut].strip()
+            if chunk:
+                chunks.append(chunk)
+            # Start the next chunk on a word boundary inside the overlap
+            overlap_start = max(cut - self.overlap, start + 1)
+            space = buffer.find(" ", overlap_start, cut)
+            start = space + 1 if space != -1 else cut
+        self._buffer = buffer[start:]
+        return chunks
+
+    def flush(self):
+        """Returns the last, possibly short, chunk."""
+        chunk = self._buffer.strip()
+        self._buffer = ""
+        return [chunk] if chunk else []
+
+
+class IngestManager:
+    """
+    Runs document ingestion jobs in the background and tracks their progress.
+
+    A job streams the file through its reader and the incremental chunker in
+    a thread, and sends batches of RAG_EMBED_BATCH chunks to a process pool
+    for embedding; at most two batches per worker are in flight, so memory
+    stays bounded whatever the file size. Finished batches are appended to
+    the index in order. At most RAG_MAX_INGEST jobs run at once, the rest
+    wait with status 'queued'.
+    """
+
+    def __init__(self, index, workers=RAG_WORKERS, max_jobs=RAG_MAX_INGEST, batch_size=RAG_EMBED_BATCH):
+        self.index = index
+        self.workers = workers
+        self.batch_size = batch_size
+        self._slots = asyncio.Semaphore(max_jobs)
+        self._executor = None
+        self._jobs = OrderedDict()  # job id -> progress dict
+        self._tasks = set()
+        self.chunks_ingested = 0
+
+    def _pool(self):
+        if self._executor is None:
+            # Started on the first upload so the API starts without extra processes
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, path, filename, delete_after=True):
+        """
+        Queues a file for ingestion.
+
+        Args:
+            path: File on disk to ingest
+            filename: Original name, stored with the chunks
+            delete_after: Remove `path` once ingested
+
+        Returns:
+            dict: The job's progress record (see job())
+        """
+        job = {
+            "id": uuid.uuid4().hex,
+            "file": filename,
+            "status": "queued",
+            "progress": 0.0,
+            "chunks": 0,
+            "error": None,
+            "created": time.time(),
+            "finished": None,
+        }
+        self._jobs[job["id"]] = job
+        while len(self._jobs) > MAX_JOBS_KEPT:
+            oldest = next(iter(self._jobs.values()))
+            if oldest["status"] in ("queued", "running"):
+                break
+            self._jobs.popitem(last=False)
+        task = asyncio.create_task(self._run(job, path, delete_after))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def job(self, job_id):
+        return self._jobs.get(job_id)
+
+    async def _run(self, job, path, delete_after):
+        async with self._slots:
+            job["status"] = "running"
+            start = time.perf_counter()
+            document_id = self.index.add_document(job["file"])
+            try:
+                await self._ingest(job, path, document_id)
+                self.index.finish_document(document_id)
+                job["status"] = "done"
+                job["progress"] = 1.0
+                logger.info(
+                    f"📚 Ingested {job['file']}: {job['chunks']} chunks in {time.perf_counter() - start:.2f}s"
+                )
+            except Exception as e:
+                self.index.finish_document(document_id, "error")
+                job["status"] = "error"
+                job["error"] = str(e)
+                logger.error(f"❌ Error ingesting {job['file']}: {str(e)}")
+            finally:
+                job["finished"] = time.time()
+                if delete_after:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    async def _ingest(self, job, path, document_id):
+        loop = asyncio.get_running_loop()
+        pool = self._pool()
+        chunker = Chunker()
+        pieces = read_document(path)
+        batch = []
+        in_flight = deque()  # (position, texts, future)
+        position = 0
+
+        async def store_oldest():
+            first, texts, future = in_flight.popleft()
+            self.index.add(document_id, first, texts, await future)
+            job["chunks"] += len(texts)
+            self.chunks_ingested += len(texts)
+
+        def dispatch(texts):
+            nonlocal position
+            in_flight.append((position, texts, loop.run_in_executor(pool, embed_texts, texts)))
+            position += len(texts)
+
+        while True:
+            piece = await asyncio.to_thread(next, pieces, None)
+            if piece is None:
+                break
+            text, done, total = piece
+            batch.extend(chunker.feed(text))
+            job["progress"] = round(0.99 * done / total, 3) if total else 0.0
+            while len(batch) >= self.batch_size:
+                dispatch(batch[:self.batch_size])
+                batch = batch[self.batch_size:]
+                if len(in_flight) >= 2 * self.workers:
+                    await store_oldest()
+
+        batch.extend(chunker.flush())
+        if batch:
+            dispatch(batch)
+        while in_flight:
+            await store_oldest()
+
+    def stats(self):
+        statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "workers": self.workers,
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "chunks_ingested": self.chunks_ingested,
+            **self.index.stats(),
+        }
+
+    async def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self.index.close()
@@ -0,0 +1,111 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+# Cached files end with the first 16 hex chars of their content key.
+# Derived renditions (previews, other formats) share the stem: <stem>.<variant>
+CACHED_NAME = re.compile(r"_([0-9a-f]{16})\.\w+$")
+CACHED_VARIANT = re.compile(r"_([0-9a-f]{16})\.[\w.]+$")
+
+
+def render_key(kind, payload):
+    """
+    Builds the content address of a render job.
+
+    Args:
+        kind: Job kind ('chart' or 'pdf')
+        payload: JSON-serializable description of everything that changes the output
+
+    Returns:
+        str: 16 hex chars identifying the rendered file
+    """
+    raw = json.dumps([kind, payload], sort_keys=True, ensure_ascii=False, default=list)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class RenderCache:
+    """
+    Content-addressed index of rendered files kept in a FileStore.
+
+    Each cached file carries its key in the filename, so the index is rebuilt
+    from the store on startup. The store decides when files are deleted
+    (retention and quota); deleted files leave this index through a store
+    listener.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._names = {}  # key -> filename
+        self._locks = {}  # key -> [lock, tasks holding or waiting for it]
+        self.hits = 0
+        self.misses = 0
+        for filename in store.names():
+            match = CACHED_NAME.search(filename)
+            # WebP conversions share the key of their PNG and are not cache entries
+            if match and not filename.endswith(".webp"):
+                self._names[match.group(1)] = filename
+        store.add_listener(self._forget)
+        logger.info(f"🗃️ Render cache loaded: {len(self._names)} files")
+
+    @asynccontextmanager
+    async def lock(self, key):
+        """
+        Holds the lock of `key` for the `async with` block, so identical
+        concurrent jobs render only once. The lock is dropped once no task
+        holds or waits for it.
+        """
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    def get(self, key):
+        """Returns the cached filename for `key`, or None on a miss."""
+        filename = self._names.get(key)
+        if filename is None or self.store.resolve(filename) is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return filename
+
+    def put(self, key, filename):
+        """Registers a rendered file, already written to the store."""
+        self._names[key] = filename
+
+    def _forget(self, filenames):
+        for filename in filenames:
+            key = self.key_of(filename)
+            if key is not None and self._names.get(key) == filename:
+                del self._names[key]
+
+    @staticmethod
+    def etag_of(filename):
+        """
+        Returns a strong entity tag for a cached file or rendition (its key and
+        extensions), or None if the filename is not content-addressed.
+        """
+        match = CACHED_VARIANT.search(filename)
+        return filename[match.start(1):] if match else None
+
+    @staticmethod
+    def key_of(filename):
+        """Returns the content key embedded in a cached filename, or None."""
+        match = CACHED_VARIANT.search(filename)
+        return match.group(1) if match else None
+
+    def stats(self):
+        return {
+            "entries": len(self._names),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,350 @@
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from services.metrics import Histogram
+from services.stats import percentiles
+
+logger = logging.getLogger(__name__)
+
+# Render pool defaults (overridable through environment variables)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", "16"))
+RENDER_TIMEOUT = float(os.getenv("RENDER_TIMEOUT", "60"))
+RENDER_MAX_JOBS_PER_WORKER = int(os.getenv("RENDER_MAX_JOBS_PER_WORKER", "50"))
+
+
+RENDER_SECONDS = Histogram(
+    "atom_render_seconds",
+    "Time spent in a worker per render job (generate_chart, generate_pdf, make_preview, convert_image...)",
+    ("job",),
+)
+RENDER_QUEUE_SECONDS = Histogram("atom_render_queue_seconds", "Time render jobs waited for a worker")
+
+
+class RenderQueueFull(Exception):
+    """Raised when the render queue has no free slots."""
+
+
+class RenderTimeout(Exception):
+    """Raised when a render job takes longer than the configured timeout."""
+
+
+def _init_worker():
+    """
+    Pre-loads the rendering libraries once per worker process and renders a
+    throwaway chart and PDF, so font caches, styles and the first-draw setup
+    are paid here instead of by the first real job.
+    """
+    from tools.generate_chart import generate_chart
+    from tools.generate_pdf import generate_pdf
+
+    with tempfile.TemporaryDirectory() as directory:
+        generate_chart(os.path.join(directory, "warm.png"), '{"a": 1, "b": 2}', "bar", profile="preview")
+        generate_pdf(os.path.join(directory, "warm.pdf"), "Warm up\n\nText")
+
+
+def _warm_job():
+    return os.getpid()
+
+
+@lru_cache(maxsize=None)
+def _load_job(job):
+    module, _, name = job.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def _timed_call(func, args):
+    start = time.perf_counter()
+    if isinstance(func, str):
+        func = _load_job(func)
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _job_name(func):
+    """Returns the short name of a render job (function or 'module:function')."""
+    return func.rpartition(":")[2] if isinstance(func, str) else func.__name__
+
+
+def _kill(executor, processes):
+    """Kills the worker processes of an executor, including a stuck one."""
+    # ProcessPoolExecutor has no public way to stop a running job before Python 3.14
+    for process in list(processes.values()):
+        process.kill()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class RenderPool:
+    """
+    Bounded process pool for CPU-bound chart and PDF rendering.
+
+    Jobs run in pre-warmed worker processes so they never hold the GIL of the
+    API process. At most `queue_size` jobs can be pending or running; extra
+    jobs are rejected right away with RenderQueueFull.
+
+    To cap matplotlib memory growth, the workers are replaced after about
+    `max_jobs_per_worker` jobs each: a fresh set is started and warmed up in
+    the background, then takes over new jobs while the old workers finish
+    theirs. (ProcessPoolExecutor's own max_tasks_per_child can deadlock when
+    a worker retires with jobs queued, on Python 3.11.)
+
+    The timeout counts from when a worker picks the job up. A job still
+    queued after `timeout` seconds is cancelled. A running job that exceeds
+    it would keep its worker and queue slot until it ends on its own, so
+    its workers are retired: new jobs go to fresh workers, and the old ones
+    are killed once their other jobs are done.
+    """
+
+    def __init__(
+        self,
+        workers=RENDER_WORKERS,
+        queue_size=RENDER_QUEUE_SIZE,
+        timeout=RENDER_TIMEOUT,
+        max_jobs_per_worker=RENDER_MAX_JOBS_PER_WORKER,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._executor = None
+        self._next_executor = None  # replacement being warmed up
+        self._recycle_task = None
+        self._closed = False
+        self._running = {}  # executor -> {future: started event}, not done yet, in submission order
+        self._reapers = {}  # retired executor -> task that kills it
+        # executor -> its worker processes, which shutdown() forgets while they may still run a job
+        self._processes = weakref.WeakKeyDictionary()
+        self._jobs = 0  # submitted to the current workers
+        self._recycled = 0
+        self._broken = 0
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._queue_wait = deque(maxlen=500)
+        self._render_time = deque(maxlen=500)
+
+    def _new_executor(self):
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        self._processes[executor] = executor._processes
+        return executor
+
+    def start(self):
+        """Creates the worker processes if the pool is not running yet."""
+        if self._executor is None:
+            self._executor = self._new_executor()
+            self._jobs = 0
+        return self._executor
+
+    def _discard(self, executor):
+        """
+        Drops a broken executor (a worker crashed or was OOM-killed), so the
+        next job starts a fresh one instead of failing forever.
+        """
+        if self._executor is executor:
+            self._executor = None
+            self._broken += 1
+            logger.error("❌ Render worker died; starting new render workers")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _retire(self, executor, stuck):
+        """Stops sending jobs to the workers running a timed-out job and kills them."""
+        if self._executor is executor:
+            self._executor = None
+        if executor not in self._reapers:
+            self._reapers[executor] = asyncio.create_task(self._reap(executor, stuck))
+
+    def _mark_started(self, executor):
+        # Workers take jobs in submission order, so the oldest ones not done are running
+        for started in list(self._running.get(executor, {}).values())[:self.workers]:
+            started.set()
+
+    async def _reap(self, executor, stuck):
+        others = [
+            asyncio.wrap_future(future) for future in self._running.get(executor, ()) if future is not stuck
+        ]
+        try:
+            if others:
+                # Let the other jobs on these workers finish, up to their own timeout
+                await asyncio.wait(others, timeout=self.timeout)
+            logger.warning("⚠️ Killing render workers with a job over %.0fs", self.timeout)
+            _kill(executor, self._processes[executor])
+        finally:
+            del self._reapers[executor]
+
+    def _submit(self, func, args):
+        executor = self.start()
+        try:
+            return executor, executor.submit(_timed_call, func, args)
+        except BrokenProcessPool:
+            # Broken before this job was sent: it is safe to send it to new workers
+            self._discard(executor)
+            executor = self.start()
+            return executor, executor.submit(_timed_call, func, args)
+
+    async def _recycle(self):
+        loop = asyncio.get_running_loop()
+        executor = self._next_executor = self._new_executor()
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(loop.run_in_executor(executor, _warm_job) for _ in range(self.workers)))
+        except Exception as e:
+            logger.error(f"❌ Render worker replacement failed: {str(e)}")
+            executor.shutdown(wait=False)
+            return
+        finally:
+            self._next_executor = None
+        if self._closed:
+            executor.shutdown(wait=False)
+            return
+        previous, self._executor = self._executor, executor
+        self._jobs = 0
+        self._recycled += 1
+        if previous is not None:
+            # Jobs already running on the previous workers still complete
+            previous.shutdown(wait=False)
+        logger.debug("♻️ Render workers replaced in %.2fs", time.perf_counter() - start)
+
+    async def warm_up(self):
+        """Starts every worker so the first real job does not pay the import cost."""
+        loop = asyncio.get_running_loop()
+        executor = self.start()
+        start = time.perf_counter()
+        pids = await asyncio.gather(
+            *(loop.run_in_executor(executor, _warm_job) for _ in range(self.workers))
+        )
+        logger.info(
+            f"🔥 Render pool ready: {len(set(pids))} workers in {time.perf_counter() - start:.2f}s"
+        )
+
+    async def run(self, func, *args):
+        """
+        Runs `func(*args)` in a worker process.
+
+        Args:
+            func: Module-level (picklable) rendering function, or its
+                'module:function' name, so the API process does not have to
+                import the rendering libraries
+            *args: Picklable arguments for the function
+
+        Returns:
+            The value returned by `func`
+
+        Raises:
+            RenderQueueFull: If `queue_size` jobs are already pending
+            RenderTimeout: If the job does not start, or does not finish once
+                started, within `timeout` seconds
+            BrokenProcessPool: If a worker died during the job; the next
+                job gets new workers
+        """
+        if self._pending >= self.queue_size:
+            self._rejected += 1
+            raise RenderQueueFull(
+                f"Render queue is full ({self._pending}/{self.queue_size} jobs)"
+            )
+
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        executor, future = self._submit(func, args)
+        started = asyncio.Event()
+        self._running.setdefault(executor, {})[future] = started
+        self._mark_started(executor)
+        self._pending += 1
+        self._jobs += 1
+        if (
+            self.max_jobs_per_worker
+            and self._jobs >= self.max_jobs_per_worker * self.workers
+            and (self._recycle_task is None or self._recycle_task.done())
+        ):
+            self._recycle_task = asyncio.create_task(self._recycle())
+        # The slot is released only when the worker is really done, even if
+        # the caller already gave up waiting because of the timeout
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release, executor, future))
+        done = asyncio.wrap_future(future)
+        try:
+            # Time spent queued behind other jobs does not count against the timeout
+            waiting = asyncio.create_task(started.wait())
+            try:
+                await asyncio.wait((done, waiting), timeout=self.timeout, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiting.cancel()
+            if not done.done() and not started.is_set():
+                # The workers are busy, not stuck: leave them alone
+                done.cancel()
+                self._timeouts += 1
+                raise RenderTimeout(f"Render job waited over {self.timeout:.0f}s for a worker")
+            result, render_time = await asyncio.wait_for(done, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            self._retire(executor, future)
+            raise RenderTimeout(f"Render job exceeded {self.timeout:.0f}s")
+        except BrokenProcessPool:
+            self._failed += 1
+            self._discard(executor)
+            raise
+        except Exception:
+            self._failed += 1
+            raise
+
+        self._completed += 1
+        queue_wait = max(0.0, time.perf_counter() - submitted - render_time)
+        self._render_time.append(render_time)
+        self._queue_wait.append(queue_wait)
+        RENDER_SECONDS.labels(_job_name(func)).observe(render_time)
+        RENDER_QUEUE_SECONDS.observe(queue_wait)
+        return result
+
+    def _release(self, executor, future):
+        self._pending -= 1
+        running = self._running.get(executor)
+        if running is not None:
+            running.pop(future, None)
+            if running:
+                self._mark_started(executor)
+            else:
+                del self._running[executor]
+
+    def metrics(self):
+        """Returns queue depth, job counters and latency percentiles."""
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queue_depth": self._pending,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "timeouts": self._timeouts,
+            "workers_replaced": self._recycled,
+            "pools_broken": self._broken,
+            "render_seconds": percentiles(self._render_time),
+            "queue_wait_seconds": percentiles(self._queue_wait),
+        }
+
+    def shutdown(self):
+        self._closed = True
+        if self._recycle_task is not None:
+            self._recycle_task.cancel()
+            self._recycle_task = None
+        for executor, reaper in list(self._reapers.items()):
+            reaper.cancel()
+            _kill(executor, self._processes[executor])
+        for executor in (self._executor, self._next_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
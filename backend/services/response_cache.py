@@ -0,0 +1,185 @@
+import hashlib
+import logging
+import os
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Response cache defaults (overridable through environment variables)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_SIMILARITY = os.getenv("RESPONSE_CACHE_SIMILARITY", "false").lower() == "true"
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+
+VECTOR_DIM = 512
+NGRAM = 3
+
+
+def normalize_prompt(text):
+    """
+    Lowercases, folds accents and collapses whitespace.
+
+    Punctuation is kept, since it can change the meaning ("2+2" and "2*2",
+    "C++" and "C").
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.split())
+
+
+def embed(text):
+    """
+    Builds a hashed character n-gram vector of a normalized prompt,
+    punctuation included (see normalize_prompt).
+
+    Args:
+        text: Normalized prompt
+
+    Returns:
+        np.ndarray: L2-normalized float32 vector of VECTOR_DIM dimensions
+    """
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    padded = f" {text} "
+    for i in range(len(padded) - NGRAM + 1):
+        vector[zlib.crc32(padded[i:i + NGRAM].encode("utf-8")) % VECTOR_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class ResponseCache:
+    """
+    Cache of model answers with exact and similarity lookup.
+
+    Entries are namespaced (for example per AnythingLLM workspace) and keyed
+    by the normalized prompt plus model and rules. When similarity lookup is
+    enabled, prompts are also embedded with hashed n-grams into a fixed-size
+    NumPy matrix and searched by cosine similarity. Entries expire after
+    `ttl` seconds and the least recently used ones are evicted beyond
+    `max_entries`.
+    """
+
+    def __init__(
+        self,
+        enabled=RESPONSE_CACHE_ENABLED,
+        similarity=RESPONSE_CACHE_SIMILARITY,
+        threshold=RESPONSE_CACHE_THRESHOLD,
+        ttl=RESPONSE_CACHE_TTL,
+        max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    ):
+        self.enabled = enabled
+        self.similarity = similarity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (response, created, slot)
+        self._vectors = np.zeros((max_entries, VECTOR_DIM), dtype=np.float32)
+        self._slot_scope = np.full(max_entries, -1, dtype=np.int64)
+        self._slot_keys = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._scopes = {}
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def _scope_id(self, namespace, model, rules):
+        scope = (namespace, model, rules)
+        if scope not in self._scopes:
+            self._scopes[scope] = len(self._scopes)
+        return self._scopes[scope]
+
+    @staticmethod
+    def _key(scope_id, prompt):
+        return hashlib.sha256(f"{scope_id}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, namespace, model, rules, message):
+        """
+        Looks up a cached answer.
+
+        Args:
+            namespace: Cache namespace (provider and workspace)
+            model: Model name
+            rules: System rules sent with the prompt
+            message: User prompt
+
+        Returns:
+            str: Cached answer, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        scope_id = self._scope_id(namespace, model, rules)
+        prompt = normalize_prompt(message)
+        key = self._key(scope_id, prompt)
+
+        response = self._lookup(key)
+        if response is not None:
+            self.exact_hits += 1
+            return response
+
+        if self.similarity:
+            candidates = np.flatnonzero(self._slot_scope == scope_id)
+            if candidates.size:
+                scores = self._vectors[candidates] @ embed(prompt)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    response = self._lookup(self._slot_keys[candidates[best]])
+                    if response is not None:
+                        logger.info(f"🧠 Similar prompt found in cache (score {scores[best]:.3f})")
+                        self.similar_hits += 1
+                        return response
+
+        self.misses += 1
+        return None
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        response, created, _ = entry
+        if time.monotonic() - created > self.ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def put(self, namespace, model, rules, message, response):
+        """Stores an answer, evicting the least recently used entry if needed."""
+        if not self.enabled or not response:
+            return
+
+        scope_id = self._scope_id(namespace, model, rules)
+        prompt = normalize_prompt(message)
+        key = self._key(scope_id, prompt)
+        if key in self._entries:
+            self._remove(key)
+        if not self._free_slots:
+            self._remove(next(iter(self._entries)))
+
+        slot = self._free_slots.pop()
+        self._vectors[slot] = embed(prompt)
+        self._slot_scope[slot] = scope_id
+        self._slot_keys[slot] = key
+        self._entries[key] = (response, time.monotonic(), slot)
+
+    def _remove(self, key):
+        _, _, slot = self._entries.pop(key)
+        self._slot_scope[slot] = -1
+        self._slot_keys[slot] = None
+        self._free_slots.append(slot)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "similarity": self.similarity,
+            "threshold": self.threshold,
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,19 @@
+def percentiles(samples):
+    """
+    Summarizes latency samples for the /metrics style JSON endpoints.
+
+    Args:
+        samples: Durations in seconds (any iterable, e.g. a bounded deque)
+
+    Returns:
+        dict: p50, p95 and max in seconds, rounded to 0.1 ms (None when empty)
+    """
+    if not samples:
+        return {"p50": None, "p95": None, "max": None}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return {
+        "p50": round(ordered[int(last * 0.50)], 4),
+        "p95": round(ordered[int(last * 0.95)], 4),
+        "max": round(ordered[-1], 4),
+    }
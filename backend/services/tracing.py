@@ -0,0 +1,116 @@
+import contextvars
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+from services.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Requests slower than this are logged with their per-stage breakdown
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "10"))
+
+REQUEST_SECONDS = Histogram(
+    "atom_http_request_seconds", "HTTP request latency, body included", ("method", "route", "status")
+)
+STAGE_SECONDS = Histogram(
+    "atom_stage_seconds", "Time spent per pipeline stage (llm, parse, render, preview, encode...)", ("stage",)
+)
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Spans recorded while serving one request."""
+
+    __slots__ = ("id", "start", "spans")
+
+    def __init__(self, request_id=None):
+        self.id = request_id or uuid.uuid4().hex[:16]
+        self.start = time.perf_counter()
+        self.spans = []  # (stage, offset from start, duration), in end order
+
+    def add(self, stage, start, duration):
+        self.spans.append((stage, start - self.start, duration))
+
+    def totals(self):
+        """Returns {stage: total seconds}, in the order stages were first seen."""
+        totals = {}
+        for stage, _, duration in self.spans:
+            totals[stage] = totals.get(stage, 0.0) + duration
+        return totals
+
+    def server_timing(self):
+        """Formats the stage totals as a Server-Timing header value (milliseconds)."""
+        return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.totals().items())
+
+
+@contextmanager
+def span(stage):
+    """
+    Times a block as one stage of the current request.
+
+    The duration goes to the `atom_stage_seconds` histogram and, inside a
+    request, to its trace (Server-Timing header and slow request log). Tasks
+    started by the request inherit its trace.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(duration)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add(stage, start, duration)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware giving every HTTP request a Trace.
+
+    Adds `X-Request-Id` and a `Server-Timing` header with the stages finished
+    before the response started (all of them, except for streamed answers),
+    records the request latency per route and logs slow requests with their
+    stage breakdown.
+    """
+
+    def __init__(self, app, slow_seconds=SLOW_REQUEST_SECONDS):
+        self.app = app
+        self.slow_seconds = slow_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        token = current_trace.set(trace)
+        status = 500
+
+        async def send_with_headers(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", trace.id.encode()))
+                if trace.spans:
+                    headers.append((b"server-timing", trace.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            current_trace.reset(token)
+            elapsed = time.perf_counter() - trace.start
+            # The route template keeps the label set small (/files/{filename}, not every file)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.labels(scope["method"], route, status).observe(elapsed)
+            if elapsed >= self.slow_seconds:
+                logger.warning(
+                    "🐢 Slow request %s %s %s: %.2fs (%s)",
+                    trace.id, scope["method"], route, elapsed, trace.server_timing() or "no stages",
+                )
@@ -0,0 +1,315 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+import httpx
+
+from services.admission import UPSTREAM_MAX_QUEUE, UPSTREAM_MAX_QUEUE_WAIT, AdmissionController
+from services.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Upstream defaults (overridable through environment variables)
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "32"))
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "8"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "10"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "180"))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "0.5"))
+
+UPSTREAM_SECONDS = Histogram(
+    "atom_upstream_request_seconds",
+    "Upstream LLM latency once admitted: whole answer (chat) or first line (stream)",
+    ("upstream", "mode"),
+)
+UPSTREAM_ERRORS = Counter("atom_upstream_errors", "Upstream calls that failed after retries", ("upstream",))
+
+# Errors where the request never produced an answer and is safe to resend
+RETRYABLE_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.ReadError,
+    httpx.RemoteProtocolError,
+)
+
+
+class UpstreamError(Exception):
+    """Raised when an upstream LLM server cannot produce a valid response."""
+
+
+class UpstreamClient:
+    """
+    Async HTTP client for one upstream LLM server.
+
+    Keeps a single keep-alive connection pool for the host, limits how many
+    requests can be in flight at the same time through an AdmissionController
+    (fair queue across clients, load shedding) and retries transient failures
+    (5xx responses, refused or reset connections) with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        name,
+        base_url,
+        api_key=None,
+        max_concurrency=UPSTREAM_MAX_CONCURRENCY,
+        max_connections=UPSTREAM_MAX_CONNECTIONS,
+        connect_timeout=UPSTREAM_CONNECT_TIMEOUT,
+        read_timeout=UPSTREAM_READ_TIMEOUT,
+        max_retries=UPSTREAM_MAX_RETRIES,
+        backoff=UPSTREAM_BACKOFF,
+        max_queue=UPSTREAM_MAX_QUEUE,
+        max_queue_wait=UPSTREAM_MAX_QUEUE_WAIT,
+    ):
+        self.name = name
+        self.base_url = (base_url or "").rstrip("/")
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        self._timeout = httpx.Timeout(
+            read_timeout, connect=connect_timeout, pool=read_timeout
+        )
+        self.admission = AdmissionController(name, max_concurrency, max_queue, max_queue_wait)
+        self._client = None
+
+    @property
+    def client(self):
+        """Lazily creates the pooled client so it is bound to the running loop."""
+        if self._client is None or self._client.is_closed:
+            headers = {"Content-Type": "application/json"}
+            if self.api_key:
+                headers["Authorization"] = f"Bearer {self.api_key}"
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                limits=self._limits,
+                timeout=self._timeout,
+            )
+        return self._client
+
+    async def post_json(self, path, payload):
+        """
+        Sends a JSON POST request and returns the decoded JSON body.
+
+        Args:
+            path: Path relative to the upstream base URL
+            payload: JSON-serializable request body
+
+        Returns:
+            dict: Decoded response body
+
+        Raises:
+            UpstreamError: If the upstream keeps failing after all retries
+            UpstreamOverloaded: If the request was shed by admission control
+        """
+        async with self.admission.slot():
+            start = time.perf_counter()
+            try:
+                return await self._post_with_retries(path, payload)
+            except UpstreamError:
+                UPSTREAM_ERRORS.labels(self.name).inc()
+                raise
+            finally:
+                UPSTREAM_SECONDS.labels(self.name, "chat").observe(time.perf_counter() - start)
+
+    async def _post_with_retries(self, path, payload):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.post(path, json=payload)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise UpstreamError(f"{self.name} unreachable: {e}") from e
+                logger.warning(f"🔁 {self.name} connection error ({e!r}), retrying...")
+                await self._sleep_backoff(attempt)
+                continue
+
+            if response.status_code >= 500 and attempt < self.max_retries:
+                logger.warning(f"🔁 {self.name} returned {response.status_code}, retrying...")
+                await self._sleep_backoff(attempt)
+                continue
+
+            if response.status_code >= 400:
+                raise UpstreamError(
+                    f"{self.name} returned HTTP {response.status_code}: {response.text[:200]}"
+                )
+            return response.json()
+
+    async def stream_lines(self, path, payload):
+        """
+        Sends a JSON POST request and yields the response body line by line.
+
+        Lines are yielded as soon as they arrive, so the caller controls the
+        pace of reading (backpressure). Closing the generator closes the
+        upstream connection, which cancels the generation on the server.
+        Streams are not retried because part of the answer may already have
+        been forwarded.
+
+        Args:
+            path: Path relative to the upstream base URL
+            payload: JSON-serializable request body
+
+        Yields:
+            str: Non-empty response lines
+        """
+        async with self.admission.slot():
+            start = time.perf_counter()
+            first = True
+            try:
+                async with self.client.stream("POST", path, json=payload) as response:
+                    if response.status_code >= 400:
+                        body = await response.aread()
+                        raise UpstreamError(
+                            f"{self.name} returned HTTP {response.status_code}: {body[:200]!r}"
+                        )
+                    async for line in response.aiter_lines():
+                        if line:
+                            if first:
+                                UPSTREAM_SECONDS.labels(self.name, "stream").observe(time.perf_counter() - start)
+                                first = False
+                            yield line
+            except RETRYABLE_ERRORS as e:
+                UPSTREAM_ERRORS.labels(self.name).inc()
+                raise UpstreamError(f"{self.name} unreachable: {e}") from e
+
+    async def probe(self, path, timeout=5.0):
+        """
+        Health check: a GET outside admission control and without retries,
+        so it is not queued behind running generations.
+
+        Raises:
+            UpstreamError: If the upstream is unreachable or answers an error
+        """
+        try:
+            response = await self.client.get(path, timeout=timeout)
+        except httpx.HTTPError as e:
+            raise UpstreamError(f"{self.name} unreachable: {e!r}") from e
+        if response.status_code >= 400:
+            raise UpstreamError(f"{self.name} returned HTTP {response.status_code}")
+
+    async def _sleep_backoff(self, attempt):
+        delay = self.backoff * (2 ** attempt)
+        await asyncio.sleep(delay + random.uniform(0, delay / 2))
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+async def anything_llm_chat(client, message, rules, workspace="rag"):
+    """
+    Calls the AnythingLLM workspace chat endpoint.
+
+    Args:
+        client: UpstreamClient pointing to AnythingLLM
+        message: Prompt sent to the model
+        rules: Extra instructions for the model
+        workspace: Workspace slug
+
+    Returns:
+        str: Raw text response of the model
+    """
+    data = await client.post_json(
+        f"/api/v1/workspace/{workspace}/chat",
+        {"message": message, "rules": rules},
+    )
+    return data.get("textResponse") or ""
+
+
+async def openai_chat(client, messages, model="gpt-4o-mini"):
+    """
+    Calls the OpenAI chat completions endpoint.
+
+    Args:
+        client: UpstreamClient pointing to the OpenAI API
+        messages: List of chat messages
+        model: Model name
+
+    Returns:
+        str: Content of the first completion choice
+    """
+    data = await client.post_json(
+        "/v1/chat/completions",
+        {"model": model, "messages": messages},
+    )
+    return data["choices"][0]["message"]["content"]
+
+
+def _sse_data(line):
+    """Returns the payload of an SSE 'data:' line, or None for other lines."""
+    if not line.startswith("data:"):
+        return None
+    return line[5:].strip()
+
+
+async def anything_llm_stream(client, message, rules, workspace="rag"):
+    """
+    Streams a response from the AnythingLLM workspace stream-chat endpoint.
+
+    Args:
+        client: UpstreamClient pointing to AnythingLLM
+        message: Prompt sent to the model
+        rules: Extra instructions for the model
+        workspace: Workspace slug
+
+    Yields:
+        str: Text chunks as the model produces them
+    """
+    lines = client.stream_lines(
+        f"/api/v1/workspace/{workspace}/stream-chat",
+        {"message": message, "rules": rules},
+    )
+    try:
+        async for line in lines:
+            data = _sse_data(line)
+            if not data:
+                continue
+            event = json.loads(data)
+            if event.get("error"):
+                raise UpstreamError(f"{client.name} error: {event['error']}")
+            chunk = event.get("textResponse")
+            if chunk:
+                yield chunk
+            if event.get("close"):
+                break
+    finally:
+        await lines.aclose()
+
+
+async def openai_stream(client, messages, model="gpt-4o-mini"):
+    """
+    Streams a response from the OpenAI chat completions endpoint.
+
+    Args:
+        client: UpstreamClient pointing to the OpenAI API
+        messages: List of chat messages
+        model: Model name
+
+    Yields:
+        str: Text chunks as the model produces them
+    """
+    lines = client.stream_lines(
+        "/v1/chat/completions",
+        {"model": model, "messages": messages, "stream": True},
+    )
+    try:
+        async for line in lines:
+            data = _sse_data(line)
+            if not data:
+                continue
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get("choices") or [{}]
+            chunk = choices[0].get("delta", {}).get("content")
+            if chunk:
+                yield chunk
+    finally:
+        await lines.aclose()
@@ -0,0 +1,64 @@
+import io
+import zipfile
+from pathlib import Path
+
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+
+def bundle_zip(filepath, files):
+    """
+    Packs generated files into one ZIP archive.
+
+    PNG and PDF files are already compressed, so they are stored as-is.
+
+    Args:
+        filepath: Path where the archive will be saved
+        files: Paths of the files to include (named by their filename)
+    """
+    with zipfile.ZipFile(str(filepath), "w", compression=zipfile.ZIP_STORED) as archive:
+        for path in files:
+            archive.write(str(path), arcname=Path(path).name)
+
+
+def _image_page(path):
+    # One landscape A4 page with the image scaled to fit the margins
+    buffer = io.BytesIO()
+    pagesize = landscape(A4)
+    page = canvas.Canvas(buffer, pagesize=pagesize)
+    margin = 1 * cm
+    page.drawImage(
+        ImageReader(str(path)), margin, margin,
+        width=pagesize[0] - 2 * margin, height=pagesize[1] - 2 * margin,
+        preserveAspectRatio=True, anchor="c",
+    )
+    page.showPage()
+    page.save()
+    buffer.seek(0)
+    return buffer
+
+
+def bundle_pdf(filepath, files):
+    """
+    Merges generated PDFs and charts into one PDF, in the given order.
+
+    PDFs are appended page by page without re-rendering; each chart image
+    becomes a landscape page.
+
+    Args:
+        filepath: Path where the merged PDF will be saved
+        files: Paths of PDF or image files
+    """
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        raise RuntimeError("Merging PDFs requires the 'pypdf' package")
+
+    writer = PdfWriter()
+    for path in files:
+        writer.append(str(path) if str(path).lower().endswith(".pdf") else _image_page(path))
+    with open(filepath, "wb") as f:
+        writer.write(f)
+    writer.close()
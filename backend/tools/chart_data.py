@@ -0,0 +1,279 @@
+import json
+import math
+import re
+
+import numpy as np
+
+# Small anchored patterns only: applied to short, already isolated pieces
+NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+THOUSANDS = re.compile(r"(?<=\d),(?=\d{3}(?!\d))")
+LINE_SEPARATORS = ":|–-"
+LABEL_STRIP = " \t\"'{}[],*-"
+
+# Keys that wrap the actual data in model answers
+WRAPPER_KEYS = ("data", "datos", "items", "records", "rows", "values", "valores")
+SERIES_KEYS = ("series", "datasets")
+# Chart data is never nested deeper; deeper spans are skipped instead of decoded
+MAX_JSON_DEPTH = 16
+LABEL_KEYS = ("labels", "etiquetas", "categories", "categorias", "x")
+
+
+def find_json_spans(text):
+    """
+    Finds the maximal balanced {...} / [...] spans of a text in one pass.
+
+    Brackets inside JSON strings are ignored. Mismatched brackets discard the
+    spans that are still open, and spans nested deeper than MAX_JSON_DEPTH are
+    dropped so decoding them cannot hit the recursion limit. Every character
+    is visited once and each span is pushed and popped at most once, so the
+    scan is linear in len(text).
+
+    Args:
+        text: Text that may contain JSON
+
+    Returns:
+        list: (start, end) index pairs, end exclusive, in text order
+    """
+    pairs = {"}": "{", "]": "["}
+    stack = []  # [bracket, position, depth of the deepest span inside] of open brackets
+    spans = []
+    in_string = False
+    escaped = False
+
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char in "{[":
+            stack.append([char, i, 0])
+        elif char in "}]":
+            if stack and stack[-1][0] == pairs[char]:
+                _, start, inner = stack.pop()
+                depth = inner + 1
+                if stack:
+                    stack[-1][2] = max(stack[-1][2], depth)
+                # Drop spans nested inside the one that just closed
+                while spans and spans[-1][0] > start:
+                    spans.pop()
+                if depth <= MAX_JSON_DEPTH:
+                    spans.append((start, i + 1))
+            else:
+                stack.clear()
+        elif char == '"' and stack:
+            in_string = True
+
+    return spans
+
+
+def _to_number(value):
+    if isinstance(value, bool) or value is None:
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = NUMBER.search(THOUSANDS.sub("", value))
+        return float(match.group()) if match else math.nan
+    return math.nan
+
+
+def _is_number(value):
+    return not math.isnan(_to_number(value))
+
+
+def _columns(labels, series):
+    labels = [str(label) for label in labels]
+    columns = {}
+    for name, values in series.items():
+        column = np.array([_to_number(v) for v in values], dtype=np.float64)
+        if column.size == len(labels) and not np.isnan(column).all():
+            columns[str(name)] = column
+    if not labels or not columns:
+        return None
+    return {"labels": labels, "series": columns}
+
+
+def _from_records(records):
+    keys = []
+    for record in records:
+        for key in record:
+            if key not in keys:
+                keys.append(key)
+    numeric = [k for k in keys if any(_is_number(r.get(k)) for r in records)]
+    label_key = next((k for k in keys if k not in numeric), None)
+    if label_key is None and keys:
+        # Every column is numeric: use the first one (e.g. a year) as label
+        label_key = keys[0]
+        numeric = numeric[1:]
+    labels = [record.get(label_key, "") for record in records]
+    return _columns(labels, {k: [r.get(k) for r in records] for k in numeric})
+
+
+def _from_series(series, labels=None):
+    series = {k: v for k, v in series.items() if isinstance(v, (dict, list))}
+    if not series:
+        return None
+    if all(isinstance(v, dict) for v in series.values()):
+        # {"A": {"2020": 1, ...}, "B": {...}}
+        if labels is None:
+            labels = []
+            for values in series.values():
+                labels.extend(k for k in values if k not in labels)
+        return _columns(labels, {n: [v.get(str(l)) for l in labels] for n, v in series.items()})
+    lists = {k: v for k, v in series.items() if isinstance(v, list)}
+    length = max(len(v) for v in lists.values())
+    if labels is None:
+        labels = [str(i + 1) for i in range(length)]
+    return _columns(labels, lists)
+
+
+def _normalize(data):
+    """Turns a decoded JSON value into the columnar structure, or None."""
+    if isinstance(data, list):
+        if not data:
+            return None
+        if all(isinstance(item, dict) for item in data):
+            return _from_records(data)
+        if all(isinstance(item, (list, tuple)) and len(item) >= 2 for item in data):
+            # [["2020", 1, 2], ["2021", 3, 4]]
+            width = max(len(item) for item in data)
+            return _columns(
+                [item[0] for item in data],
+                {
+                    ("values" if width == 2 else f"series_{col}"): [
+                        item[col] if col < len(item) else None for item in data
+                    ]
+                    for col in range(1, width)
+                },
+            )
+        return _columns([str(i + 1) for i in range(len(data))], {"values": data})
+
+    if not isinstance(data, dict) or not data:
+        return None
+
+    lowered = {str(k).lower(): k for k in data}
+    label_key = next((lowered[k] for k in LABEL_KEYS if k in lowered), None)
+    labels = data[label_key] if label_key is not None and isinstance(data[label_key], list) else None
+
+    for key in SERIES_KEYS:
+        if key in lowered and isinstance(data[lowered[key]], (dict, list)):
+            series = data[lowered[key]]
+            if isinstance(series, list):
+                # [{"name": "A", "data": [...]}, ...]
+                series = {
+                    str(item.get("name", item.get("label", f"series_{i + 1}"))): item.get("data", item.get("values"))
+                    for i, item in enumerate(series) if isinstance(item, dict)
+                }
+            return _from_series(series, labels)
+
+    for key in WRAPPER_KEYS:
+        if key in lowered and isinstance(data[lowered[key]], (dict, list)):
+            inner = data[lowered[key]]
+            if labels is not None and isinstance(inner, list) and not any(isinstance(v, (dict, list)) for v in inner):
+                # {"labels": [...], "values": [...]}
+                return _columns(labels, {"values": inner})
+            return _normalize(inner)
+
+    if labels is not None:
+        # {"labels": [...], "ventas": [...], "gastos": [...]}
+        return _from_series({k: v for k, v in data.items() if k != label_key}, labels)
+
+    values = list(data.values())
+    if all(isinstance(v, dict) for v in values):
+        # {"2020": {"ventas": 1, "gastos": 2}, ...}
+        names = []
+        for row in values:
+            names.extend(k for k in row if k not in names)
+        return _columns(list(data), {n: [row.get(n) for row in values] for n in names})
+    if all(isinstance(v, list) for v in values):
+        return _from_series(data)
+
+    # Flat {label: value}; non-numeric strings count their length as before
+    return _columns(
+        list(data),
+        {"values": [
+            v if _is_number(v) else (len(v) if isinstance(v, str) else 1) for v in values
+        ]},
+    )
+
+
+def _parse_lines(text):
+    """Reads 'Label: 123', 'Label | 123', 'Label - 123' or 'Label 123' lines."""
+    labels = []
+    values = []
+    for line in text.splitlines():
+        line = line.strip()
+        cut = min((line.find(sep) for sep in LINE_SEPARATORS if sep in line), default=-1)
+        if cut > 0:
+            match = NUMBER.match(line[cut + 1:].lstrip())
+            if match:
+                labels.append(line[:cut].strip(LABEL_STRIP))
+                values.append(float(match.group()))
+                continue
+        parts = line.rsplit(None, 1)
+        if len(parts) == 2 and len(line) > 3 and NUMBER.fullmatch(parts[1]):
+            labels.append(parts[0].strip(LABEL_STRIP))
+            values.append(float(parts[1]))
+    return _columns(labels, {"values": values}) if labels else None
+
+
+def extract_chart_data(text):
+    """
+    Extracts chart data from a model answer.
+
+    Looks for the first balanced JSON object or array that decodes into
+    chart data (flat {label: value} objects, {"series": ...} objects, lists
+    of records with several numeric columns, lists of pairs or numbers),
+    and falls back to 'label: value' lines. Runs in linear time.
+
+    Args:
+        text: Model text that may contain data
+
+    Returns:
+        dict: {'labels': list of str, 'series': {name: np.ndarray}} or None
+    """
+    if not text:
+        return None
+
+    # Prefer the first candidate with at least two points, so a stray "[1]"
+    # footnote before the real data is not taken as the chart
+    fallback = None
+    for start, end in find_json_spans(text):
+        try:
+            data = json.loads(text[start:end])
+        except ValueError:
+            continue
+        try:
+            columns = _normalize(data)
+        except (TypeError, ValueError):
+            # Valid JSON in a shape the normalizer did not expect
+            continue
+        if columns and len(columns["labels"]) >= 2:
+            return columns
+        fallback = fallback or columns
+
+    return fallback or _parse_lines(text)
+
+
+def parse_data_from_text(text):
+    """
+    Attempts to extract structured data from the model's response text.
+    Accepts JSON anywhere in the text (flat objects, nested or multi-series
+    objects, lists of records) and 'Label: value' lines; see
+    extract_chart_data.
+    
+    Args:
+        text: Model text that may contain data
+        
+    Returns:
+        dict: Dictionary with 'labels', 'values' (first series) and 'series'
+        ({name: numpy array}) or None if extraction fails
+    """
+    data = extract_chart_data(text)
+    if not data:
+        return None
+    first = next(iter(data['series'].values()))
+    return {'labels': data['labels'], 'values': first.tolist(), 'series': data['series']}
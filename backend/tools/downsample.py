@@ -0,0 +1,89 @@
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling for line data.
+
+    Keeps the first and last points and, for each of `threshold - 2` equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the mean of the next bucket. Preserves the
+    visual shape of a line far better than taking every n-th point.
+
+    Args:
+        x: 1-D array of increasing x positions
+        y: 1-D array of finite values, same length as x
+        threshold: Number of points to keep
+
+    Returns:
+        np.ndarray: Sorted indices of the kept points
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    edges = np.append(edges, n)
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    kept = 0
+    for bucket in range(threshold - 2):
+        start, end, next_end = edges[bucket], edges[bucket + 1], edges[bucket + 2]
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        bx = x[start:end]
+        by = y[start:end]
+        area = np.abs((x[kept] - avg_x) * (by - y[kept]) - (x[kept] - bx) * (avg_y - y[kept]))
+        kept = start + int(area.argmax())
+        selected[bucket + 1] = kept
+    return selected
+
+
+def min_max(y, buckets):
+    """
+    Min-max downsampling: keeps the lowest and highest point of each bucket.
+
+    Fully vectorized, so it is the cheaper choice for scatter data where
+    outliers matter more than the shape of a line.
+
+    Args:
+        y: 1-D array of finite values
+        buckets: Number of buckets (up to 2 points are kept per bucket)
+
+    Returns:
+        np.ndarray: Sorted indices of the kept points
+    """
+    n = len(y)
+    if buckets * 2 >= n or buckets < 1:
+        return np.arange(n)
+
+    size = -(-n // buckets)
+    padded = np.full(size * buckets, np.nan)
+    padded[:n] = y
+    rows = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    lows = np.where(np.isnan(rows), np.inf, rows).argmin(axis=1) + offsets
+    highs = np.where(np.isnan(rows), -np.inf, rows).argmax(axis=1) + offsets
+    indices = np.unique(np.concatenate([lows, highs]))
+    return indices[indices < n]
+
+
+def downsample(y, budget, method="lttb"):
+    """
+    Reduces a series to at most `budget` points, ignoring missing values.
+
+    Args:
+        y: 1-D float array, NaN for missing values
+        budget: Maximum number of points to keep
+        method: 'lttb' (line data) or 'minmax' (scatter data)
+
+    Returns:
+        np.ndarray: Sorted indices into y of the points to draw
+    """
+    finite = np.flatnonzero(np.isfinite(y))
+    if len(finite) <= budget:
+        return finite
+    if method == "minmax":
+        return finite[min_max(y[finite], budget // 2)]
+    return finite[lttb(finite.astype(np.float64), y[finite], budget)]
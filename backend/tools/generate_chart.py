@@ -1,202 +1,234 @@
+import logging
+
 import matplotlib
 matplotlib.use('Agg')  # GUI-less backend for servers
 import matplotlib.pyplot as plt
-import json
-import re
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter, MaxNLocator
+
+from tools.chart_data import parse_data_from_text
+from tools.downsample import downsample
+from tools.render_options import CHART_PROFILES, DEFAULT_CHART_PROFILE
+
+logger = logging.getLogger(__name__)
+
+# Style configuration, applied once per process
+plt.style.use('seaborn-v0_8-darkgrid')
+# SVG text stays text (smaller files, selectable) instead of glyph outlines
+matplotlib.rcParams['svg.fonttype'] = 'none'
+
+# Large dataset limits
+CHART_MAX_POINTS = 2000  # points drawn per line/scatter series, downsampled above
+CHART_MAX_BARS = 200  # above this, bars are drawn as one filled step outline
+CHART_ANNOTATE_MAX = 30  # value labels are skipped for more bars/cells than this
+CHART_MAX_TICKS = 20
+CHART_PIE_SLICES = 12  # smaller slices are grouped into 'Other'
+
+def _category_axis(ax, labels):
+    """Labels the x axis with categories, showing at most CHART_MAX_TICKS of them."""
+    if len(labels) <= CHART_MAX_TICKS:
+        ax.set_xticks(range(len(labels)))
+        ax.set_xticklabels(labels)
+    else:
+        ax.xaxis.set_major_locator(MaxNLocator(CHART_MAX_TICKS, integer=True))
+        ax.xaxis.set_major_formatter(FuncFormatter(
+            lambda position, _: labels[int(position)] if 0 <= position < len(labels) else ''
+        ))
+    if len(labels) > 5 or any(len(str(l)) > 10 for l in labels):
+        plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+
+
+def _axis_titles(ax, title, xlabel='Categories', ylabel='Values'):
+    ax.set_ylabel(ylabel, fontsize=12, fontweight='bold')
+    ax.set_xlabel(xlabel, fontsize=12, fontweight='bold')
+    ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
+
+
+def _draw_bar(ax, labels, series):
+    x = np.arange(len(labels))
+    single = len(series) == 1
+    if len(labels) > CHART_MAX_BARS:
+        # One filled outline per series instead of thousands of rectangles;
+        # each kept min/max value spans the bars up to the next kept one
+        for name, values in series.items():
+            kept = downsample(values, CHART_MAX_POINTS, 'minmax')
+            if len(kept):
+                ax.stairs(values[kept], np.append(kept, len(labels)) - 0.5, fill=True,
+                          alpha=0.8 if single else 0.5, label=name,
+                          color='steelblue' if single else None)
+    else:
+        width = 0.8 / len(series)
+        annotate = len(labels) * len(series) <= CHART_ANNOTATE_MAX
+        for i, (name, values) in enumerate(series.items()):
+            bars = ax.bar(x + (i - (len(series) - 1) / 2) * width, values, width,
+                          label=name, alpha=0.8, edgecolor='black',
+                          color='steelblue' if single else None)
+            if annotate:
+                ax.bar_label(bars, fmt='%.1f', fontsize=10)
+    _category_axis(ax, labels)
+    _axis_titles(ax, 'Bar Chart')
+
+
+def _draw_line(ax, labels, series):
+    x = np.arange(len(labels), dtype=np.float64)
+    single = len(series) == 1
+    for name, values in series.items():
+        kept = downsample(values, CHART_MAX_POINTS, 'lttb')
+        markers = len(kept) <= CHART_ANNOTATE_MAX
+        ax.plot(x[kept], values[kept], linewidth=2 if markers else 1, label=name,
+                marker='o' if markers else None, markersize=8,
+                color='steelblue' if single else None,
+                markerfacecolor='orange' if single else None, markeredgecolor='black')
+    ax.grid(True, alpha=0.3)
+    _category_axis(ax, labels)
+    _axis_titles(ax, 'Line Chart')
 
-def parse_data_from_text(text):
-    """
-    Attempts to extract structured data from the model's response text.
-    Searches for common patterns like lists, tables, or JSON.
-    
-    Args:
-        text: Model text that may contain data
-        
-    Returns:
-        dict: Dictionary with 'labels' and 'values' or None if extraction fails
-    """
-    # Clean the text of markdown code blocks
-    text = re.sub(r'```json\s*', '', text)
-    text = re.sub(r'```\s*', '', text)
-    text = text.strip()
-    
-    # Try to find JSON in the text
-    # First search for the most common pattern: {...}
-    json_match = re.search(r'\{[^{}]*\}', text)
-    
-    if json_match:
-        try:
-            json_str = json_match.group()
-            data = json.loads(json_str)
-            
-            if isinstance(data, dict) and len(data) > 0:
-                # Assume the dict has format {label: value}
-                labels = []
-                values = []
-                
-                for key, value in data.items():
-                    labels.append(str(key))
-                    # Try to convert the value to a number
-                    try:
-                        if isinstance(value, (int, float)):
-                            values.append(float(value))
-                        elif isinstance(value, str):
-                            # Try to extract number from strings
-                            num_match = re.search(r'(\d+\.?\d*)', value)
-                            if num_match:
-                                values.append(float(num_match.group(1)))
-                            else:
-                                values.append(len(value))
-                        else:
-                            values.append(1)
-                    except (ValueError, AttributeError):
-                        values.append(1)
-                
-                if labels and values:
-                    return {'labels': labels, 'values': values}
-                    
-        except (json.JSONDecodeError, ValueError, KeyError) as e:
-            print(f"Error parsing JSON: {e}")
-            pass
-    
-    # If simple JSON not found, search for arrays of objects
-    array_match = re.search(r'\[[\s\S]*\]', text)
-    if array_match:
-        try:
-            data = json.loads(array_match.group())
-            if isinstance(data, list) and len(data) > 0:
-                if isinstance(data[0], dict):
-                    # List of objects
-                    first_key = list(data[0].keys())[0]
-                    second_key = list(data[0].keys())[1] if len(data[0].keys()) > 1 else first_key
-                    return {
-                        'labels': [str(item.get(first_key, '')) for item in data],
-                        'values': [float(item.get(second_key, 0)) if isinstance(item.get(second_key), (int, float)) else 1 for item in data]
-                    }
-        except (json.JSONDecodeError, ValueError, KeyError):
-            pass
-    
-    # Search for table patterns with numbers
-    lines = text.split('\n')
-    labels = []
-    values = []
-    
-    for line in lines:
-        # Search for lines with format "Label: Number" or "Label | Number" or "Label - Number"
-        match = re.search(r'([^:|–-]+)[:|\–-]\s*(\d+\.?\d*)', line)
-        if match:
-            labels.append(match.group(1).strip())
-            values.append(float(match.group(2)))
-        else:
-            # Search for lines with numbers at the end
-            match = re.search(r'(.+?)\s+(\d+\.?\d*)$', line.strip())
-            if match and len(line.strip()) > 3:
-                labels.append(match.group(1).strip())
-                values.append(float(match.group(2)))
-    
-    if labels and values and len(labels) == len(values):
-        return {'labels': labels, 'values': values}
-    
-    return None
 
+def _draw_scatter(ax, labels, series):
+    x = np.arange(len(labels), dtype=np.float64)
+    single = len(series) == 1
+    for name, values in series.items():
+        kept = downsample(values, CHART_MAX_POINTS, 'minmax')
+        small = len(kept) <= CHART_ANNOTATE_MAX
+        ax.scatter(x[kept], values[kept], s=100 if small else 12, alpha=0.6, label=name,
+                   c='steelblue' if single else None,
+                   edgecolors='black' if small else 'none', linewidth=1.5)
+    ax.grid(True, alpha=0.3)
+    _category_axis(ax, labels)
+    _axis_titles(ax, 'Scatter Plot', xlabel='Index')
 
-def generate_chart(filepath, content, chart_type='bar'):
+
+def _draw_pie(ax, labels, series):
+    # Wedges cannot be negative: such values are drawn as empty slices, and
+    # all-negative data is shown by magnitude
+    values = np.nan_to_num(next(iter(series.values())))
+    values = np.clip(values, 0, None) if (values > 0).any() else np.abs(values)
+    if not values.any():
+        values = np.ones_like(values)
+    if len(values) > CHART_PIE_SLICES:
+        order = np.argsort(values)[::-1]
+        top = order[:CHART_PIE_SLICES - 1]
+        labels = [labels[i] for i in top] + ['Other']
+        values = np.append(values[top], values[order[CHART_PIE_SLICES - 1:]].sum())
+    colors = plt.cm.Set3(range(len(labels)))
+    wedges, texts, autotexts = ax.pie(values, labels=labels, autopct='%1.1f%%',
+                                      colors=colors, startangle=90,
+                                      textprops={'fontsize': 10})
+    ax.set_title('Pie Chart', fontsize=16, fontweight='bold', pad=20)
+
+    # Improve readability
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontweight('bold')
+
+
+def _draw_histogram(ax, labels, series):
+    columns = [values[np.isfinite(values)] for values in series.values()]
+    points = max(len(column) for column in columns)
+    bins = int(min(50, max(10, np.sqrt(points))))
+    ax.hist(columns, bins=bins, label=list(series), alpha=0.8, edgecolor='black',
+            color='steelblue' if len(columns) == 1 else None)
+    _axis_titles(ax, 'Histogram', xlabel='Values', ylabel='Frequency')
+
+
+def _draw_heatmap(ax, labels, series):
+    matrix = np.vstack(list(series.values()))
+    image = ax.imshow(matrix, aspect='auto', cmap='viridis', interpolation='nearest')
+    ax.figure.colorbar(image, ax=ax)
+    ax.set_yticks(range(len(series)))
+    ax.set_yticklabels(list(series))
+    ax.grid(False)
+    if matrix.size <= CHART_ANNOTATE_MAX:
+        for (row, col), value in np.ndenumerate(matrix):
+            ax.text(col, row, f'{value:.1f}', ha='center', va='center', color='white', fontsize=10)
+    _category_axis(ax, labels)
+    _axis_titles(ax, 'Heatmap', ylabel='Series')
+
+
+def _new_axes(figsize, dpi=None):
+    # A plain Figure, outside pyplot's registry: nothing needs closing, even
+    # when drawing fails. (Clearing and reusing axes is no faster and keeps
+    # state such as grid styles or pie aspect from the previous chart.)
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+
+DRAWERS = {
+    'bar': _draw_bar,
+    'line': _draw_line,
+    'scatter': _draw_scatter,
+    'pie': _draw_pie,
+    'histogram': _draw_histogram,
+    'heatmap': _draw_heatmap,
+}
+
+
+def chart_figure(content, chart_type='bar', figsize=CHART_PROFILES[DEFAULT_CHART_PROFILE]['figsize'], dpi=None):
     """
-    Generates a chart from data extracted from the content.
-    
+    Draws a chart from data extracted from the content into a new Figure.
+
+    Every series found in the content is drawn (grouped bars, one line or
+    point cloud per series, stacked histograms, heatmap rows; pies use the
+    first series). Line and scatter series above CHART_MAX_POINTS are
+    downsampled (LTTB and min-max), and value labels are only drawn for
+    small charts, so render time stays flat as the data grows.
+
     Args:
-        filepath: Path where the image will be saved
         content: Text containing the data (can be JSON, table, or text with data)
-        chart_type: Type of chart ('bar', 'line', 'pie', 'scatter')
+        chart_type: Type of chart ('bar', 'line', 'pie', 'scatter', 'histogram', 'heatmap')
+        figsize: Figure size in inches
+        dpi: Figure resolution, used for layout (matplotlib's default if None)
+
+    Returns:
+        Figure: The laid out chart, ready to be saved or drawn
     """
-    print(f"\n=== GENERATING CHART ===")
-    print(f"Type: {chart_type}")
-    print(f"Content received: {content[:300]}...")
-    
-    # Style configuration
-    plt.style.use('seaborn-v0_8-darkgrid')
-    fig, ax = plt.subplots(figsize=(12, 7))
+    logger.debug("📊 Generating %s chart from: %.300s", chart_type, content)
+    fig, ax = _new_axes(figsize, dpi)
     
     # Try to extract data from content
     data = parse_data_from_text(content)
     
     if not data:
-        print("❌ Could not extract data from content")
-        # If data cannot be extracted, create an example chart
-        data = {
-            'labels': ['No data', 'available'],
-            'values': [1, 1]
-        }
+        logger.warning("❌ Could not extract chart data from content")
         ax.text(0.5, 0.5, 'Could not extract structured data\n\nPlease provide data in format:\nJSON: {"2020": 50000, "2021": 55000, "2022": 60000}\n\nReceived response:\n' + content[:200], 
                 ha='center', va='center', fontsize=10, transform=ax.transAxes,
                 bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5), wrap=True)
-        plt.axis('off')
+        ax.axis('off')
     else:
-        print(f"✅ Data extracted correctly:")
-        print(f"   Labels: {data['labels']}")
-        print(f"   Values: {data['values']}")
-        
         labels = data['labels']
-        values = data['values']
-        
-        # Generate chart according to type
-        if chart_type == 'bar':
-            bars = ax.bar(labels, values, color='steelblue', alpha=0.8, edgecolor='black')
-            ax.set_ylabel('Values', fontsize=12, fontweight='bold')
-            ax.set_xlabel('Categories', fontsize=12, fontweight='bold')
-            ax.set_title('Bar Chart', fontsize=16, fontweight='bold', pad=20)
-            
-            # Rotate labels if there are many or they're very long
-            if len(labels) > 5 or any(len(str(l)) > 10 for l in labels):
-                plt.xticks(rotation=45, ha='right')
-            
-            # Add values on top of bars
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width()/2., height,
-                       f'{height:.1f}',
-                       ha='center', va='bottom', fontsize=10)
-        
-        elif chart_type == 'line':
-            ax.plot(labels, values, marker='o', linewidth=2, markersize=8, 
-                   color='steelblue', markerfacecolor='orange', markeredgecolor='black')
-            ax.set_ylabel('Values', fontsize=12, fontweight='bold')
-            ax.set_xlabel('Categories', fontsize=12, fontweight='bold')
-            ax.set_title('Line Chart', fontsize=16, fontweight='bold', pad=20)
-            ax.grid(True, alpha=0.3)
-            
-            if len(labels) > 5 or any(len(str(l)) > 10 for l in labels):
-                plt.xticks(rotation=45, ha='right')
-        
-        elif chart_type == 'pie':
-            colors = plt.cm.Set3(range(len(labels)))
-            wedges, texts, autotexts = ax.pie(values, labels=labels, autopct='%1.1f%%',
-                                              colors=colors, startangle=90,
-                                              textprops={'fontsize': 10})
-            ax.set_title('Pie Chart', fontsize=16, fontweight='bold', pad=20)
-            
-            # Improve readability
-            for autotext in autotexts:
-                autotext.set_color('white')
-                autotext.set_fontweight('bold')
-        
-        elif chart_type == 'scatter':
-            ax.scatter(range(len(values)), values, s=100, alpha=0.6, 
-                      c='steelblue', edgecolors='black', linewidth=1.5)
-            ax.set_ylabel('Values', fontsize=12, fontweight='bold')
-            ax.set_xlabel('Index', fontsize=12, fontweight='bold')
-            ax.set_title('Scatter Plot', fontsize=16, fontweight='bold', pad=20)
-            ax.grid(True, alpha=0.3)
-            
-            # Add labels
-            ax.set_xticks(range(len(labels)))
-            ax.set_xticklabels(labels)
-            if len(labels) > 5 or any(len(str(l)) > 10 for l in labels):
-                plt.xticks(rotation=45, ha='right')
+        series = data['series']
+        logger.debug("✅ Data extracted: %d labels, series %s", len(labels), list(series))
+
+        DRAWERS.get(chart_type, _draw_bar)(ax, labels, series)
+        if len(series) > 1 and chart_type not in ('pie', 'heatmap'):
+            ax.legend()
     
-    # Adjust layout so labels don't get cut off
-    plt.tight_layout()
+    # Adjust layout so labels don't get cut off; the image keeps the figure
+    # size, without the extra layout pass of bbox_inches='tight'
+    fig.tight_layout()
+    return fig
+
+
+def generate_chart(filepath, content, chart_type='bar', dpi=None, profile=DEFAULT_CHART_PROFILE,
+                   figsize=None, format=None):
+    """
+    Generates a chart from data extracted from the content (see chart_figure).
+    
+    Args:
+        filepath: Path where the image will be saved, or a binary file object
+        content: Text containing the data (can be JSON, table, or text with data)
+        chart_type: Type of chart ('bar', 'line', 'pie', 'scatter', 'histogram', 'heatmap')
+        dpi: Output resolution in dots per inch (defaults to the profile's)
+        profile: Render profile ('preview', 'standard', 'print'), see CHART_PROFILES
+        figsize: Figure size in inches (defaults to the profile's)
+        format: 'png', 'svg', 'pdf'... (defaults to the file extension)
+    """
+    options = CHART_PROFILES[profile]
+    fig = chart_figure(content, chart_type, figsize or options['figsize'])
     
     # Save the figure
-    plt.savefig(str(filepath), dpi=300, bbox_inches='tight', facecolor='white')
-    plt.close(fig)
+    fig.savefig(filepath if hasattr(filepath, 'write') else str(filepath),
+                dpi=dpi or options['dpi'], format=format, facecolor='white')
@@ -1,48 +1,348 @@
+import io
+import logging
+import re
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT
 from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.lib.units import cm
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.enums import TA_JUSTIFY
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Flowable, Frame, KeepInFrame, Paragraph, Table, TableStyle
+
+from tools.render_options import CHART_FIGSIZE, CHART_TYPES, PDF_STYLE
+
+logger = logging.getLogger(__name__)
+
+# Markdown-ish block syntax, matched one line at a time
+HEADING = re.compile(r"(#{1,6})\s+(.+)")
+LIST_ITEM = re.compile(r"( *)([-*+•]|\d{1,3}[.)])\s+(.+)")
+TABLE_RULE = re.compile(r"\|?(\s*:?-+:?\s*\|)+\s*(:?-+:?\s*)?")
+THEMATIC_BREAK = re.compile(r"([-*_])\s*(\1\s*){2,}")
+CHART_FENCE = re.compile(r"```\s*chart(?:\s+(\w+))?\s*")
+
+# Inline markup, applied to escaped text
+BOLD = re.compile(r"\*\*(.+?)\*\*")
+ITALIC = re.compile(r"(?<![\w*])\*(?![\s*])(.+?)(?<![\s*])\*(?![\w*])")
+CODE = re.compile(r"`([^`]+)`")
+
+FRAME_PADDING = 6  # points inside the margins, as in SimpleDocTemplate
+TITLE_MAX_CHARS = 100  # a short first paragraph is used as the title
+TABLE_SLICE_ROWS = 50  # rows laid out at once; long tables are sliced, header repeated
+CELL_WRAP_CHARS = 30  # longer cells (or cells with markup) are wrapped as Paragraphs
+CHART_RASTER_DPI = 200  # resolution of charts drawn as images
+
+# Charts are drawn into the pages as vector graphics, or as images
+VECTOR_CHARTS = PDF_STYLE["charts"] == "vector"
+
+
+def inline_markup(text):
+    """Escapes text for a reportlab Paragraph and converts **bold**, *italic* and `code`."""
+    text = escape(text)
+    text = CODE.sub(r'<font face="Courier">\1</font>', text)
+    text = BOLD.sub(r"<b>\1</b>", text)
+    return ITALIC.sub(r"<i>\1</i>", text)
+
+
+@lru_cache(maxsize=None)
+def pdf_styles():
+    """Builds the paragraph and table styles once per process."""
+    sample = getSampleStyleSheet()
+    gap = 0.3 * cm
+    body = ParagraphStyle(
+        "Body", parent=sample["Normal"], alignment=TA_JUSTIFY,
+        fontSize=PDF_STYLE["font_size"], leading=PDF_STYLE["leading"], spaceAfter=gap,
+    )
+    cell = ParagraphStyle(
+        "Cell", parent=body, alignment=TA_LEFT, fontSize=PDF_STYLE["font_size"] - 1,
+        leading=PDF_STYLE["leading"] - 2, spaceAfter=0,
+    )
+    return {
+        "title": ParagraphStyle(
+            "Title", parent=sample["Heading1"], fontSize=PDF_STYLE["title_size"],
+            leading=PDF_STYLE["title_leading"], spaceAfter=gap,
+        ),
+        "h1": ParagraphStyle("H1", parent=sample["Heading1"], spaceAfter=gap),
+        "h2": ParagraphStyle("H2", parent=sample["Heading2"], spaceAfter=gap),
+        "h3": ParagraphStyle("H3", parent=sample["Heading3"], spaceAfter=gap),
+        "body": body,
+        "item": ParagraphStyle(
+            "Item", parent=body, alignment=TA_LEFT, leftIndent=0.7 * cm, bulletIndent=0.2 * cm,
+            spaceAfter=0.1 * cm,
+        ),
+        "nested_item": ParagraphStyle(
+            "NestedItem", parent=body, alignment=TA_LEFT, leftIndent=1.4 * cm, bulletIndent=0.9 * cm,
+            spaceAfter=0.1 * cm,
+        ),
+        "cell": cell,
+        "header_cell": ParagraphStyle("HeaderCell", parent=cell, fontName="Helvetica-Bold"),
+        "table": TableStyle([
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ("FONTSIZE", (0, 0), (-1, -1), cell.fontSize),
+            ("LEADING", (0, 0), (-1, -1), cell.leading),
+        ]),
+        "header_table": TableStyle([
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ("FONTSIZE", (0, 0), (-1, -1), cell.fontSize),
+            ("LEADING", (0, 0), (-1, -1), cell.leading),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e8e8e8")),
+        ]),
+    }
+
+
+class ChartBlock(Flowable):
+    """
+    A chart as wide as the text, drawn by matplotlib straight into the page
+    as vector graphics (or as an image if PDF_STYLE["charts"] is not
+    'vector'), so it is written out with its page like any other block.
+    """
+
+    def __init__(self, width, content, chart_type, vector=True):
+        super().__init__()
+        self.width = width
+        self.height = width * CHART_FIGSIZE[1] / CHART_FIGSIZE[0]
+        self.content = content
+        self.chart_type = chart_type
+        self.vector = vector
+        self.spaceAfter = 0.3 * cm
+
+    def wrap(self, available_width, available_height):
+        return self.width, self.height
+
+    def draw(self):
+        # Imported on first use, so reports without charts do not load matplotlib
+        if self.vector:
+            from tools.pdf_chart import draw_chart
+
+            draw_chart(self.canv, self.content, self.chart_type, self.width, self.height)
+            return
+        from tools.generate_chart import generate_chart
+
+        image = io.BytesIO()
+        generate_chart(image, self.content, self.chart_type, dpi=CHART_RASTER_DPI, profile="print",
+                       figsize=(self.width / 72, self.height / 72), format="png")
+        image.seek(0)
+        self.canv.drawImage(ImageReader(image), 0, 0, width=self.width, height=self.height)
+
+
+class PdfStream:
+    """
+    Incremental PDF writer fed with text as it arrives.
+
+    Text is read line by line as markdown-ish blocks: `#` headings, `-`/`*`
+    or numbered list items (two levels), `|` tables, ```chart <type>
+    fenced blocks with chart data (JSON or 'Label: value' lines) and plain
+    paragraphs separated by blank lines. Each block is laid out as soon as it is
+    complete and every full page is finished right away (compressed into
+    the PDF document), so only the blocks of the current page are held in
+    memory, whatever the document length. Long tables are laid out in
+    slices of TABLE_SLICE_ROWS rows with the header repeated; a row taller
+    than a page is split across pages, and any other block taller than a
+    page is scaled down to fit, so no text is dropped. Charts are drawn
+    into their page as vector graphics.
+
+    Usage:
+        pdf = PdfStream(path)
+        for chunk in chunks:
+            pdf.feed(chunk)
+        pdf.close()
+    """
+
+    def __init__(self, filepath):
+        margin = PDF_STYLE["margin_cm"] * cm
+        width, height = A4
+        self._frame_box = (margin, margin, width - 2 * margin, height - 2 * margin)
+        self._width = self._frame_box[2] - 2 * FRAME_PADDING
+        self._height = self._frame_box[3] - 2 * FRAME_PADDING
+        self._canvas = canvas.Canvas(str(filepath), pagesize=A4, pageCompression=1)
+        self._styles = pdf_styles()
+        self._frame = self._new_frame()
+        self._page_empty = True
+        self._pending = ""  # incomplete last line
+        self._paragraph = []  # lines of the current paragraph
+        self._table_header = None
+        self._table_rows = []
+        self._in_table = False
+        self._chart = None  # (chart type, data lines) of an open chart block
+        self.blocks = 0
+        self.pages = 0
+
+    def feed(self, text):
+        """Adds a chunk of text; complete lines are laid out immediately."""
+        *lines, self._pending = (self._pending + text).split("\n")
+        for line in lines:
+            self._line(line)
+
+    def close(self):
+        """Lays out the remaining text and writes the PDF."""
+        if self._pending:
+            self._line(self._pending)
+            self._pending = ""
+        self._end_block()
+        if not self._page_empty or not self.pages:
+            self._canvas.showPage()
+            self.pages += 1
+        self._canvas.save()
+
+    def _line(self, line):
+        stripped = line.strip()
+        if self._chart is not None:
+            if stripped.startswith("```"):
+                self._end_chart()
+            else:
+                self._chart[1].append(line)
+            return
+        if self._in_table:
+            if stripped.startswith("|"):
+                self._table_line(stripped)
+                return
+            self._end_table()
+
+        if not stripped or THEMATIC_BREAK.fullmatch(stripped):
+            self._end_paragraph()
+        elif stripped.startswith("|"):
+            self._end_paragraph()
+            self._in_table = True
+            self._table_line(stripped)
+        elif match := CHART_FENCE.fullmatch(stripped):
+            self._end_paragraph()
+            chart_type = match.group(1) if match.group(1) in CHART_TYPES else "bar"
+            self._chart = (chart_type, [])
+        elif match := HEADING.fullmatch(stripped):
+            self._end_paragraph()
+            level = min(len(match.group(1)), 3)
+            self._add(Paragraph(inline_markup(match.group(2)), self._styles[f"h{level}"]))
+        elif match := LIST_ITEM.fullmatch(line.rstrip()):
+            self._end_paragraph()
+            indent, marker, text = match.groups()
+            bullet = marker if marker[0].isdigit() else "•"
+            style = self._styles["nested_item" if len(indent) >= 2 else "item"]
+            self._add(Paragraph(inline_markup(text), style, bulletText=bullet))
+        else:
+            self._paragraph.append(stripped)
+
+    def _end_block(self):
+        if self._chart is not None:
+            self._end_chart()
+        if self._in_table:
+            self._end_table()
+        self._end_paragraph()
+
+    def _end_chart(self):
+        chart_type, lines = self._chart
+        self._chart = None
+        self._add(ChartBlock(self._width, "\n".join(lines), chart_type, VECTOR_CHARTS))
+
+    def _end_paragraph(self):
+        if not self._paragraph:
+            return
+        text = "\n".join(self._paragraph)
+        self._paragraph = []
+        style = "title" if self.blocks == 0 and len(text) < TITLE_MAX_CHARS else "body"
+        self._add(Paragraph(inline_markup(text).replace("\n", "<br/>"), self._styles[style]))
+
+    def _table_line(self, line):
+        if TABLE_RULE.fullmatch(line):
+            # The row above a |---| rule is the header
+            if self._table_header is None and len(self._table_rows) == 1:
+                self._table_header = self._table_rows.pop()
+            return
+        self._table_rows.append([cell.strip() for cell in line.strip("|").split("|")])
+        if len(self._table_rows) >= TABLE_SLICE_ROWS:
+            self._flush_table(last=False)
+
+    def _end_table(self):
+        self._flush_table(last=True)
+        self._table_header = None
+        self._in_table = False
+
+    def _flush_table(self, last):
+        rows = ([self._table_header] if self._table_header else []) + self._table_rows
+        self._table_rows = []
+        if not rows:
+            return
+        columns = max(len(row) for row in rows)
+        header = self._table_header is not None
+        cell, header_cell = self._styles["cell"], self._styles["header_cell"]
+        data = [
+            [
+                self._cell(text, header_cell if header and i == 0 else cell)
+                for text in row + [""] * (columns - len(row))
+            ]
+            for i, row in enumerate(rows)
+        ]
+        table = Table(
+            data, colWidths=[self._width / columns] * columns, repeatRows=1 if header else 0,
+            style=self._styles["header_table" if header else "table"],
+            splitInRow=1,  # a row taller than a page continues on the next one
+        )
+        table.spaceAfter = 0.3 * cm if last else 0
+        self._add(table)
+
+    @staticmethod
+    def _cell(text, style):
+        # Plain strings are drawn without line breaking, which is most of a table's cost
+        if len(text) <= CELL_WRAP_CHARS and not any(mark in text for mark in "*`<>&"):
+            return text
+        return Paragraph(inline_markup(text), style)
+
+    def _add(self, flowable):
+        self.blocks += 1
+        pending = [flowable]
+        while pending:
+            item = pending.pop(0)
+            if self._frame.add(item, self._canvas):
+                self._page_empty = False
+                continue
+            parts = self._frame.split(item, self._canvas)
+            if parts and parts != [item]:
+                # The first part fits in the space left on this page
+                pending[:0] = parts
+                continue
+            if self._page_empty:
+                if isinstance(item, KeepInFrame):
+                    logger.warning("⚠️ Skipping a block that does not fit in a page")
+                    continue
+                # Taller than a page and cannot be split: scaled down to fit
+                logger.debug("🗜️ Shrinking a block taller than a page")
+                pending.insert(0, KeepInFrame(self._width, self._height, [item], mode="shrink"))
+                continue
+            self._new_page()
+            pending.insert(0, item)
+
+    def _new_frame(self):
+        return Frame(*self._frame_box, leftPadding=FRAME_PADDING, rightPadding=FRAME_PADDING,
+                     topPadding=FRAME_PADDING, bottomPadding=FRAME_PADDING)
+
+    def _new_page(self):
+        self._canvas.showPage()
+        self.pages += 1
+        self._frame = self._new_frame()
+        self._page_empty = True
+
 
 def generate_pdf(filepath, content):
     """
     Generates a PDF with complete and formatted content.
-    
+
+    The content goes through PdfStream, so markdown-ish headings, lists and
+    tables are formatted and memory stays bounded by the current page.
+
     Args:
         filepath: Path where the PDF will be saved
-        content: Full text to be included in the PDF
+        content: Full text (or an iterable of text chunks) to include in the PDF
+
+    Returns:
+        int: Number of pages written
     """
-    doc = SimpleDocTemplate(
-        str(filepath),
-        pagesize=A4,
-        rightMargin=2*cm,
-        leftMargin=2*cm,
-        topMargin=2*cm,
-        bottomMargin=2*cm
-    )
-    
-    styles = getSampleStyleSheet()
-    story = []
-    
-    style_normal = styles['Normal']
-    style_normal.alignment = TA_JUSTIFY
-    style_normal.fontSize = 11
-    style_normal.leading = 14
-    
-    style_title = styles['Heading1']
-    style_title.fontSize = 16
-    style_title.leading = 20
-    
-    paragraphs = content.split('\n\n')
-    
-    for i, para_text in enumerate(paragraphs):
-        if para_text.strip():
-            if i == 0 and len(para_text) < 100:
-                para = Paragraph(para_text, style_title)
-            else:
-                para = Paragraph(para_text.replace('\n', '<br/>'), style_normal)
-            story.append(para)
-            story.append(Spacer(1, 0.3*cm))
-    
-    doc.build(story)
+    pdf = PdfStream(filepath)
+    for chunk in [content] if isinstance(content, str) else content:
+        pdf.feed(chunk)
+    pdf.close()
+    return pdf.pages
@@ -0,0 +1,30 @@
+from PIL import Image
+
+PREVIEW_WIDTH = 640
+
+
+def make_preview(source, destination, width=PREVIEW_WIDTH):
+    """
+    Creates a small preview rendition of a chart image.
+
+    Args:
+        source: Path of the full-size image
+        destination: Path where the preview will be saved (format from extension)
+        width: Maximum width of the preview in pixels
+    """
+    with Image.open(source) as image:
+        image.thumbnail((width, width * 10), Image.LANCZOS)
+        image.save(str(destination), optimize=True)
+
+
+def convert_image(source, destination, quality=90):
+    """
+    Converts an image to the format given by the destination extension (e.g. WebP).
+
+    Args:
+        source: Path of the original image
+        destination: Path of the converted image
+        quality: Encoder quality for lossy formats
+    """
+    with Image.open(source) as image:
+        image.save(str(destination), quality=quality, method=4)
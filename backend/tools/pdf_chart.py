@@ -0,0 +1,168 @@
+import numpy as np
+from matplotlib.backend_bases import GraphicsContextBase, RendererBase
+from matplotlib.path import Path
+from PIL import Image
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import getAscentDescent, stringWidth
+
+from tools.generate_chart import chart_figure
+
+CAP_STYLES = {"butt": 0, "round": 1, "projecting": 2}
+JOIN_STYLES = {"miter": 0, "round": 1, "bevel": 2}
+FILL_NON_ZERO = 1  # matplotlib fills paths with the nonzero winding rule
+
+
+def _font(prop):
+    """Maps a matplotlib font to the closest PDF standard font."""
+    bold = prop.get_weight() in ("bold", "heavy", "extra bold", "black", "semibold", "demibold") or (
+        isinstance(prop.get_weight(), int) and prop.get_weight() >= 600
+    )
+    italic = prop.get_style() != "normal"
+    return "Helvetica" + {(False, False): "", (True, False): "-Bold", (False, True): "-Oblique",
+                          (True, True): "-BoldOblique"}[bold, italic]
+
+
+class CanvasRenderer(RendererBase):
+    """
+    Matplotlib renderer that draws straight onto a reportlab canvas.
+
+    Display units are PDF points (the figure is drawn at 72 DPI) with the
+    origin at the bottom left of the chart, so a figure becomes vector
+    graphics of the page being written, with selectable text in the PDF
+    standard fonts. Text is measured with the same fonts, so alignment holds.
+    """
+
+    def __init__(self, canv, width, height):
+        super().__init__()
+        self.canv = canv
+        self.width = width
+        self.height = height
+
+    def flipy(self):
+        return False
+
+    def get_canvas_width_height(self):
+        return self.width, self.height
+
+    def points_to_pixels(self, points):
+        return points
+
+    def option_scale_image(self):
+        # Images (heatmaps) are drawn at their own resolution and scaled by the viewer
+        return True
+
+    def new_gc(self):
+        return GraphicsContextBase()
+
+    def _path(self, path, transform, simplify):
+        drawn = self.canv.beginPath()
+        last = (0.0, 0.0)
+        for vertices, code in path.iter_segments(transform, simplify=simplify, curves=True):
+            if code == Path.MOVETO:
+                drawn.moveTo(*vertices)
+            elif code == Path.LINETO:
+                drawn.lineTo(*vertices)
+            elif code == Path.CURVE3:
+                # Quadratic to cubic Bézier
+                (x0, y0), (cx, cy, x, y) = last, vertices
+                drawn.curveTo(x0 + 2 / 3 * (cx - x0), y0 + 2 / 3 * (cy - y0),
+                              x + 2 / 3 * (cx - x), y + 2 / 3 * (cy - y), x, y)
+            elif code == Path.CURVE4:
+                drawn.curveTo(*vertices)
+            elif code == Path.CLOSEPOLY:
+                drawn.close()
+                continue
+            last = vertices[-2:]
+        return drawn
+
+    def _clip(self, gc):
+        rectangle = gc.get_clip_rectangle()
+        if rectangle is not None:
+            (x0, y0), (x1, y1) = rectangle.get_points()
+            clip = self.canv.beginPath()
+            clip.rect(x0, y0, x1 - x0, y1 - y0)
+            self.canv.clipPath(clip, stroke=0, fill=0)
+        path, transform = gc.get_clip_path()
+        if path is not None:
+            self.canv.clipPath(self._path(path, transform, False), stroke=0, fill=0, fillMode=FILL_NON_ZERO)
+
+    def draw_path(self, gc, path, transform, rgbFace=None):
+        canv = self.canv
+        red, green, blue, alpha = gc.get_rgb()
+        if gc.get_forced_alpha():
+            alpha = gc.get_alpha()
+        stroke = gc.get_linewidth() > 0 and alpha > 0
+        fill = rgbFace is not None and (rgbFace[3] if len(rgbFace) > 3 else 1) > 0
+        if not stroke and not fill:
+            return
+
+        canv.saveState()
+        self._clip(gc)
+        if stroke:
+            canv.setStrokeColorRGB(red, green, blue, alpha)
+            canv.setLineWidth(gc.get_linewidth())
+            canv.setLineCap(CAP_STYLES.get(gc.get_capstyle(), 0))
+            canv.setLineJoin(JOIN_STYLES.get(gc.get_joinstyle(), 0))
+            offset, dashes = gc.get_dashes()
+            if dashes:
+                canv.setDash(list(dashes), offset or 0)
+        if fill:
+            fill_alpha = gc.get_alpha() if gc.get_forced_alpha() else (rgbFace[3] if len(rgbFace) > 3 else 1)
+            canv.setFillColorRGB(*rgbFace[:3], fill_alpha)
+        drawn = self._path(path, transform, path.should_simplify and not fill)
+        canv.drawPath(drawn, stroke=int(stroke), fill=int(fill), fillMode=FILL_NON_ZERO)
+        canv.restoreState()
+
+    def draw_image(self, gc, x, y, im, transform=None):
+        height, width = im.shape[:2]
+        if not width or not height:
+            return
+        canv = self.canv
+        canv.saveState()
+        self._clip(gc)
+        canv.translate(x, y)
+        image = ImageReader(Image.fromarray(np.asarray(im)[::-1], "RGBA"))
+        if transform is None:
+            canv.drawImage(image, 0, 0, width, height, mask="auto")
+        else:
+            # The transform maps the unit square to the image position
+            canv.transform(*transform.frozen().to_values())
+            canv.drawImage(image, 0, 0, 1, 1, mask="auto")
+        canv.restoreState()
+
+    def draw_text(self, gc, x, y, s, prop, angle, ismath=False, mtext=None):
+        if ismath:
+            s = s.replace("$", "")
+        canv = self.canv
+        red, green, blue, alpha = gc.get_rgb()
+        canv.saveState()
+        self._clip(gc)
+        canv.setFillColorRGB(red, green, blue, gc.get_alpha() if gc.get_forced_alpha() else alpha)
+        canv.setFont(_font(prop), prop.get_size_in_points())
+        canv.translate(x, y)
+        canv.rotate(angle)
+        canv.drawString(0, 0, s)
+        canv.restoreState()
+
+    def get_text_width_height_descent(self, s, prop, ismath):
+        if ismath:
+            s = s.replace("$", "")
+        font, size = _font(prop), prop.get_size_in_points()
+        ascent, descent = getAscentDescent(font, size)
+        return stringWidth(s, font, size), ascent - descent, -descent
+
+
+def draw_chart(canv, content, chart_type, width, height):
+    """
+    Draws a chart as vector graphics on a reportlab canvas.
+
+    Args:
+        canv: Canvas, with the origin at the bottom left of the chart
+        content: Text containing the data (see generate_chart)
+        chart_type: Type of chart ('bar', 'line', 'pie', ...)
+        width: Chart width in points
+        height: Chart height in points
+    """
+    fig = chart_figure(content, chart_type, figsize=(width / 72, height / 72), dpi=72)
+    fig.patch.set_facecolor("white")
+    fig.draw(CanvasRenderer(canv, width, height))
@@ -0,0 +1,30 @@
+# Render options (part of the render cache key). They live apart from the
+# renderers so the API process can build cache keys and validate requests
+# without importing matplotlib or reportlab.
+
+CHART_DPI = 300  # highest resolution a request can ask for
+CHART_FIGSIZE = (12, 7)
+CHART_TYPES = ("bar", "line", "scatter", "pie", "histogram", "heatmap")
+
+# Chart render profiles: figure size in inches and resolution. A chat bubble
+# shows the preview size; print is for documents, and usually asked for as a
+# vector format (SVG or PDF), where the resolution only applies to images
+CHART_PROFILES = {
+    "preview": {"figsize": (8, 4.5), "dpi": 80},  # 640x360 px
+    "standard": {"figsize": CHART_FIGSIZE, "dpi": 100},  # 1200x700 px
+    "print": {"figsize": CHART_FIGSIZE, "dpi": CHART_DPI},  # 3600x2100 px
+}
+DEFAULT_CHART_PROFILE = "standard"
+CHART_FORMATS = ("png", "svg", "pdf")
+VECTOR_FORMATS = ("svg", "pdf")
+
+PDF_STYLE = {
+    "pagesize": "A4",
+    "margin_cm": 2,
+    "font_size": 11,
+    "leading": 14,
+    "title_size": 16,
+    "title_leading": 20,
+    "markup": "markdown",
+    "charts": "vector",  # or "image" (200 DPI PNG)
+}